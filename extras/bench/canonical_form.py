@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+'''
+Compares the cache entries of the canonical form of a workout when saving model
+instances and when saving plain data (wger.utils.canonical).
+
+Uses the cache and database configured in your settings, e.g.:
+
+    python canonical_form.py --workout 12 --repeat 500
+'''
+
+import os
+import sys
+import pickle
+import timeit
+import argparse
+
+import django
+
+sys.path.insert(0, os.path.join('..', '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+# Must happen after calling django.setup()
+from django.core.cache import cache
+from django.db.models import Count
+
+from wger.manager.models import Workout
+from wger.utils.canonical import (
+    CanonicalForm,
+    serialize_canonical_form
+)
+
+parser = argparse.ArgumentParser(description='Benchmark the cache entries of the canonical '
+                                             'form of a workout')
+parser.add_argument('--workout',
+                    action='store',
+                    type=int,
+                    help='Workout-ID to use. Default: the workout with the most sets')
+parser.add_argument('--repeat',
+                    action='store',
+                    type=int,
+                    default=200,
+                    help='Number of cache operations to time. Default: 200')
+args = parser.parse_args()
+
+if args.workout:
+    workout = Workout.objects.get(pk=args.workout)
+else:
+    workout = Workout.objects.annotate(nr_sets=Count('day__set')).order_by('-nr_sets')[0]
+
+# The form with model instances, as it was saved before
+instance_form = workout.get_canonical_representation()
+day_list = instance_form['day_list']
+plain_form = serialize_canonical_form(instance_form)
+
+
+def benchmark(name, value, wrapper=None):
+    '''
+    Prints the size of the pickled value and the latency of the cache operations
+    '''
+    key = 'canonical-form-benchmark'
+
+    def set_entry():
+        cache.set(key, value)
+
+    def get_entry():
+        entry = cache.get(key)
+        if wrapper:
+            entry = wrapper(entry)
+        return entry
+
+    size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    set_time = timeit.timeit(set_entry, number=args.repeat) / args.repeat * 1000
+    get_time = timeit.timeit(get_entry, number=args.repeat) / args.repeat * 1000
+    cache.delete(key)
+
+    print('{0:<18} {1:>10} bytes {2:>10.3f} ms set {3:>10.3f} ms get'.format(name,
+                                                                           size,
+                                                                           set_time,
+                                                                           get_time))
+
+print('Workout {0}: {1} days, {2} sets'.format(workout.pk,
+                                               len(day_list),
+                                               sum(len(day['set_list']) for day in day_list)))
+benchmark('Model instances', instance_form)
+benchmark('Plain data', plain_form, CanonicalForm)
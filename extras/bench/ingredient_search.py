@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+'''
+Compares the ingredient search with the in-memory trigram index against the
+previous name__icontains lookup.
+
+Random ingredients are added to the database configured in your settings and
+removed again at the end (everything happens in a transaction that is rolled
+back), e.g.:
+
+    python ingredient_search.py --ingredients 20000 --repeat 20
+'''
+
+import os
+import sys
+import random
+import timeit
+import argparse
+import datetime
+
+import django
+
+sys.path.insert(0, os.path.join('..', '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+# Must happen after calling django.setup()
+from django.db import transaction
+
+from wger.nutrition.models import Ingredient, ingredient_search_index
+
+parser = argparse.ArgumentParser(description='Benchmark the ingredient search')
+parser.add_argument('--ingredients',
+                    action='store',
+                    type=int,
+                    default=10000,
+                    help='Number of random ingredients to add. Default: 10000')
+parser.add_argument('--repeat',
+                    action='store',
+                    type=int,
+                    default=20,
+                    help='Number of times each search is timed. Default: 20')
+args = parser.parse_args()
+
+WORDS = ('apple', 'banana', 'beef', 'bread', 'butter', 'cheese', 'chicken', 'chocolate',
+         'cream', 'egg', 'fish', 'flour', 'ham', 'honey', 'milk', 'oat', 'onion', 'pasta',
+         'pork', 'potato', 'rice', 'salmon', 'soup', 'sugar', 'tomato', 'tuna', 'yogurt')
+QUALIFIERS = ('raw', 'cooked', 'fried', 'boiled', 'canned', 'frozen', 'dried', 'organic',
+              'low fat', 'whole', 'sliced', 'smoked', 'sweetened', 'unsalted')
+TERMS = ('chi', 'chicken', 'chicken, fri', 'tomato soup', 'low fat mil', 'ozen', 'xyz')
+
+
+class Rollback(Exception):
+    pass
+
+
+def old_search(term):
+    '''
+    The search as it was done before
+    '''
+    return list(Ingredient.objects.filter(name__icontains=term,
+                                          language=2,
+                                          status__in=Ingredient.INGREDIENT_STATUS_OK)
+                .values_list('pk', 'name'))
+
+
+def new_search(term):
+    '''
+    The search with the trigram index
+    '''
+    return Ingredient.objects.search(term, [2])
+
+
+try:
+    with transaction.atomic():
+        random.seed(1)
+        today = datetime.date.today()
+        ingredients = []
+        for i in range(args.ingredients):
+            name = '{0} {1}, {2}, {3}'.format(random.choice(WORDS).capitalize(),
+                                              random.choice(WORDS),
+                                              random.choice(QUALIFIERS),
+                                              random.randint(1, 999))
+            ingredients.append(Ingredient(name=name,
+                                          language_id=2,
+                                          status=Ingredient.INGREDIENT_STATUS_SYSTEM,
+                                          update_date=today,
+                                          energy=100,
+                                          protein=1,
+                                          carbohydrates=1,
+                                          fat=1))
+        Ingredient.objects.bulk_create(ingredients, batch_size=500)
+
+        ingredient_search_index.reset()
+        build_time = timeit.timeit(ingredient_search_index.get_index, number=1)
+        index = ingredient_search_index.get_index()
+        print('{0} ingredients, {1} trigrams, index built in {2:.3f} s'.format(len(index),
+                                                                           len(index.tokens),
+                                                                           build_time))
+        print('{0:<16} {1:>8} {2:>14} {3:>14}'.format('Term', 'Results', 'icontains', 'index'))
+        for term in TERMS:
+            old_time = timeit.timeit(lambda: old_search(term), number=args.repeat)
+            new_time = timeit.timeit(lambda: new_search(term), number=args.repeat)
+            print('{0:<16} {1:>8} {2:>11.3f} ms {3:>11.3f} ms'.format(
+                term,
+                len(old_search(term)),
+                old_time / args.repeat * 1000,
+                new_time / args.repeat * 1000))
+
+        raise Rollback()
+except Rollback:
+    ingredient_search_index.reset()
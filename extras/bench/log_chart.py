@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+'''
+Compares the processing of the workout logs for the weight charts with the
+previous implementation, which iterated over model instances and checked a
+list of seen entries.
+
+Random logs are added for one exercise to the database configured in your
+settings and removed again at the end (everything happens in a transaction
+that is rolled back), e.g.:
+
+    python log_chart.py --logs 10000 --repeat 5
+'''
+
+import os
+import sys
+import json
+import random
+import timeit
+import argparse
+import datetime
+from collections import OrderedDict
+
+import django
+
+sys.path.insert(0, os.path.join('..', '..'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+django.setup()
+
+# Must happen after calling django.setup()
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from wger.exercises.models import Exercise
+from wger.manager.models import Workout, WorkoutLog
+from wger.utils.helpers import DecimalJsonEncoder
+from wger.weight.helpers import process_log_entries
+
+parser = argparse.ArgumentParser(description='Benchmark the processing of the log charts')
+parser.add_argument('--logs',
+                    action='store',
+                    type=int,
+                    default=10000,
+                    help='Number of random logs to add. Default: 10000')
+parser.add_argument('--repeat',
+                    action='store',
+                    type=int,
+                    default=5,
+                    help='Number of times each implementation is timed. Default: 5')
+args = parser.parse_args()
+
+
+class Rollback(Exception):
+    pass
+
+
+def old_process_log_entries(logs):
+    '''
+    The processing as it was done before
+    '''
+    entry_log = OrderedDict()
+    entry_list = {}
+    chart_data = []
+    max_weight = {}
+
+    for entry in logs:
+        if not entry_log.get(entry.date):
+            entry_log[entry.date] = []
+        entry_log[entry.date].append(entry)
+
+        if not max_weight.get(entry.date):
+            max_weight[entry.date] = {entry.reps: entry.weight}
+
+        if not max_weight[entry.date].get(entry.reps):
+            max_weight[entry.date][entry.reps] = entry.weight
+
+        if entry.weight > max_weight[entry.date][entry.reps]:
+            max_weight[entry.date][entry.reps] = entry.weight
+
+    for entry in logs:
+        if not entry_list.get(entry.reps):
+            entry_list[entry.reps] = {'list': [], 'seen': []}
+
+        if entry.weight != max_weight[entry.date][entry.reps]:
+            continue
+        if (entry.date, entry.reps, entry.weight) in entry_list[entry.reps]['seen']:
+            continue
+
+        entry_list[entry.reps]['seen'].append((entry.date, entry.reps, entry.weight))
+        entry_list[entry.reps]['list'].append({'date': entry.date,
+                                               'weight': entry.weight,
+                                               'reps': entry.reps})
+    for rep in entry_list:
+        chart_data.append(entry_list[rep]['list'])
+
+    return entry_log, json.dumps(chart_data, cls=DecimalJsonEncoder)
+
+
+try:
+    with transaction.atomic():
+        random.seed(1)
+        user = User.objects.first()
+        exercise = Exercise.objects.first()
+        workout = Workout.objects.create(user=user, comment='Log chart benchmark')
+        start = datetime.date(2000, 1, 1)
+        WorkoutLog.objects.bulk_create(
+            [WorkoutLog(user=user,
+                        exercise=exercise,
+                        workout=workout,
+                        reps=random.choice((1, 3, 5, 8, 10, 12)),
+                        weight=random.randint(200, 2000) / 10.0,
+                        date=start + datetime.timedelta(days=i // 5))
+             for i in range(args.logs)],
+            batch_size=500)
+
+        logs = WorkoutLog.objects.filter(user=user, exercise=exercise, workout=workout)
+        if json.loads(old_process_log_entries(logs.all())[1]) \
+                != json.loads(process_log_entries(logs.all())[1]):
+            print('The chart data is different!')
+
+        old_time = timeit.timeit(lambda: old_process_log_entries(logs.all()), number=args.repeat)
+        new_time = timeit.timeit(lambda: process_log_entries(logs.all()), number=args.repeat)
+        print('{0} logs'.format(logs.count()))
+        print('instances: {0:>10.1f} ms'.format(old_time / args.repeat * 1000))
+        print('columns:   {0:>10.1f} ms'.format(new_time / args.repeat * 1000))
+
+        raise Rollback()
+except Rollback:
+    pass
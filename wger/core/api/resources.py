@@ -39,7 +39,7 @@ class UserProfileResource(ModelResource):
         return object_list.filter(user=bundle.request.user)
 
     class Meta:
-        excludes = ('is_temporary', )
+        excludes = ('is_temporary', 'is_pooled')
         queryset = UserProfile.objects.all()
         authentication = ApiKeyAuthentication()
         authorization = UserObjectsOnlyAuthorization()
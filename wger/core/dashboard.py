@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+Summary of the data shown on the dashboard
+
+The summary is saved in the cache per user. It is reset when the workouts,
+schedules, weight entries or nutrition plans of the user change (see the
+signals of the manager, nutrition and weight apps) and at the end of the
+day, since the current workout of a schedule depends on the date. The
+nutritional values are not part of it, they are cached per plan.
+'''
+
+import datetime
+
+from django.core.cache import cache
+
+from wger.core.models import DaysOfWeek
+from wger.manager.models import Schedule
+from wger.nutrition.models import NutritionPlan
+from wger.utils.cache import cache_mapper
+from wger.weight.helpers import get_last_entries
+
+
+def get_cache_timeout():
+    '''
+    Returns the number of seconds until the end of the day
+    '''
+    now = datetime.datetime.now()
+    tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1),
+                                         datetime.time())
+    return int((tomorrow - now).total_seconds()) + 1
+
+
+def build_dashboard_summary(user):
+    '''
+    Loads the data shown on the dashboard from the database
+
+    :param user: the user
+    :return: a dictionary with the current workout, its schedule and days,
+             the latest nutrition plan and the last weight entries
+    '''
+
+    # Load the last workout, either from a schedule or a 'regular' one
+    (current_workout, schedule) = Schedule.objects.get_current_workout(user)
+
+    # The days of the week on which the workout is done, with the day's description
+    workout_days = []
+    used_days = {}
+    if current_workout:
+        workout_days = list(current_workout.day_set.prefetch_related('day'))
+        for day in workout_days:
+            for day_of_week in day.day.all():
+                used_days[day_of_week.id] = day.description
+
+    # Load the last nutritional plan, if one exists, and the weight entry
+    # used for its values per body weight
+    plan = NutritionPlan.objects.filter(user=user).order_by('-creation_date').first()
+    plan_weight_entry = plan.get_closest_weight_entry() if plan else None
+
+    # Load the last logged weight entries, if any exist
+    last_weight_entries = get_last_entries(user)
+    weight = last_weight_entries[0][0] if last_weight_entries else False
+
+    return {'current_workout': current_workout,
+            'schedule': schedule,
+            'workout_days': workout_days,
+            'used_days': used_days,
+            'weekdays': list(DaysOfWeek.objects.values_list('id', 'day_of_week')),
+            'plan': plan or False,
+            'plan_weight_entry': plan_weight_entry,
+            'weight': weight,
+            'last_weight_entries': last_weight_entries}
+
+
+def get_dashboard_summary(user):
+    '''
+    Returns the (cached) data shown on the dashboard, see build_dashboard_summary
+
+    :param user: the user
+    '''
+    key = cache_mapper.get_dashboard_summary(user)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_dashboard_summary(user)
+        cache.set(key, summary, get_cache_timeout())
+    return summary
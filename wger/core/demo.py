@@ -19,13 +19,18 @@ import random
 import datetime
 import uuid
 
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.contrib.auth import login as django_login
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.timezone import now
 from django.utils.translation import ugettext as _
 
 from wger.weight.models import WeightEntry
 from wger.exercises.models import Exercise
-from wger.core.models import DaysOfWeek
+from wger.core.models import DaysOfWeek, UserProfile
 from wger.manager.models import (
     Workout,
     Day,
@@ -43,6 +48,12 @@ from wger.nutrition.models import (
     IngredientWeightUnit
 )
 
+from wger.utils.cache import (
+    cache_mapper,
+    increment_counter,
+    increment_guest_pool_stat,
+    reset_dashboard_summary
+)
 from wger.utils.language import load_language
 
 logger = logging.getLogger(__name__)
@@ -67,6 +78,105 @@ def create_temporary_user():
     return user
 
 
+def create_pool_user():
+    '''
+    Creates a temporary user with demo data for the guest account pool
+
+    The account has no usable password, guests are logged in when they
+    claim it.
+    '''
+    user = User.objects.create_user(uuid.uuid4().hex[:-2], '')
+    UserProfile.objects.filter(user=user).update(is_temporary=True,
+                                                 is_pooled=True,
+                                                 age=25,
+                                                 height=175)
+    create_demo_entries(user)
+    return user
+
+
+def get_guest_pool_depth():
+    '''
+    Returns the number of accounts waiting in the guest account pool
+    '''
+    return UserProfile.objects.filter(is_pooled=True).count()
+
+
+def claim_pool_user():
+    '''
+    Takes a user out of the guest account pool
+
+    The flag is cleared with a conditional update, so an account can only be
+    claimed once, even by concurrent requests. The join date is set in the
+    same transaction, so delete-temp-users never sees a claimed account with
+    its old date.
+
+    :return: the user or None, if the pool is empty
+    '''
+    candidates = (UserProfile.objects.filter(is_pooled=True)
+                  .order_by('pk')
+                  .values_list('user_id', flat=True)[:5])
+    for user_id in candidates:
+        with transaction.atomic():
+            claimed = UserProfile.objects.filter(user_id=user_id, is_pooled=True) \
+                .update(is_pooled=False)
+            if claimed:
+                # The guest's week starts now, not when the account was created
+                User.objects.filter(pk=user_id).update(date_joined=now())
+        if claimed:
+            user = User.objects.get(pk=user_id)
+            user.backend = settings.AUTHENTICATION_BACKENDS[0]
+            return user
+    return None
+
+
+def check_guest_rate_limit(request):
+    '''
+    Checks whether the client may get another guest account
+
+    The limit is configured with the GUEST_USER_RATE_LIMIT setting, a tuple
+    with the number of accounts and the period in seconds per IP address.
+
+    :return: True if the account can be given out
+    '''
+    amount, period = settings.WGER_SETTINGS.get('GUEST_USER_RATE_LIMIT', (20, 3600))
+    if not amount:
+        return True
+
+    key = cache_mapper.get_guest_user_rate(request.META.get('REMOTE_ADDR'))
+    return increment_counter(key, timeout=period) <= amount
+
+
+def login_guest_user(request):
+    '''
+    Logs the request in with a new temporary user
+
+    The user is taken from the guest account pool if possible, otherwise it is
+    created now.
+
+    :return: the user or None, if the rate limit was reached
+    '''
+    if not check_guest_rate_limit(request):
+        logger.info('rate limit reached, no guest user for {0}'
+                    .format(request.META.get('REMOTE_ADDR')))
+        increment_guest_pool_stat('limited')
+        return None
+
+    user = claim_pool_user()
+    has_demo_data = user is not None
+    if has_demo_data:
+        increment_guest_pool_stat('claimed')
+    else:
+        logger.debug('the guest account pool is empty, creating a new user')
+        increment_guest_pool_stat('created')
+        user = create_temporary_user()
+
+    django_login(request, user)
+
+    # Accounts from the pool already have demo data
+    request.session['has_demo_data'] = has_demo_data
+    return user
+
+
 def create_demo_entries(user):
     '''
     Creates some demo data for temporary users
@@ -201,6 +311,7 @@ def create_demo_entries(user):
                                 date=creation_date)
             temp.append(entry)
     WeightEntry.objects.bulk_create(temp)
+    reset_dashboard_summary(user.pk)
 
     #
     # Nutritional plan
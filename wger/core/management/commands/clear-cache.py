@@ -26,6 +26,7 @@ from wger.exercises.models import Exercise
 from wger.utils.cache import (
     reset_workout_canonical_form,
     reset_workout_log,
+    reset_workout_log_last_weights,
     delete_template_fragment_cache
 )
 
@@ -77,6 +78,8 @@ class Command(BaseCommand):
                 if int(options['verbosity']) >= 2:
                     self.stdout.write("* Processing user {0}".format(user.username))
 
+                reset_workout_log_last_weights(user.id)
+
                 for entry in WorkoutLog.objects.filter(user=user).dates('date', 'year'):
 
                     if int(options['verbosity']) >= 3:
@@ -85,15 +88,8 @@ class Command(BaseCommand):
                                                            date__year=entry.year).dates('date',
                                                                                         'month'):
                         if int(options['verbosity']) >= 3:
-                            self.stdout.write("    Month {0}".format(entry.month))
-                        reset_workout_log(user.id, entry.year, entry.month)
-                        for day in WorkoutLog.objects.filter(user=user,
-                                                             date__year=entry.year,
-                                                             date__month=month.month).dates('date',
-                                                                                            'day'):
-                            if int(options['verbosity']) >= 3:
-                                self.stdout.write("      Day {0}".format(day.day))
-                            reset_workout_log(user.id, entry.year, entry.month, day)
+                            self.stdout.write("    Month {0}".format(month.month))
+                        reset_workout_log(user.id, entry.year, month.month)
 
             for language in Language.objects.all():
                 delete_template_fragment_cache('muscle-overview', language.id)
@@ -14,11 +14,87 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import time
 import datetime
+from optparse import make_option
 
+from django.contrib.auth.models import User
+from django.db import transaction
 from django.utils.timezone import now
-from django.core.management.base import BaseCommand
-from wger.core.models import UserProfile
+from django.core.management.base import BaseCommand, CommandError
+
+from wger.manager.models import (
+    Day,
+    Schedule,
+    ScheduleStep,
+    Set,
+    Setting,
+    Workout,
+    WorkoutLog,
+    WorkoutSession
+)
+from wger.nutrition.models import Meal, MealItem, NutritionPlan
+from wger.utils.helpers import bulk_delete
+from wger.weight.models import WeightEntry
+
+
+PURGE_ORDER = (
+    (WorkoutLog, 'user_id'),
+    (WorkoutSession, 'user_id'),
+    (Setting, 'set__exerciseday__training__user_id'),
+    (Set.exercises.through, 'set__exerciseday__training__user_id'),
+    (Set, 'exerciseday__training__user_id'),
+    (Day.day.through, 'day__training__user_id'),
+    (Day, 'training__user_id'),
+    (ScheduleStep, 'schedule__user_id'),
+    (Schedule, 'user_id'),
+    (Workout, 'user_id'),
+    (MealItem, 'meal__plan__user_id'),
+    (Meal, 'plan__user_id'),
+    (NutritionPlan, 'user_id'),
+    (WeightEntry, 'user_id'),
+)
+'''
+The tables with the bulk of the users' data and the field linking them to the
+user, the dependent tables first
+'''
+
+
+def get_expired_users():
+    '''
+    Returns the temporary users older than a week, the accounts waiting in
+    the guest pool are kept
+    '''
+    return User.objects.filter(userprofile__is_temporary=True,
+                               userprofile__is_pooled=False,
+                               date_joined__lte=now() - datetime.timedelta(7))
+
+
+def delete_users(user_ids):
+    '''
+    Deletes the given users with a few queries per table
+
+    The users are selected again and locked, so that accounts that were given
+    out in the meantime, e.g. by claim_pool_user, are kept. The tables in
+    PURGE_ORDER are emptied first, then the rest is left to the normal cascade.
+    The signal handlers that update the caches and statistics of the deleted
+    objects are skipped, they would otherwise run queries for every single
+    entry.
+
+    :param user_ids: list with the IDs of the users to delete
+    :return: number of deleted users
+    '''
+    with transaction.atomic(), bulk_delete():
+        user_ids = list(get_expired_users().select_for_update()
+                        .filter(pk__in=user_ids)
+                        .values_list('pk', flat=True))
+        if not user_ids:
+            return 0
+
+        for model, field in PURGE_ORDER:
+            model.objects.filter(**{field + '__in': user_ids}).delete()
+        User.objects.filter(pk__in=user_ids).delete()
+    return len(user_ids)
 
 
 class Command(BaseCommand):
@@ -26,17 +102,51 @@ class Command(BaseCommand):
     Helper admin command to clean up demo users, to be called e.g. by cron
     '''
 
+    option_list = BaseCommand.option_list + (
+        make_option('--chunk-size',
+                    action='store',
+                    type='int',
+                    dest='chunk_size',
+                    default=100,
+                    help='Number of users deleted in one transaction (default: 100)'),
+        make_option('--dry-run',
+                    action='store_true',
+                    dest='dry_run',
+                    default=False,
+                    help='Only show how many users would be deleted'),
+    )
+
     help = 'Deletes all temporary users older than 1 week'
 
     def handle(self, **options):
+        '''
+        Delete the users in chunks, reporting the progress after each one
+        '''
+        if options['chunk_size'] < 1:
+            raise CommandError('The chunk size must be a positive number')
+
+        users = get_expired_users()
+        total = users.count()
+        if options['dry_run']:
+            self.stdout.write("Would delete {0} temporary users".format(total))
+            return
 
-        profile_list = UserProfile.objects.filter(is_temporary=True)
+        start = time.time()
         counter = 0
-        for profile in profile_list:
-            delta = now() - profile.user.date_joined
+        last_pk = 0
+        while True:
+            user_ids = list(users.filter(pk__gt=last_pk)
+                            .order_by('pk')
+                            .values_list('pk', flat=True)[:options['chunk_size']])
+            if not user_ids:
+                break
 
-            if (delta >= datetime.timedelta(7)):
-                counter += 1
-                profile.user.delete()
+            counter += delete_users(user_ids)
+            last_pk = user_ids[-1]
+            if int(options['verbosity']) >= 2:
+                elapsed = time.time() - start
+                self.stdout.write('Deleted {0} of {1} users ({2:.1f} users/s)'
+                                  .format(counter, total, counter / max(elapsed, 0.001)))
 
-        self.stdout.write("Deleted {0} temporary users".format(counter))
+        self.stdout.write("Deleted {0} temporary users in {1:.1f}s"
+                          .format(counter, time.time() - start))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 *-*
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import translation
+
+from wger.core.demo import create_pool_user, get_guest_pool_depth
+from wger.utils.cache import get_guest_pool_stats
+
+
+class Command(BaseCommand):
+    '''
+    Fills the pool of guest accounts, to be called e.g. by cron
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--size',
+                    action='store',
+                    type='int',
+                    dest='size',
+                    default=20,
+                    help='Number of accounts to keep in the pool (default: 20)'),
+    )
+
+    help = 'Creates temporary users with demo data, so that guests can get an ' \
+           'account without waiting for it to be created. Also shows the number ' \
+           'of accounts claimed from the pool, created because the pool was empty ' \
+           'and not given out because of the rate limit.'
+
+    def handle(self, **options):
+        '''
+        Process the options
+        '''
+        if options['size'] < 0:
+            raise CommandError('The pool size can\'t be negative')
+
+        depth = get_guest_pool_depth()
+        missing = max(options['size'] - depth, 0)
+        # The demo data is created in the default language of the site
+        with translation.override(settings.LANGUAGE_CODE):
+            for i in range(missing):
+                create_pool_user()
+
+        self.stdout.write('Created {0} guest accounts, {1} in the pool'
+                          .format(missing, depth + missing))
+
+        stats = get_guest_pool_stats()
+        for name in ('claimed', 'created', 'limited'):
+            self.stdout.write('{0}: {1}'.format(name, stats[name]))
@@ -14,10 +14,13 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+from optparse import make_option
+
 from django.contrib.auth.models import User
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
-from wger.gym.helpers import get_user_last_activity
+from wger.core.models import UserCache
+from wger.gym.helpers import update_user_cache_last_activity
 
 
 class Command(BaseCommand):
@@ -25,6 +28,15 @@ class Command(BaseCommand):
     Updates the user cache table
     '''
 
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    dest='batch_size',
+                    default=500,
+                    help='Maximum number of users updated with one query (default: 500)'),
+    )
+
     help = 'Update the user cache-table. This is only needed when the python' \
            'code used to calculate any of the cached entries is changed and ' \
            'the ones in the database need to be updated to reflect the new logic.'
@@ -34,7 +46,16 @@ class Command(BaseCommand):
         Process the options
         '''
 
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be a positive number')
+
         print('** Updating last activity')
-        for user in User.objects.all():
-            user.usercache.last_activity = get_user_last_activity(user)
-            user.usercache.save()
+
+        # Users created before the cache table existed or added directly to the database
+        missing = User.objects.filter(usercache__isnull=True).values_list('pk', flat=True)
+        UserCache.objects.bulk_create([UserCache(user_id=pk) for pk in missing],
+                                      batch_size=options['batch_size'])
+
+        count = update_user_cache_last_activity(batch_size=options['batch_size'])
+        if int(options['verbosity']) >= 2:
+            self.stdout.write('* Updated {0} entries'.format(count))
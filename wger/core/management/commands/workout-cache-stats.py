@@ -0,0 +1,42 @@
+# -*- coding: utf-8 *-*
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+from django.core.management.base import BaseCommand
+
+from wger.utils.cache import get_workout_canonical_stats
+
+
+class Command(BaseCommand):
+    '''
+    Shows the counters of the workout canonical form cache
+    '''
+
+    help = 'Shows how often the canonical form of the workouts was found in the ' \
+           'cache (hit), had to be composed from the cached days (miss) and how ' \
+           'many days had to be built from the database (rebuild).'
+
+    def handle(self, **options):
+        '''
+        Process the options
+        '''
+
+        stats = get_workout_canonical_stats()
+        for name in ('hit', 'miss', 'rebuild'):
+            self.stdout.write('{0}: {1}'.format(name, stats[name]))
+
+        lookups = stats['hit'] + stats['miss']
+        if lookups:
+            self.stdout.write('hit rate: {0:.1%}'.format(stats['hit'] / float(lookups)))
@@ -123,6 +123,12 @@ class UserProfile(models.Model):
     Flag to mark a temporary user (demo account)
     '''
 
+    is_pooled = models.BooleanField(default=False,
+                                    editable=False)
+    '''
+    Flag to mark a temporary user that is waiting in the guest account pool
+    '''
+
     #
     # User preferences
     #
@@ -334,8 +340,10 @@ by the US Department of Agriculture. It is extremely complete, with around
                'city': '',
                'street': '',
                'phone': ''}
-        if self.user.contract_member.exists():
-            last_contract = self.user.contract_member.last()
+        # Use all() so that prefetched contracts can be used
+        contracts = self.user.contract_member.all()
+        if contracts:
+            last_contract = contracts[len(contracts) - 1]
             out['zip_code'] = last_contract.zip_code
             out['city'] = last_contract.city
             out['street'] = last_contract.street
@@ -16,10 +16,11 @@
 
 
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 
-from wger.core.models import UserProfile, UserCache
+from wger.core.models import Language, UserProfile, UserCache
 from wger.utils.helpers import disable_for_loaddata
+from wger.utils.language import reset_language_cache
 
 
 @disable_for_loaddata
@@ -40,5 +41,14 @@ def create_user_cache(sender, instance, created, **kwargs):
         UserCache.objects.create(user=instance)
 
 
+def reset_language(sender, instance, **kwargs):
+    '''
+    Removes the changed language from the caches
+    '''
+    reset_language_cache(instance)
+
+
 post_save.connect(create_user_profile, sender=User)
 post_save.connect(create_user_cache, sender=User)
+post_save.connect(reset_language, sender=Language)
+post_delete.connect(reset_language, sender=Language)
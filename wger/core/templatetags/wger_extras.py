@@ -103,6 +103,16 @@ def render_weight_log(log, div_uuid, user=None):
             'user': user}
 
 
+@register.inclusion_tag('tags/exercise_statistics.html')
+def render_exercise_statistics(statistics, user=None):
+    '''
+    Renders the summaries of a user's logs for an exercise, one per weight unit
+    '''
+
+    return {'statistics': statistics,
+            'user': user}
+
+
 @register.inclusion_tag('tags/license-sidebar.html')
 def license_sidebar(license, author=None):
     '''
@@ -24,7 +24,9 @@ from django.core.urlresolvers import NoReverseMatch
 from django.core.cache import cache
 from django.conf import settings
 from django.test import TestCase
+from wger.utils.cache import local_workout_canonical_stats
 from wger.utils.constants import TWOPLACES
+from wger.utils.language import local_language_cache
 
 
 STATUS_CODES_FAIL = (302, 403, 404)
@@ -142,6 +144,8 @@ class BaseTestCase(object):
         '''
         del os.environ['RECAPTCHA_TESTING']
         cache.clear()
+        local_language_cache.clear()
+        local_workout_canonical_stats.clear()
 
         # Clear MEDIA_ROOT folder
         shutil.rmtree(self.media_root)
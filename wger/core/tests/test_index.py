@@ -12,12 +12,17 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import datetime
 
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 
+from wger.core.dashboard import get_dashboard_summary
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 from wger.manager.models import Workout
 from wger.nutrition.models import NutritionPlan
+from wger.utils.cache import cache_mapper
 from wger.weight.models import WeightEntry
 
 
@@ -94,3 +99,49 @@ class DashboardTestCase(WorkoutManagerTestCase):
 
         self.user_login('admin')
         self.dashboard()
+
+
+class DashboardSummaryTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the cached summary of the dashboard
+    '''
+
+    def test_cache(self):
+        '''
+        Test that the summary is only built once
+        '''
+        user = User.objects.get(username='admin')
+        get_dashboard_summary(user)
+        with self.assertNumQueries(0):
+            summary = get_dashboard_summary(user)
+        self.assertEqual(summary['current_workout'].pk, 2)
+
+    def test_dashboard_queries(self):
+        '''
+        Test the number of queries of the dashboard, with an empty and a
+        filled cache
+        '''
+        self.user_login('admin')
+        with self.assertNumQueries(21):
+            response = self.client.get(reverse('core:dashboard'))
+        self.assertTrue(response.context['nutritional_info'])
+
+        # Only the session, the user and its profile, permissions and gym
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('core:dashboard'))
+        self.assertEqual(response.context['current_workout'].pk, 2)
+        self.assertFalse(hasattr(response.context['plan'], '_user_cache'))
+
+    def test_cache_reset(self):
+        '''
+        Test that the summary is built again when the user's data changes
+        '''
+        user = User.objects.get(username='admin')
+        get_dashboard_summary(user)
+        WeightEntry.objects.create(user=user, weight=90, date=datetime.date(2015, 1, 1))
+        self.assertFalse(cache.get(cache_mapper.get_dashboard_summary(user.pk)))
+        self.assertEqual(get_dashboard_summary(user)['weight'].weight, 90)
+
+        Workout.objects.get(pk=2).delete()
+        self.assertFalse(cache.get(cache_mapper.get_dashboard_summary(user.pk)))
+        self.assertNotEqual(get_dashboard_summary(user)['current_workout'].pk, 2)
@@ -14,20 +14,33 @@
 
 import datetime
 import random
+from importlib import import_module
 
 from django.contrib.auth.models import User
 from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import six
 
-from wger.core.demo import create_demo_entries, create_temporary_user
+from wger.core.demo import (
+    claim_pool_user,
+    create_demo_entries,
+    create_pool_user,
+    create_temporary_user,
+    get_guest_pool_depth
+)
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 from wger.manager.models import (Day,
                                  Schedule,
                                  ScheduleStep,
+                                 Set,
+                                 Setting,
                                  Workout,
                                  WorkoutLog)
-from wger.nutrition.models import Meal
+from wger.nutrition.models import Meal, MealItem
 from wger.nutrition.models import NutritionPlan
+from wger.utils.cache import get_guest_pool_stats
 from wger.weight.models import WeightEntry
 
 
@@ -186,3 +199,175 @@ class DemoUserTestCase(WorkoutManagerTestCase):
         self.assertEqual(self.count_temp_users(), 18)
         call_command('delete-temp-users')
         self.assertEqual(self.count_temp_users(), 2)
+
+    def test_command_delete_old_users_dry_run(self):
+        '''
+        Tests that the management command doesn't delete anything in dry run mode
+        '''
+        for i in range(0, 3):
+            create_temporary_user()
+        User.objects.filter().update(date_joined='2013-01-01 00:00+01:00')
+
+        out = six.StringIO()
+        call_command('delete-temp-users', dry_run=True, stdout=out)
+        self.assertIn('Would delete 4 temporary users', out.getvalue())
+        self.assertEqual(self.count_temp_users(), 4)
+
+    def test_command_delete_old_users_data(self):
+        '''
+        Tests that the management command deletes the data of the users in chunks
+        '''
+        for i in range(0, 3):
+            create_demo_entries(create_temporary_user())
+        User.objects.filter().update(date_joined='2013-01-01 00:00+01:00')
+        keep = create_temporary_user()
+        create_demo_entries(keep)
+        log_count = WorkoutLog.objects.exclude(user__userprofile__is_temporary=True).count()
+        plan_count = NutritionPlan.objects.exclude(user__userprofile__is_temporary=True).count()
+
+        call_command('delete-temp-users', chunk_size=2, stdout=six.StringIO())
+        self.assertEqual(self.count_temp_users(), 1)
+
+        # Only the data of the new temporary user and the regular users is left
+        users = User.objects.exclude(pk=keep.pk).filter(userprofile__is_temporary=False)
+        self.assertEqual(Workout.objects.exclude(user__in=users).count(), 4)
+        self.assertEqual(Day.objects.exclude(training__user__in=users).count(), 2)
+        self.assertEqual(WorkoutLog.objects.count(), log_count + 56)
+        self.assertEqual(ScheduleStep.objects.exclude(schedule__user__in=users).count(), 6)
+        self.assertEqual(Meal.objects.exclude(plan__user__in=users).count(), 3)
+        self.assertEqual(NutritionPlan.objects.count(), plan_count + 1)
+        self.assertEqual(WeightEntry.objects.filter(user=keep).count(), 19)
+        self.assertEqual(WeightEntry.objects.exclude(user__in=users).count(), 19)
+
+        # No rows pointing to deleted objects are left
+        sets = Set.objects.values('pk')
+        self.assertFalse(Setting.objects.exclude(set_id__in=sets).exists())
+        self.assertFalse(Set.exercises.through.objects.exclude(set_id__in=sets).exists())
+        self.assertFalse(Day.day.through.objects.exclude(day_id__in=Day.objects.values('pk'))
+                         .exists())
+        self.assertFalse(MealItem.objects.exclude(meal_id__in=Meal.objects.values('pk')).exists())
+
+    def test_command_delete_old_users_queries(self):
+        '''
+        Tests that the number of queries does not depend on the number of users
+        or their entries, except for the batches of the deletes
+        '''
+        def count_queries(amount):
+            for i in range(amount):
+                create_demo_entries(create_temporary_user())
+            User.objects.filter(userprofile__is_temporary=True) \
+                .update(date_joined='2013-01-01 00:00+01:00')
+            with CaptureQueriesContext(connection) as queries:
+                call_command('delete-temp-users', stdout=six.StringIO())
+            self.assertEqual(self.count_temp_users(), 0)
+            return len(queries.captured_queries)
+
+        # The first run also deletes the temporary user of the fixtures.
+        # Django deletes at most 100 rows per query, so the 168 logs of three
+        # users need one more
+        count_queries(1)
+        self.assertEqual(count_queries(1) + 1, count_queries(3))
+
+
+class GuestPoolTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the pool of guest accounts
+    '''
+
+    def test_fill_pool(self):
+        '''
+        Tests that the management command fills the pool with demo users
+        '''
+        call_command('fill-guest-pool', size=2, stdout=six.StringIO())
+        self.assertEqual(get_guest_pool_depth(), 2)
+        user = User.objects.filter(userprofile__is_pooled=True).first()
+        self.assertTrue(user.userprofile.is_temporary)
+        self.assertFalse(user.has_usable_password())
+        self.assertEqual(Workout.objects.filter(user=user).count(), 4)
+
+        # Only the missing accounts are created
+        call_command('fill-guest-pool', size=3, stdout=six.StringIO())
+        self.assertEqual(get_guest_pool_depth(), 3)
+
+    def test_claim_user(self):
+        '''
+        Tests that guests get an account from the pool
+        '''
+        user = create_pool_user()
+        user_count = User.objects.count()
+
+        self.client.get(reverse('core:dashboard'))
+        self.assertEqual(User.objects.count(), user_count)
+        self.assertEqual(self.client.session['_auth_user_id'], str(user.pk))
+        self.assertTrue(self.client.session['has_demo_data'])
+        self.assertEqual(get_guest_pool_depth(), 0)
+        self.assertEqual(get_guest_pool_stats()['claimed'], 1)
+
+        # An account can only be claimed once
+        self.assertIsNone(claim_pool_user())
+
+        # The pool is empty, the next guest gets a new account
+        self.client.logout()
+        self.client.get(reverse('core:dashboard'))
+        self.assertEqual(User.objects.count(), user_count + 1)
+        self.assertFalse(self.client.session['has_demo_data'])
+        self.assertEqual(get_guest_pool_stats()['created'], 1)
+
+    def test_command_delete_old_pool_users(self):
+        '''
+        Tests that the accounts waiting in the pool are not deleted, even if
+        they are old
+        '''
+        user = create_pool_user()
+        User.objects.filter(pk=user.pk).update(date_joined='2013-01-01 00:00+01:00')
+        call_command('delete-temp-users', stdout=six.StringIO())
+        self.assertEqual(get_guest_pool_depth(), 1)
+        self.assertEqual(Workout.objects.filter(user=user).count(), 4)
+
+    def test_delete_users_claimed(self):
+        '''
+        Tests that an account claimed after the users to delete were selected
+        is kept
+        '''
+        command = import_module('wger.core.management.commands.delete-temp-users')
+        user = create_pool_user()
+        User.objects.filter(pk=user.pk).update(date_joined='2013-01-01 00:00+01:00')
+        temporary = create_temporary_user()
+        User.objects.filter(pk=temporary.pk).update(date_joined='2013-01-01 00:00+01:00')
+        user_ids = [user.pk, temporary.pk]
+
+        self.assertEqual(claim_pool_user(), user)
+        self.assertEqual(command.delete_users(user_ids), 1)
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+        self.assertEqual(Workout.objects.filter(user=user).count(), 4)
+        self.assertFalse(User.objects.filter(pk=temporary.pk).exists())
+
+    def test_demo_entries_pool_user(self):
+        '''
+        Tests that no demo data is added to the accounts from the pool
+        '''
+        user = create_pool_user()
+        self.client.get(reverse('core:user:demo-entries'))
+        self.assertEqual(self.client.session['_auth_user_id'], str(user.pk))
+        self.assertEqual(Workout.objects.filter(user=user).count(), 4)
+
+    def test_rate_limit(self):
+        '''
+        Tests that the number of guest accounts per IP address is limited
+        '''
+        with self.settings(WGER_SETTINGS={'USE_RECAPTCHA': False,
+                                          'REMOVE_WHITESPACE': False,
+                                          'ALLOW_REGISTRATION': True,
+                                          'ALLOW_GUEST_USERS': True,
+                                          'GUEST_USER_RATE_LIMIT': (2, 3600),
+                                          'TWITTER': False}):
+            user_count = User.objects.count()
+            for i in range(3):
+                self.client.logout()
+                self.client.get(reverse('core:dashboard'))
+            self.assertEqual(User.objects.count(), user_count + 2)
+            self.assertEqual(get_guest_pool_stats()['limited'], 1)
+
+            # Other addresses are not affected
+            self.client.get(reverse('core:dashboard'), REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(User.objects.count(), user_count + 3)
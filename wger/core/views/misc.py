@@ -19,7 +19,6 @@ import logging
 from django.conf import settings
 from django.shortcuts import render
 from django.http import HttpResponseRedirect
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse, reverse_lazy
 from django.core import mail
 from django.utils.translation import ugettext as _
@@ -27,17 +26,12 @@ from django.views.generic.edit import FormView
 from django.views.generic import TemplateView
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.contrib.auth import login as django_login
 from django.template.loader import render_to_string
 
 
 from wger.core.forms import FeedbackRegisteredForm, FeedbackAnonymousForm
-from wger.core.demo import create_demo_entries, create_temporary_user
-from wger.core.models import DaysOfWeek
-from wger.manager.models import Schedule
-from wger.nutrition.models import NutritionPlan
-from wger.weight.models import WeightEntry
-from wger.weight.helpers import get_last_entries
+from wger.core.demo import create_demo_entries, login_guest_user
+from wger.core.dashboard import get_dashboard_summary
 
 
 logger = logging.getLogger(__name__)
@@ -67,13 +61,13 @@ def demo_entries(request):
          and not request.session['has_demo_data'])):
         # If we reach this from a page that has no user created by the
         # middleware, do that now
-        if not request.user.is_authenticated():
-            user = create_temporary_user()
-            django_login(request, user)
+        if not request.user.is_authenticated() and not login_guest_user(request):
+            return HttpResponseRedirect(reverse('core:user:login'))
 
-        # OK, continue
-        create_demo_entries(request.user)
-        request.session['has_demo_data'] = True
+        # OK, continue. Accounts from the guest pool already have demo data
+        if not request.session['has_demo_data']:
+            create_demo_entries(request.user)
+            request.session['has_demo_data'] = True
         messages.success(request, _('We have created sample workout, workout schedules, weight '
                                     'logs, (body) weight and nutrition plan entries so you can '
                                     'better see what  this site can do. Feel free to edit or '
@@ -90,51 +84,34 @@ def dashboard(request):
 
     template_data = {}
 
-    # Load the last workout, either from a schedule or a 'regular' one
-    (current_workout, schedule) = Schedule.objects.get_current_workout(request.user)
+    # The workout, nutrition plan and weight entries are cached
+    summary = get_dashboard_summary(request.user)
 
-    template_data['current_workout'] = current_workout
-    template_data['schedule'] = schedule
-
-    # Load the last nutritional plan, if one exists
-    try:
-        plan = NutritionPlan.objects.filter(user=request.user).latest('creation_date')
-    except ObjectDoesNotExist:
-        plan = False
-    template_data['plan'] = plan
-
-    # Load the last logged weight entry, if one exists
-    try:
-        weight = WeightEntry.objects.filter(user=request.user).latest('date')
-    except ObjectDoesNotExist:
-        weight = False
-    template_data['weight'] = weight
-    template_data['last_weight_entries'] = get_last_entries(request.user)
+    template_data['current_workout'] = summary['current_workout']
+    template_data['schedule'] = summary['schedule']
+    template_data['workout_days'] = summary['workout_days']
+    template_data['plan'] = summary['plan']
+    template_data['weight'] = summary['weight']
+    template_data['last_weight_entries'] = summary['last_weight_entries']
 
     # Format a bit the days so it doesn't have to be done in the template
-    used_days = {}
-    if current_workout:
-        for day in current_workout.day_set.select_related():
-            for day_of_week in day.day.select_related():
-                used_days[day_of_week.id] = day.description
-
+    used_days = summary['used_days']
     week_day_result = []
-    for week in DaysOfWeek.objects.all():
-        day_has_workout = False
-
-        if week.id in used_days:
-            day_has_workout = True
-            week_day_result.append((_(week.day_of_week), used_days[week.id], True))
-
-        if not day_has_workout:
-            week_day_result.append((_(week.day_of_week), _('Rest day'), False))
+    for day_id, day_of_week in summary['weekdays']:
+        if day_id in used_days:
+            week_day_result.append((_(day_of_week), used_days[day_id], True))
+        else:
+            week_day_result.append((_(day_of_week), _('Rest day'), False))
 
     template_data['weekdays'] = week_day_result
 
+    plan = summary['plan']
     if plan:
 
-        # Load the nutritional info
-        template_data['nutritional_info'] = plan.get_nutritional_values()
+        # Load the nutritional info, the plan belongs to the current user
+        template_data['nutritional_info'] = \
+            plan.calculate_nutritional_values(summary['plan_weight_entry'],
+                                              request.user.userprofile.use_metric)
 
     return render(request, 'index.html', template_data)
 
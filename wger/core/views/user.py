@@ -487,8 +487,10 @@ class UserDetailView(LoginRequiredMixin, WgerMultiplePermissionRequiredMixin, De
         context['workouts'] = out
         context['weight_entries'] = WeightEntry.objects.filter(user=self.object)\
             .order_by('-date')[:5]
-        context['nutrition_plans'] = NutritionPlan.objects.filter(user=self.object)\
-            .order_by('-creation_date')[:5]
+        nutrition_plans = NutritionPlan.objects.filter(user=self.object)\
+            .select_related('user__userprofile').order_by('-creation_date')[:5]
+        context['nutrition_plans'] = \
+            NutritionPlan.objects.prefetch_nutritional_values(nutrition_plans)
         context['session'] = WorkoutSession.objects.filter(user=self.object).order_by('-date')[:10]
         context['admin_notes'] = AdminUserNote.objects.filter(member=self.object)[:5]
         context['contracts'] = Contract.objects.filter(member=self.object)[:5]
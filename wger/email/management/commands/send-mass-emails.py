@@ -14,27 +14,159 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import time
+import logging
+import datetime
+from optparse import make_option
+
 from django.core import mail
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils.timezone import now
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from wger.email.models import CronEntry
 
 
+logger = logging.getLogger(__name__)
+
+
 class Command(BaseCommand):
     '''
     Sends the prepared mass emails
+
+    The entries of a batch are claimed in a short transaction before they are
+    sent, so that several workers running at the same time don't send the same
+    emails twice. Claims older than CLAIM_TIMEOUT, e.g. from a worker that was
+    killed, are given to the next worker.
+
+    Entries that could not be sent keep their claim, so they are only tried
+    again after CLAIM_TIMEOUT and after the entries that didn't fail yet. They
+    are removed after MAX_ATTEMPTS failed attempts.
     '''
 
+    CLAIM_TIMEOUT = datetime.timedelta(hours=1)
+    MAX_ATTEMPTS = 5
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    dest='batch_size',
+                    default=100,
+                    help='Number of emails sent per run (default: 100)'),
+        make_option('--rate',
+                    action='store',
+                    type='float',
+                    dest='rate',
+                    default=0,
+                    help='Maximum number of emails sent per second, 0 means '
+                         'no limit (default: 0)'),
+    )
+
+    help = 'Send the prepared mass emails'
+
     def handle(self, **options):
         '''
         Send some mails and remove them from the list
         '''
-        if CronEntry.objects.count():
-            for email in CronEntry.objects.all()[:100]:
-                mail.send_mail(email.log.subject,
-                               email.log.body,
-                               settings.DEFAULT_FROM_EMAIL,
-                               [email.email],
-                               fail_silently=True)
-                email.delete()
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be a positive number')
+        if options['rate'] < 0:
+            raise CommandError('The rate can\'t be negative')
+
+        start = time.time()
+        entries = self.claim_entries(options['batch_size'])
+        if not entries:
+            return
+
+        sent, errors = self.send_emails(entries, options['rate'])
+        failed = [entry for entry in entries if entry.pk in errors]
+        dropped = [entry for entry in failed if entry.attempts + 1 >= self.MAX_ATTEMPTS]
+        with transaction.atomic():
+            CronEntry.objects.filter(pk__in=sent + [entry.pk for entry in dropped]).delete()
+            for entry in failed:
+                if entry not in dropped:
+                    CronEntry.objects.filter(pk=entry.pk) \
+                        .update(attempts=F('attempts') + 1, last_error=errors[entry.pk])
+
+        elapsed = time.time() - start
+        for entry in dropped:
+            logger.error('Mass email to {0} could not be sent after {1} attempts, giving up: {2}'
+                         .format(entry.email, self.MAX_ATTEMPTS, errors[entry.pk]))
+        if len(failed) > len(dropped):
+            logger.warning('{0} mass emails could not be sent, they will be tried again'
+                           .format(len(failed) - len(dropped)))
+
+        if int(options['verbosity']) >= 2:
+            self.stdout.write('Sent {0} emails in {1:.2f}s ({2:.1f} emails/s), {3} failed'
+                              .format(len(sent),
+                                      elapsed,
+                                      len(sent) / elapsed if elapsed else 0,
+                                      len(failed)))
+
+    @classmethod
+    def claim_entries(cls, batch_size):
+        '''
+        Claims a batch of entries, the rows are only locked until the claim
+        is saved. Entries with fewer failed attempts come first
+
+        :param batch_size: maximum number of entries to claim
+        :return: list of CronEntry objects
+        '''
+        claimed = now()
+        with transaction.atomic():
+            entries = list(CronEntry.objects.select_for_update()
+                           .filter(Q(claimed__isnull=True) |
+                                   Q(claimed__lt=claimed - cls.CLAIM_TIMEOUT))
+                           .select_related('log')
+                           .order_by('attempts', 'pk')[:batch_size])
+            CronEntry.objects.filter(pk__in=[entry.pk for entry in entries]) \
+                .update(claimed=claimed)
+        return entries
+
+    @staticmethod
+    def send_emails(entries, rate=0):
+        '''
+        Sends the emails of the entries over one connection
+
+        :param entries: list of CronEntry objects
+        :param rate: maximum number of emails per second, 0 means no limit
+        :return: list with the IDs of the entries that were sent and dictionary
+                 with the errors of the entries that failed, by ID
+        '''
+        interval = 1.0 / rate if rate else 0
+        sent = []
+        errors = {}
+        connection = mail.get_connection()
+        try:
+            connection.open()
+        except Exception as error:
+            return sent, dict.fromkeys([entry.pk for entry in entries], repr(error))
+
+        try:
+            for entry in entries:
+                started = time.time()
+                message = mail.EmailMessage(entry.log.subject,
+                                            entry.log.body,
+                                            settings.DEFAULT_FROM_EMAIL,
+                                            [entry.email],
+                                            connection=connection)
+                try:
+                    if connection.send_messages([message]):
+                        sent.append(entry.pk)
+                    else:
+                        errors[entry.pk] = 'The email was not accepted'
+                except Exception as error:
+                    errors[entry.pk] = repr(error)
+
+                wait = interval - (time.time() - started)
+                if wait > 0:
+                    time.sleep(wait)
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return sent, errors
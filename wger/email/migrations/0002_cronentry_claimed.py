@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cronentry',
+            name='claimed',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('email', '0002_cronentry_claimed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cronentry',
+            name='attempts',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cronentry',
+            name='last_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
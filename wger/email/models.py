@@ -80,6 +80,24 @@ class CronEntry(models.Model):
     The email address
     '''
 
+    claimed = models.DateTimeField(null=True,
+                                   editable=False)
+    '''
+    When a worker started sending the email, empty if it is waiting
+    '''
+
+    attempts = models.IntegerField(default=0,
+                                   editable=False)
+    '''
+    Number of failed attempts to send the email
+    '''
+
+    last_error = models.TextField(blank=True,
+                                  editable=False)
+    '''
+    Error of the last failed attempt
+    '''
+
     def __unicode__(self):
         '''
         Return a more human-readable representation
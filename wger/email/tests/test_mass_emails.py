@@ -0,0 +1,159 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import datetime
+import smtplib
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils import six
+from django.utils.timezone import now
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.email.models import CronEntry, Log
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    '''
+    Email backend that refuses the addresses containing 'fail'
+    '''
+
+    def send_messages(self, messages):
+        refused = [message.to[0] for message in messages if 'fail' in message.to[0]]
+        if refused:
+            raise smtplib.SMTPRecipientsRefused({address: (550, 'Unknown user')
+                                                 for address in refused})
+        return super(FailingEmailBackend, self).send_messages(messages)
+
+
+class MassEmailTestCase(WorkoutManagerTestCase):
+    '''
+    Tests sending the prepared mass emails
+    '''
+
+    def setUp(self):
+        super(MassEmailTestCase, self).setUp()
+        self.log = Log.objects.create(user_id=1, gym_id=1, subject='Subject', body='Body')
+        CronEntry.objects.bulk_create([CronEntry(log=self.log,
+                                                 email='user{0}@example.com'.format(i))
+                                       for i in range(15)])
+
+    def test_send(self):
+        '''
+        Test sending the emails in batches
+        '''
+        out = six.StringIO()
+        call_command('send-mass-emails', batch_size=10, verbosity=2, stdout=out)
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(CronEntry.objects.count(), 5)
+        self.assertIn('Sent 10 emails', out.getvalue())
+
+        email = mail.outbox[0]
+        self.assertEqual(email.subject, 'Subject')
+        self.assertEqual(email.body, 'Body')
+        self.assertEqual(email.to, ['user0@example.com'])
+
+        call_command('send-mass-emails', batch_size=10)
+        self.assertEqual(len(mail.outbox), 15)
+        self.assertFalse(CronEntry.objects.exists())
+
+        # Nothing to do
+        call_command('send-mass-emails')
+        self.assertEqual(len(mail.outbox), 15)
+
+    def test_queries(self):
+        '''
+        Test that the number of queries does not depend on the number of emails
+        '''
+        # Claim: savepoint, select, update and release
+        # Finish: savepoint, delete and release
+        with self.assertNumQueries(7):
+            call_command('send-mass-emails')
+        self.assertEqual(len(mail.outbox), 15)
+
+    @override_settings(EMAIL_BACKEND='wger.email.tests.test_mass_emails.FailingEmailBackend')
+    def test_send_failed(self):
+        '''
+        Test that emails that could not be sent are kept
+        '''
+        CronEntry.objects.create(log=self.log, email='fail@example.com')
+        call_command('send-mass-emails')
+        self.assertEqual(len(mail.outbox), 15)
+        self.assertEqual(list(CronEntry.objects.values_list('email', flat=True)),
+                         ['fail@example.com'])
+
+    def test_claimed(self):
+        '''
+        Test that entries claimed by another worker are skipped, unless the
+        claim is too old
+        '''
+        entries = CronEntry.objects.order_by('pk')
+        CronEntry.objects.filter(pk__in=entries[:5].values_list('pk', flat=True)) \
+            .update(claimed=now())
+        CronEntry.objects.filter(pk__in=entries[5:7].values_list('pk', flat=True)) \
+            .update(claimed=now() - datetime.timedelta(hours=2))
+
+        call_command('send-mass-emails')
+        self.assertEqual(len(mail.outbox), 10)
+        self.assertEqual(CronEntry.objects.count(), 5)
+        self.assertFalse(CronEntry.objects.filter(claimed__isnull=True).exists())
+
+    @override_settings(EMAIL_BACKEND='wger.email.tests.test_mass_emails.FailingEmailBackend')
+    def test_send_failed_attempts(self):
+        '''
+        Test that emails that could not be sent keep their claim and the error
+        '''
+        CronEntry.objects.create(log=self.log, email='fail@example.com')
+        call_command('send-mass-emails')
+
+        entry = CronEntry.objects.get()
+        self.assertIsNotNone(entry.claimed)
+        self.assertEqual(entry.attempts, 1)
+        self.assertIn('Unknown user', entry.last_error)
+
+    @override_settings(EMAIL_BACKEND='wger.email.tests.test_mass_emails.FailingEmailBackend')
+    def test_send_failed_persistent(self):
+        '''
+        Test that an address that is always refused is tried again after the
+        claim timeout, after the other entries, and removed in the end
+        '''
+        CronEntry.objects.all().delete()
+        CronEntry.objects.create(log=self.log, email='fail@example.com')
+        for attempt in range(1, 5):
+            call_command('send-mass-emails')
+            self.assertEqual(CronEntry.objects.get().attempts, attempt)
+
+            # Not tried again before the claim times out
+            call_command('send-mass-emails')
+            self.assertEqual(CronEntry.objects.get().attempts, attempt)
+
+            # New entries are sent first
+            CronEntry.objects.create(log=self.log, email='new@example.com')
+            CronEntry.objects.update(claimed=now() - datetime.timedelta(hours=2))
+            call_command('send-mass-emails', batch_size=1)
+            self.assertEqual(mail.outbox[-1].to, ['new@example.com'])
+            self.assertEqual(CronEntry.objects.get().attempts, attempt)
+
+        call_command('send-mass-emails')
+        self.assertFalse(CronEntry.objects.exists())
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_rate(self):
+        '''
+        Test limiting the number of emails per second
+        '''
+        call_command('send-mass-emails', batch_size=3, rate=100)
+        self.assertEqual(len(mail.outbox), 3)
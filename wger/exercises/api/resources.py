@@ -18,7 +18,6 @@ from tastypie import fields
 from tastypie.resources import ModelResource
 from tastypie.constants import ALL, ALL_WITH_RELATIONS
 from easy_thumbnails.alias import aliases
-from easy_thumbnails.files import get_thumbnailer
 
 from wger.core.api.resources import LanguageResource, LicenseResource
 
@@ -98,9 +97,8 @@ class ExerciseImageResource(ModelResource):
         Also send the URLs for the thumbnailed pictures
         '''
         thumbnails = {}
-        for alias in aliases.all():
-            t = get_thumbnailer(bundle.obj.image)
-            thumbnails[alias] = {'url': t.get_thumbnail(aliases.get(alias)).url,
+        for alias, url in bundle.obj.get_thumbnails().items():
+            thumbnails[alias] = {'url': url,
                                  'settings': aliases.get(alias)}
 
         bundle.data['thumbnails'] = thumbnails
@@ -21,7 +21,6 @@ from rest_framework.response import Response
 from rest_framework.decorators import detail_route, api_view
 
 from easy_thumbnails.alias import aliases
-from easy_thumbnails.files import get_thumbnailer
 
 from django.utils.translation import ugettext as _
 
@@ -35,6 +34,7 @@ from wger.exercises.api.serializers import (
     ExerciseCommentSerializer
 )
 from wger.exercises.models import (
+    EXERCISE_SEARCH_LIMIT,
     Exercise,
     Equipment,
     ExerciseCategory,
@@ -91,30 +91,21 @@ def search(request):
     if q:
         languages = load_item_languages(LanguageConfig.SHOW_ITEM_EXERCISES,
                                         language_code=request.GET.get('language', None))
-        exercises = (Exercise.objects.filter(name__icontains=q)
-                     .filter(language__in=languages)
-                     .filter(status=Exercise.STATUS_ACCEPTED)
-                     .order_by('category__name', 'name')
-                     .distinct())
-
-        for exercise in exercises:
-            if exercise.main_image:
-                image_obj = exercise.main_image
-                image = image_obj.image.url
-                t = get_thumbnailer(image_obj.image)
-                thumbnail = t.get_thumbnail(aliases.get('micro_cropped')).url
-            else:
-                image = None
-                thumbnail = None
+        try:
+            limit = min(int(request.GET.get('limit', EXERCISE_SEARCH_LIMIT)),
+                        EXERCISE_SEARCH_LIMIT)
+        except ValueError:
+            limit = EXERCISE_SEARCH_LIMIT
 
+        for exercise in Exercise.objects.search(q, languages, limit):
             exercise_json = {
-                'value': exercise.name,
+                'value': exercise['name'],
                 'data': {
-                    'id': exercise.id,
-                    'name': exercise.name,
-                    'category': _(exercise.category.name),
-                    'image': image,
-                    'image_thumbnail': thumbnail
+                    'id': exercise['id'],
+                    'name': exercise['name'],
+                    'category': _(exercise['category']),
+                    'image': exercise['image'],
+                    'image_thumbnail': exercise['image_thumbnail']
                 }
             }
             results.append(exercise_json)
@@ -168,10 +159,9 @@ class ExerciseImageViewSet(viewsets.ModelViewSet):
             return Response([])
 
         thumbnails = {}
-        for alias in aliases.all():
-            t = get_thumbnailer(image.image)
+        for alias, url in image.get_thumbnails().items():
             thumbnails[alias] = {
-                'url': t.get_thumbnail(aliases.get(alias)).url,
+                'url': url,
                 'settings': aliases.get(alias)
             }
         thumbnails['original'] = image.image.url
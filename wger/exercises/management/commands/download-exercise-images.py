@@ -14,23 +14,45 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
-import requests
 import os
-
-from wger import get_version
+from multiprocessing.pool import ThreadPool
 from optparse import make_option
+
+import requests
+from requests.adapters import HTTPAdapter
 from requests.utils import default_user_agent
 from django.core.exceptions import ImproperlyConfigured
 from django.core.management.base import BaseCommand, CommandError
-from django.core.files import File
-from django.core.files.temp import NamedTemporaryFile
+from django.core.files.base import ContentFile
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 from django.conf import settings
+from django.utils.six.moves.urllib.parse import urljoin
 
+from wger import get_version
 from wger.exercises.models import Exercise, ExerciseImage
 
 
+EXERCISE_API = "{0}/api/v2/exercise/?limit=100"
+IMAGE_API = "{0}/api/v2/exerciseimage/?limit=100"
+
+
+def get_results(session, url):
+    '''
+    Returns the results of all the pages of a paginated API list
+
+    :param session: the requests session used to connect to the server
+    :param url: the URL of the first page
+    '''
+    while url:
+        response = session.get(url)
+        response.raise_for_status()
+        data = response.json()
+        for result in data['results']:
+            yield result
+        url = data.get('next')
+
+
 class Command(BaseCommand):
     '''
     Download exercise images from wger.de and updates the local database
@@ -38,6 +60,9 @@ class Command(BaseCommand):
     The script assumes that the local IDs correspond to the remote ones, which
     is the case if the user installed the exercises from the JSON fixtures.
     Otherwise, the exercise is simply skipped
+
+    Images already present locally are skipped without contacting the server,
+    so an interrupted run can be resumed by simply starting the script again.
     '''
 
     option_list = BaseCommand.option_list + (
@@ -46,6 +71,12 @@ class Command(BaseCommand):
                     dest='remote_url',
                     default='https://wger.de',
                     help='Remote URL to fetch the exercises from (default: https://wger.de)'),
+        make_option('--threads',
+                    action='store',
+                    dest='threads',
+                    type='int',
+                    default=4,
+                    help='Number of images downloaded at the same time (default: 4)'),
     )
 
     help = ('Download exercise images from wger.de and update the local database\n'
@@ -67,67 +98,99 @@ class Command(BaseCommand):
         except ValidationError:
             raise CommandError('Please enter a valid URL')
 
-        exercise_api = "{0}/api/v2/exercise/?limit=999"
-        image_api = "{0}/api/v2/exerciseimage/?exercise={1}"
-        thumbnail_api = "{0}/api/v2/exerciseimage/{1}/thumbnails/"
+        threads = options['threads']
+        if threads < 1:
+            raise CommandError('The number of threads must be at least 1')
 
-        headers = {'User-agent': default_user_agent('wger/{} + requests'.format(get_version()))}
+        # One session for all requests, so the connections to the server are
+        # reused. The pool needs one connection per thread.
+        session = requests.Session()
+        session.headers['User-agent'] = default_user_agent('wger/{} + requests'
+                                                           .format(get_version()))
+        adapter = HTTPAdapter(pool_maxsize=threads)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
 
-        # Get all exercises
-        result = requests.get(exercise_api.format(remote_url), headers=headers).json()
-        for exercise_json in result['results']:
-            exercise_name = exercise_json['name'].encode('utf-8')
-            exercise_uuid = exercise_json['uuid']
-            exercise_id = exercise_json['id']
+        pool = ThreadPool(threads)
+        try:
+            self.sync_images(session, pool, remote_url, int(options['verbosity']))
+        finally:
+            pool.close()
+            pool.join()
+            session.close()
+
+    def sync_images(self, session, pool, remote_url, verbosity):
+        '''
+        Downloads the images that are not present locally
+
+        The images are downloaded in the threads of the pool, while they are
+        saved to the database here, as they arrive.
+        '''
+
+        # Local exercises and images
+        exercises = {exercise.uuid: exercise for exercise in Exercise.objects.all()}
+        local_images = set(ExerciseImage.objects.values_list('pk', flat=True))
+
+        # Remote exercises, by their remote ID
+        remote_exercises = {}
+        for exercise_json in get_results(session, EXERCISE_API.format(remote_url)):
+            exercise = exercises.get(exercise_json['uuid'])
+            if exercise:
+                remote_exercises[exercise_json['id']] = exercise
+            elif verbosity >= 2:
+                self.stdout.write(u"*** Remote exercise {0} (ID: {1}, UUID: {2}) not found "
+                                  u"in local DB, skipping...".format(exercise_json['name'],
+                                                                     exercise_json['id'],
+                                                                     exercise_json['uuid']))
+
+        pending = []
+        skipped = 0
+        for image_json in get_results(session, IMAGE_API.format(remote_url)):
+            if image_json['exercise'] not in remote_exercises:
+                continue
+
+            if image_json['id'] in local_images:
+                skipped += 1
+                if verbosity >= 2:
+                    self.stdout.write('    Image {0} already present locally, skipping...'
+                                      .format(image_json['id']))
+                continue
 
-            self.stdout.write('')
-            self.stdout.write(u"*** Processing {0} (ID: {1}, UUID: {2})".format(exercise_name,
-                                                                                exercise_id,
-                                                                                exercise_uuid))
+            image_json['image'] = urljoin(remote_url, image_json['image'])
+            pending.append(image_json)
 
+        def download(image_json):
+            '''
+            Downloads an image, returning its content or the error
+            '''
             try:
-                exercise = Exercise.objects.get(uuid=exercise_uuid)
-            except Exercise.DoesNotExist:
-                self.stdout.write('    Remote exercise not found in local DB, skipping...')
+                response = session.get(image_json['image'])
+                response.raise_for_status()
+                return image_json, response.content, None
+            except requests.RequestException as error:
+                return image_json, None, error
+
+        downloaded = 0
+        failed = 0
+        for image_json, content, error in pool.imap_unordered(download, pending):
+            image_id = image_json['id']
+            image_name = os.path.basename(image_json['image'])
+
+            if error:
+                failed += 1
+                self.stderr.write('    Could not fetch image {0} - {1}: {2}'
+                                  .format(image_id, image_name, error))
                 continue
 
-            # Get all images
-            images = requests.get(image_api.format(remote_url, exercise_id), headers=headers).json()
-
-            if images['count']:
-
-                for image_json in images['results']:
-                    image_id = image_json['id']
-                    result = requests.get(thumbnail_api.format(remote_url, image_id),
-                                          headers=headers).json()
-
-                    image_name = os.path.basename(result['original'])
-                    self.stdout.write('    Fetching image {0} - {1}'.format(image_id, image_name))
-
-                    try:
-                        image = ExerciseImage.objects.get(pk=image_id)
-                        self.stdout.write('    --> Image already present locally, skipping...')
-                        continue
-                    except ExerciseImage.DoesNotExist:
-                        self.stdout.write('    --> Image not found in local DB, creating now...')
-                        image = ExerciseImage()
-                        image.pk = image_id
-
-                    # Save the downloaded image, see link for details
-                    # http://stackoverflow.com/questions/1308386/programmatically-saving-image-to-
-                    retrieved_image = requests.get(result['original'], headers=headers)
-                    img_temp = NamedTemporaryFile(delete=True)
-                    img_temp.write(retrieved_image.content)
-                    img_temp.flush()
-
-                    image.exercise = exercise
-                    image.is_main = image_json['is_main']
-                    image.status = image_json['status']
-                    image.image.save(
-                        os.path.basename(image_name),
-                        File(img_temp),
-                    )
-                    image.save()
-
-            else:
-                self.stdout.write('    No images for this exercise, nothing to do')
+            self.stdout.write('    Fetched image {0} - {1}'.format(image_id, image_name))
+            image = ExerciseImage()
+            image.pk = image_id
+            image.exercise = remote_exercises[image_json['exercise']]
+            image.is_main = image_json['is_main']
+            image.status = image_json['status']
+            image.image.save(image_name, ContentFile(content), save=False)
+            image.save()
+            downloaded += 1
+
+        self.stdout.write('Downloaded {0} images, {1} already present, {2} failed'
+                          .format(downloaded, skipped, failed))
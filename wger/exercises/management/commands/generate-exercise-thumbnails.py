@@ -0,0 +1,107 @@
+# -*- coding: utf-8 *-*
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import json
+import multiprocessing
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from wger.exercises.models import (
+    ExerciseImage,
+    exercise_search_index
+)
+
+
+def create_thumbnails(pk):
+    '''
+    Creates the thumbnails of an image, run in the worker processes
+
+    :return: a tuple with the ID of the image, the URLs of the thumbnails and
+             an error message (if any)
+    '''
+    try:
+        return pk, ExerciseImage.objects.get(pk=pk).create_thumbnails(), None
+    except Exception as e:
+        return pk, None, str(e)
+
+
+class Command(BaseCommand):
+    '''
+    Generates the thumbnails of all exercise images
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--processes',
+                    action='store',
+                    type='int',
+                    dest='processes',
+                    default=multiprocessing.cpu_count(),
+                    help='Number of processes used to create the thumbnails '
+                         '(default: number of CPUs)'),
+        make_option('--all',
+                    action='store_true',
+                    dest='all',
+                    default=False,
+                    help='Generate the thumbnails of all images, not only of the ones '
+                         'that have none yet. Needed after changing the aliases'),
+    )
+
+    help = 'Generate the thumbnails of the exercise images for all configured aliases ' \
+           'and save their URLs with the images. Only the images without thumbnails ' \
+           '(e.g. new uploads) are processed, call this regularly via cron.'
+
+    def handle(self, **options):
+        '''
+        Process the options
+        '''
+
+        processes = options['processes']
+        if processes < 1:
+            raise CommandError('The number of processes must be a positive number')
+
+        images = ExerciseImage.objects.all()
+        if not options['all']:
+            images = images.filter(thumbnails='')
+        image_ids = list(images.values_list('pk', flat=True))
+        if processes == 1:
+            results = [create_thumbnails(pk) for pk in image_ids]
+        else:
+            # The workers must open their own database connections
+            connections.close_all()
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(create_thumbnails, image_ids)
+            finally:
+                pool.close()
+                pool.join()
+
+        generated = 0
+        for pk, urls, error in results:
+            if error:
+                self.stderr.write('* Error in image {0}: {1}'.format(pk, error))
+            else:
+                ExerciseImage.objects.filter(pk=pk).update(thumbnails=json.dumps(urls))
+                generated += 1
+
+        # The search index contains the URLs as well
+        if generated:
+            exercise_search_index.reset()
+
+        if int(options['verbosity']) >= 2:
+            self.stdout.write('* Generated the thumbnails of {0} of {1} images'
+                              .format(generated, len(image_ids)))
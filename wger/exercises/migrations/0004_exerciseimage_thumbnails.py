@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0003_auto_20160921_2000'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exerciseimage',
+            name='thumbnails',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -16,6 +16,7 @@
 # along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
 
 import six
+import json
 import uuid
 import logging
 import bleach
@@ -33,10 +34,13 @@ from django.core import mail
 from django.core.cache import cache
 from django.core.validators import MinLengthValidator
 from django.conf import settings
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
 
 from wger.core.models import Language
 from wger.utils.helpers import smart_capitalize
 from wger.utils.managers import SubmissionManager
+from wger.utils.search import SearchIndex
 from wger.utils.models import AbstractLicenseModel, AbstractSubmissionModel
 from wger.utils.cache import (
     delete_template_fragment_cache,
@@ -47,6 +51,11 @@ from wger.utils.cache import (
 
 logger = logging.getLogger(__name__)
 
+EXERCISE_SEARCH_LIMIT = 50
+'''
+Maximum number of results returned by the exercise search
+'''
+
 
 @python_2_unicode_compatible
 class Muscle(models.Model):
@@ -154,13 +163,77 @@ class ExerciseCategory(models.Model):
         super(ExerciseCategory, self).delete(*args, **kwargs)
 
 
+def load_exercise_search_entries(keys=None):
+    '''
+    Returns the entries for the exercise search index: the accepted exercises,
+    grouped by language, with their category and the URLs of their main image
+
+    The thumbnail URLs are the ones saved with the images, the images whose
+    thumbnails were not generated yet are shown without thumbnail.
+
+    :param keys: optional list with the IDs of the exercises to load
+    '''
+    main_images = ExerciseImage.objects.accepted() \
+        .filter(is_main=True, exercise__status=Exercise.STATUS_ACCEPTED) \
+        .order_by('id')
+    exercises = Exercise.objects.accepted()
+    if keys is not None:
+        main_images = main_images.filter(exercise__in=keys)
+        exercises = exercises.filter(pk__in=keys)
+
+    images = {}
+    for image in main_images:
+        images.setdefault(image.exercise_id,
+                          (image.image.url, image.get_thumbnails().get('micro_cropped')))
+
+    for pk, name, language_id, category in exercises.values_list('pk',
+                                                                 'name',
+                                                                 'language_id',
+                                                                 'category__name'):
+        image, thumbnail = images.get(pk, (None, None))
+        yield pk, name, language_id, {'id': pk,
+                                      'name': name,
+                                      'category': category,
+                                      'image': image,
+                                      'image_thumbnail': thumbnail}
+
+
+exercise_search_index = SearchIndex('exercise', load_exercise_search_entries)
+'''
+Search index with the names of the exercises
+'''
+
+
+class ExerciseManager(SubmissionManager):
+    '''
+    Custom manager for exercises
+    '''
+
+    def search(self, term, languages, limit=EXERCISE_SEARCH_LIMIT):
+        '''
+        Searches for accepted exercises whose name contains the search term
+
+        The results are ordered by their rank (see wger.utils.search) and name.
+
+        :param term: the search term
+        :param languages: the languages (or their IDs) of the exercises
+        :param limit: maximum number of results
+        :return: a list of dictionaries with the ID, name, (untranslated)
+                 category and the URLs of the main image and its thumbnail.
+                 They are shared by all searches and must not be changed.
+        '''
+        return exercise_search_index.search(term,
+                                            [cache_mapper.get_pk(i) for i in languages],
+                                            limit)
+
+
 @python_2_unicode_compatible
 class Exercise(AbstractSubmissionModel, AbstractLicenseModel, models.Model):
     '''
     Model for an exercise
     '''
 
-    objects = SubmissionManager()
+    objects = ExerciseManager()
     '''Custom manager'''
 
     category = models.ForeignKey(ExerciseCategory,
@@ -243,8 +316,8 @@ class Exercise(AbstractSubmissionModel, AbstractLicenseModel, models.Model):
             delete_template_fragment_cache('equipment-overview', language.id)
 
         # Cached workouts
-        for set in self.set_set.all():
-            reset_workout_canonical_form(set.exerciseday.training_id)
+        for set in self.set_set.select_related('exerciseday'):
+            reset_workout_canonical_form(set.exerciseday.training_id, set.exerciseday_id)
 
     def delete(self, *args, **kwargs):
         '''
@@ -262,8 +335,8 @@ class Exercise(AbstractSubmissionModel, AbstractLicenseModel, models.Model):
             delete_template_fragment_cache('equipment-overview', language.id)
 
         # Cached workouts
-        for set in self.set_set.all():
-            reset_workout_canonical_form(set.exerciseday.training.pk)
+        for set in self.set_set.select_related('exerciseday'):
+            reset_workout_canonical_form(set.exerciseday.training_id, set.exerciseday_id)
 
         super(Exercise, self).delete(*args, **kwargs)
 
@@ -376,6 +449,14 @@ class ExerciseImage(AbstractSubmissionModel, AbstractLicenseModel, models.Model)
                                               "marked by the system."))
     '''A flag indicating whether the image is the exercise's main image'''
 
+    thumbnails = models.TextField(editable=False,
+                                  blank=True,
+                                  default='')
+    '''
+    URLs of the thumbnails of all aliases, as JSON. Empty as long as they were
+    not generated, see the generate-exercise-thumbnails command
+    '''
+
     class Meta:
         '''
         Set default ordering
@@ -439,6 +520,33 @@ class ExerciseImage(AbstractSubmissionModel, AbstractLicenseModel, models.Model)
         '''
         return False
 
+    def create_thumbnails(self):
+        '''
+        Creates the thumbnails of the image for all configured aliases, if they
+        don't exist yet
+
+        :return: a dictionary with the URL of every alias
+        '''
+        thumbnailer = get_thumbnailer(self.image)
+        return {alias: thumbnailer.get_thumbnail(options).url
+                for alias, options in aliases.all().items()}
+
+    def get_thumbnails(self):
+        '''
+        Returns the saved URLs of the thumbnails of the image
+
+        The thumbnails are not created here, this is left to the
+        generate-exercise-thumbnails command.
+
+        :return: a dictionary with the URL of every alias, None if the
+                 thumbnail was not generated yet
+        '''
+        thumbnails = dict.fromkeys(aliases.all().keys())
+        if self.thumbnails:
+            saved = json.loads(self.thumbnails)
+            thumbnails.update((alias, saved.get(alias)) for alias in thumbnails)
+        return thumbnails
+
     def set_author(self, request):
         '''
         Set author and status
@@ -486,8 +594,8 @@ class ExerciseComment(models.Model):
         '''
         Reset cached workouts
         '''
-        for set in self.exercise.set_set.all():
-            reset_workout_canonical_form(set.exerciseday.training_id)
+        for set in self.exercise.set_set.select_related('exerciseday'):
+            reset_workout_canonical_form(set.exerciseday.training_id, set.exerciseday_id)
 
         super(ExerciseComment, self).save(*args, **kwargs)
 
@@ -495,8 +603,8 @@ class ExerciseComment(models.Model):
         '''
         Reset cached workouts
         '''
-        for set in self.exercise.set_set.all():
-            reset_workout_canonical_form(set.exerciseday.training.pk)
+        for set in self.exercise.set_set.select_related('exerciseday'):
+            reset_workout_canonical_form(set.exerciseday.training_id, set.exerciseday_id)
 
         super(ExerciseComment, self).delete(*args, **kwargs)
 
@@ -16,13 +16,17 @@
 
 
 from django.db.models.signals import pre_save
+from django.db.models.signals import post_save
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 from easy_thumbnails.files import get_thumbnailer
-from easy_thumbnails.signal_handlers import generate_aliases
-from easy_thumbnails.signals import saved_file
 
-from wger.exercises.models import ExerciseImage
+from wger.exercises.models import (
+    Exercise,
+    ExerciseCategory,
+    ExerciseImage,
+    exercise_search_index
+)
 
 
 @receiver(post_delete, sender=ExerciseImage)
@@ -56,6 +60,25 @@ def delete_exercise_image_on_update(sender, instance, **kwargs):
         thumbnailer.delete_thumbnails()
         instance.image.delete(save=False)
 
+        # The thumbnails of the new file are generated by the
+        # generate-exercise-thumbnails command
+        instance.thumbnails = ''
 
-# Generate thumbnails when uploading a new image
-saved_file.connect(generate_aliases)
+
+def update_exercise_search_index(sender, instance, **kwargs):
+    '''
+    Updates the entries of the search index of the exercise, of the image's
+    exercise or of the exercises of the category
+    '''
+    if sender == Exercise:
+        keys = [instance.pk]
+    elif sender == ExerciseImage:
+        keys = [instance.exercise_id]
+    else:
+        keys = list(instance.exercise_set.values_list('pk', flat=True))
+    exercise_search_index.update(keys)
+
+
+for model in (Exercise, ExerciseCategory, ExerciseImage):
+    post_save.connect(update_exercise_search_index, sender=model)
+    post_delete.connect(update_exercise_search_index, sender=model)
@@ -0,0 +1,171 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import json
+import threading
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import six
+from django.utils.six.moves import BaseHTTPServer, socketserver
+from django.utils.six.moves.urllib.parse import urlparse, parse_qs
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.exercises.models import Exercise, ExerciseImage
+
+
+class RemoteServerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+    Answers the requests of the command like the API of a wger server would
+    '''
+
+    def log_message(self, *args):
+        pass
+
+    def send_content(self, content, content_type='application/json'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_page(self, results, path, query):
+        '''
+        Sends a page with one result, to test the pagination
+        '''
+        page = int(query.get('page', ['1'])[0])
+        host, port = self.server.server_address
+        url = 'http://{0}:{1}{2}?limit=1&page={3}'.format(host, port, path, page + 1)
+        data = {'count': len(results),
+                'next': url if page < len(results) else None,
+                'previous': None,
+                'results': results[page - 1:page]}
+        self.send_content(json.dumps(data).encode('utf-8'))
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.requests.append(url.path)
+
+        if url.path == '/api/v2/exercise/':
+            self.send_page(self.server.exercises, url.path, query)
+        elif url.path == '/api/v2/exerciseimage/':
+            self.send_page(self.server.images, url.path, query)
+        elif url.path in self.server.files:
+            self.send_content(self.server.files[url.path], 'image/jpeg')
+        else:
+            self.send_error(404)
+
+
+class RemoteServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    '''
+    Local stand-in for a remote wger server
+    '''
+    daemon_threads = True
+
+
+class DownloadImagesTestCase(WorkoutManagerTestCase):
+    '''
+    Tests downloading the exercise images from a remote server
+    '''
+
+    def setUp(self):
+        super(DownloadImagesTestCase, self).setUp()
+        self.server = RemoteServer(('127.0.0.1', 0), RemoteServerHandler)
+        self.server.requests = []
+        self.server.exercises = [
+            {'id': 81, 'name': 'Remote exercise', 'uuid': Exercise.objects.get(pk=1).uuid},
+            {'id': 82, 'name': 'Remote exercise', 'uuid': Exercise.objects.get(pk=2).uuid},
+            {'id': 99, 'name': 'Unknown exercise', 'uuid': 'not-a-local-uuid'},
+        ]
+        self.server.images = [
+            {'id': 1, 'exercise': 81, 'image': '/media/present.jpg',
+             'is_main': True, 'status': '2'},
+            {'id': 10, 'exercise': 81, 'image': '/media/first.jpg',
+             'is_main': False, 'status': '2'},
+            {'id': 11, 'exercise': 82, 'image': '/media/second.jpg',
+             'is_main': True, 'status': '2'},
+            {'id': 12, 'exercise': 82, 'image': '/media/missing.jpg',
+             'is_main': False, 'status': '2'},
+            {'id': 13, 'exercise': 99, 'image': '/media/unknown.jpg',
+             'is_main': True, 'status': '2'},
+        ]
+        with open('wger/exercises/tests/protestschwein.jpg', 'rb') as image_file:
+            content = image_file.read()
+        self.server.files = {'/media/first.jpg': content,
+                             '/media/second.jpg': content,
+                             '/media/present.jpg': content,
+                             '/media/unknown.jpg': content}
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.remote_url = 'http://127.0.0.1:{0}'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(DownloadImagesTestCase, self).tearDown()
+
+    def download_images(self, threads=2):
+        '''
+        Helper function that runs the command
+        '''
+        out = six.StringIO()
+        call_command('download-exercise-images',
+                     remote_url=self.remote_url,
+                     threads=threads,
+                     stdout=out,
+                     stderr=six.StringIO())
+        return out.getvalue()
+
+    def test_download(self):
+        '''
+        Test downloading the images that are not present locally
+        '''
+        output = self.download_images()
+        self.assertIn('Downloaded 2 images, 1 already present, 1 failed', output)
+
+        image = ExerciseImage.objects.get(pk=10)
+        self.assertEqual(image.exercise_id, 1)
+        self.assertFalse(image.is_main)
+        self.assertTrue(image.image.name.startswith('exercise-images/1/first'))
+        image = ExerciseImage.objects.get(pk=11)
+        self.assertEqual(image.exercise_id, 2)
+        self.assertTrue(image.is_main)
+        self.assertFalse(ExerciseImage.objects.filter(pk__in=(12, 13)).exists())
+
+        # Only the missing images of local exercises were requested
+        self.assertEqual(sorted(path for path in self.server.requests
+                                if path.startswith('/media/')),
+                         ['/media/first.jpg', '/media/missing.jpg', '/media/second.jpg'])
+
+    def test_resume(self):
+        '''
+        Test that a second run only downloads the images that are still missing
+        '''
+        self.download_images()
+        self.server.files['/media/missing.jpg'] = self.server.files['/media/first.jpg']
+        self.server.requests = []
+
+        output = self.download_images(threads=1)
+        self.assertIn('Downloaded 1 images, 3 already present, 0 failed', output)
+        self.assertTrue(ExerciseImage.objects.filter(pk=12).exists())
+        self.assertEqual([path for path in self.server.requests if path.startswith('/media/')],
+                         ['/media/missing.jpg'])
+
+    def test_threads(self):
+        '''
+        Test that the number of threads is validated
+        '''
+        self.assertRaises(CommandError, self.download_images, threads=0)
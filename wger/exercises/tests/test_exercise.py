@@ -15,8 +15,13 @@
 import json
 
 from django.core import mail
+from django.core.files import File
 from django.core.cache import cache
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.utils import six
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
 
 from wger.core.tests.base_testcase import (
     STATUS_CODES_FAIL,
@@ -24,11 +29,16 @@ from wger.core.tests.base_testcase import (
     WorkoutManagerDeleteTestCase
 )
 from wger.exercises.models import (
+    EXERCISE_SEARCH_LIMIT,
     Exercise,
+    ExerciseImage,
     Muscle,
     ExerciseCategory,
+    exercise_search_index,
+    load_exercise_search_entries
 )
 from wger.utils.cache import get_template_cache_name, cache_mapper
+from wger.utils.search import SearchIndex
 
 
 class ExerciseRepresentationTestCase(WorkoutManagerTestCase):
@@ -392,6 +402,167 @@ class ExercisesTestCase(WorkoutManagerTestCase):
         self.search_exercise()
 
 
+class ExerciseSearchIndexTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the exercise search index
+    '''
+
+    def search(self, term, limit=EXERCISE_SEARCH_LIMIT):
+        '''
+        Helper function that returns the names of the found exercises
+        '''
+        return [exercise['name'] for exercise in Exercise.objects.search(term, [1, 2], limit)]
+
+    def test_search(self):
+        '''
+        Test the results and their order
+        '''
+        self.assertEqual(self.search('exercise'), ['An exercise',
+                                                   'Boring exercise',
+                                                   'Very cool exercise'])
+        self.assertEqual(self.search('exercise', limit=2), ['An exercise',
+                                                            'Boring exercise'])
+        self.assertEqual(self.search('pending'), [])
+        exercises = Exercise.objects.search('exercise', [2])
+        self.assertEqual([exercise['name'] for exercise in exercises], ['Very cool exercise'])
+
+        exercise = Exercise.objects.get(pk=3)
+        exercise.name_original = 'Exercise'
+        exercise.save()
+        self.assertEqual(self.search('exercise'), ['Exercise',
+                                                   'An exercise',
+                                                   'Very cool exercise'])
+
+    def test_search_limit(self):
+        '''
+        Test the limit parameter of the search API
+        '''
+        response = self.client.get(reverse('exercise-search'),
+                                   {'term': 'exercise', 'language': 'de', 'limit': 1})
+        result = json.loads(response.content.decode('utf8'))
+        self.assertEqual(len(result['suggestions']), 1)
+        self.assertEqual(result['suggestions'][0]['value'], 'An exercise')
+
+    def test_main_image(self):
+        '''
+        Test that the URLs of the main image are saved in the index
+        '''
+        image = ExerciseImage()
+        image.exercise = Exercise.objects.get(pk=2)
+        image.status = ExerciseImage.STATUS_ACCEPTED
+        image.image.save('protestschwein.jpg',
+                         File(open('wger/exercises/tests/protestschwein.jpg', 'rb')))
+        image.save()
+        call_command('generate-exercise-thumbnails', processes=1, stderr=six.StringIO())
+
+        exercise = Exercise.objects.search('cool', [2])[0]
+        self.assertEqual(exercise['image'], image.image.url)
+        self.assertIn('protestschwein.jpg', exercise['image_thumbnail'])
+
+        with self.assertNumQueries(0):
+            Exercise.objects.search('cool', [2])
+
+        image.delete()
+        self.assertIsNone(Exercise.objects.search('cool', [2])[0]['image'])
+
+    def test_main_image_no_thumbnails(self):
+        '''
+        Test that the index uses no thumbnail for images whose thumbnails were
+        not generated yet, instead of creating them
+        '''
+        image = ExerciseImage()
+        image.exercise = Exercise.objects.get(pk=2)
+        image.status = ExerciseImage.STATUS_ACCEPTED
+        image.image.save('protestschwein.jpg',
+                         File(open('wger/exercises/tests/protestschwein.jpg', 'rb')))
+        image.save()
+
+        exercise = Exercise.objects.search('cool', [2])[0]
+        self.assertEqual(exercise['image'], image.image.url)
+        self.assertIsNone(exercise['image_thumbnail'])
+        thumbnailer = get_thumbnailer(image.image)
+        self.assertIsNone(thumbnailer.get_existing_thumbnail(aliases.get('micro_cropped')))
+
+    def test_main_image_cache_flush(self):
+        '''
+        Test that the thumbnails are still in the index after a cache flush
+        '''
+        image = ExerciseImage()
+        image.exercise = Exercise.objects.get(pk=2)
+        image.status = ExerciseImage.STATUS_ACCEPTED
+        image.image.save('protestschwein.jpg',
+                         File(open('wger/exercises/tests/protestschwein.jpg', 'rb')))
+        image.save()
+        call_command('generate-exercise-thumbnails', processes=1, stderr=six.StringIO())
+
+        cache.clear()
+        exercise_search_index.reset()
+        exercise = Exercise.objects.search('cool', [2])[0]
+        self.assertIn('protestschwein.jpg', exercise['image_thumbnail'])
+
+    def test_update_entry(self):
+        '''
+        Test that saving an exercise only updates its entry in the index
+        '''
+        self.assertEqual(self.search('cool'), ['Very cool exercise'])
+        index = exercise_search_index.get_index()
+
+        exercise = Exercise.objects.get(pk=2)
+        exercise.name_original = 'Very hot exercise'
+        exercise.save()
+
+        # The changed exercise is loaded with its main image
+        with self.assertNumQueries(2):
+            self.assertEqual(self.search('cool'), [])
+        self.assertEqual(self.search('hot'), ['Very Hot Exercise'])
+        self.assertIs(exercise_search_index.get_index(), index)
+
+        exercise.delete()
+        self.assertEqual(self.search('hot'), [])
+        self.assertIs(exercise_search_index.get_index(), index)
+
+    def test_update_category(self):
+        '''
+        Test that saving a category updates the entries of its exercises
+        '''
+        index = exercise_search_index.get_index()
+        category = ExerciseCategory.objects.get(pk=2)
+        category.name = 'Renamed category'
+        category.save()
+
+        exercise = Exercise.objects.search('cool', [2])[0]
+        self.assertEqual(exercise['category'], 'Renamed category')
+        self.assertIs(exercise_search_index.get_index(), index)
+
+    def test_update_other_process(self):
+        '''
+        Test that the changes are applied by the other processes, and that they
+        build the index again if the changes are not available
+        '''
+        other_index = SearchIndex('exercise', load_exercise_search_entries)
+        index = other_index.get_index()
+        Exercise.objects.filter(pk=2).update(name='Very hot exercise')
+        exercise_search_index.update([2])
+
+        self.assertEqual(other_index.search('hot', [2], 10)[0]['id'], 2)
+        self.assertIs(other_index.get_index(), index)
+
+        Exercise.objects.filter(pk=2).update(name='Very cold exercise')
+        exercise_search_index.update([2])
+        cache.delete(cache_mapper.get_search_index_change('exercise',
+                                                          other_index.get_version()))
+        self.assertEqual(other_index.search('cold', [2], 10)[0]['id'], 2)
+        self.assertIsNot(other_index.get_index(), index)
+
+    def test_number_queries(self):
+        '''
+        Test that searching does not need any queries once the index is built
+        '''
+        self.client.get(reverse('exercise-search'), {'term': 'exercise'})
+        with self.assertNumQueries(0):
+            Exercise.objects.search('exercise', [2])
+
+
 class DeleteExercisesTestCase(WorkoutManagerDeleteTestCase):
     '''
     Exercise test case
@@ -12,8 +12,15 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import json
+
+from django.core.cache import cache
 from django.core.files import File
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.utils import six
+from easy_thumbnails.alias import aliases
+from easy_thumbnails.files import get_thumbnailer
 
 from wger.core.tests.base_testcase import (
     WorkoutManagerTestCase,
@@ -101,6 +108,106 @@ class MainImageTestCase(WorkoutManagerTestCase):
         self.assertFalse(ExerciseImage.objects.get(pk=pk5).is_main)
 
 
+class ExerciseImageThumbnailsTestCase(WorkoutManagerTestCase):
+    '''
+    Tests generating the thumbnails of the images
+    '''
+
+    def save_image(self):
+        '''
+        Helper function to upload an image
+        '''
+        image = ExerciseImage()
+        image.exercise = Exercise.objects.get(pk=2)
+        image.status = ExerciseImage.STATUS_ACCEPTED
+        image.image.save('protestschwein.jpg',
+                         File(open('wger/exercises/tests/protestschwein.jpg', 'rb')))
+        return image
+
+    def generate_thumbnails(self, **kwargs):
+        '''
+        Helper function that calls the command to generate the thumbnails
+
+        :return: the output of the command
+        '''
+        stdout = six.StringIO()
+        stderr = six.StringIO()
+        call_command('generate-exercise-thumbnails',
+                     processes=1,
+                     verbosity=2,
+                     stdout=stdout,
+                     stderr=stderr,
+                     **kwargs)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_not_generated_on_upload(self):
+        '''
+        Test that uploading an image does not create the thumbnails
+        '''
+        image = self.save_image()
+        self.assertEqual(image.get_thumbnails(), dict.fromkeys(aliases.all().keys()))
+
+        thumbnailer = get_thumbnailer(image.image)
+        for options in aliases.all().values():
+            self.assertIsNone(thumbnailer.get_existing_thumbnail(options))
+
+    def test_api_reads_urls(self):
+        '''
+        Test that the thumbnails API only reads the saved URLs
+        '''
+        image = self.save_image()
+        thumbnails = dict.fromkeys(aliases.all().keys(), '/media/thumbnail.jpg')
+        ExerciseImage.objects.filter(pk=image.pk).update(thumbnails=json.dumps(thumbnails))
+
+        response = self.client.get(reverse('exerciseimage-thumbnails', kwargs={'pk': image.pk}))
+        result = json.loads(response.content.decode('utf8'))
+        self.assertEqual(result['original'], image.image.url)
+        self.assertEqual(result['micro']['url'], '/media/thumbnail.jpg')
+        self.assertEqual(result['micro']['settings'], {'size': [30, 30]})
+
+    def test_command(self):
+        '''
+        Test the management command that generates the thumbnails
+        '''
+        image = self.save_image()
+        nr_images = ExerciseImage.objects.count()
+
+        stdout, stderr = self.generate_thumbnails()
+        self.assertIn('1 of {0} images'.format(nr_images), stdout)
+
+        # The URLs are saved with the image, they don't depend on the cache
+        cache.clear()
+        thumbnails = ExerciseImage.objects.get(pk=image.pk).get_thumbnails()
+        thumbnailer = get_thumbnailer(image.image)
+        for alias, options in aliases.all().items():
+            self.assertEqual(thumbnailer.get_existing_thumbnail(options).url, thumbnails[alias])
+
+        # The images of the fixtures don't have any files
+        self.assertEqual(ExerciseImage.objects.get(pk=1).thumbnails, '')
+        self.assertIn('Error in image 1', stderr)
+
+        # Only the images without thumbnails are processed again...
+        stdout, stderr = self.generate_thumbnails()
+        self.assertIn('0 of {0} images'.format(nr_images - 1), stdout)
+
+        # ...unless all are requested
+        stdout, stderr = self.generate_thumbnails(all=True)
+        self.assertIn('1 of {0} images'.format(nr_images), stdout)
+
+    def test_new_file(self):
+        '''
+        Test that the URLs are removed when the file of the image changes
+        '''
+        image = self.save_image()
+        self.generate_thumbnails()
+        image = ExerciseImage.objects.get(pk=image.pk)
+        self.assertTrue(image.thumbnails)
+
+        image.image.save('protestschwein.jpg',
+                         File(open('wger/exercises/tests/protestschwein.jpg', 'rb')))
+        self.assertEqual(ExerciseImage.objects.get(pk=image.pk).thumbnails, '')
+
+
 class AddExerciseImageTestCase(WorkoutManagerAddTestCase):
     '''
     Tests adding an image to an exercise
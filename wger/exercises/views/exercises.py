@@ -40,7 +40,7 @@ from django.views.generic import (
     UpdateView
 )
 
-from wger.manager.models import WorkoutLog
+from wger.manager.models import ExerciseStatistics, WorkoutLog
 from wger.exercises.models import (
     Exercise,
     Muscle,
@@ -139,11 +139,15 @@ def view(request, id, slug=None):
     # rendering in the D3 chart
     entry_log = []
     chart_data = []
+    statistics = []
     if request.user.is_authenticated():
         logs = WorkoutLog.objects.filter(user=request.user, exercise=exercise)
         entry_log, chart_data = process_log_entries(logs)
+        statistics = ExerciseStatistics.objects.filter(user=request.user, exercise=exercise) \
+            .select_related('weight_unit')
 
     template_data['logs'] = entry_log
+    template_data['statistics'] = statistics
     template_data['json'] = chart_data
     template_data['svg_uuid'] = str(uuid.uuid4())
 
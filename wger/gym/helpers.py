@@ -14,6 +14,11 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+from collections import defaultdict
+
+from django.db.models import Max
+
+from wger.core.models import UserCache
 from wger.manager.models import WorkoutLog, WorkoutSession
 
 
@@ -25,30 +30,66 @@ def get_user_last_activity(user):
     :param user: user object
     :return: a date or None if nothing was found
     '''
+    return get_users_last_activity([user.pk]).get(user.pk)
 
-    last_activity = None
 
-    # Check workout logs
-    last_log = WorkoutLog.objects.filter(user=user).order_by('date').last()
-    if last_log:
-        last_activity = last_log.date
-
-    # Check workout sessions
-    last_session = WorkoutSession.objects.filter(user=user).order_by('date').last()
-    if last_session:
-        last_session = last_session.date
+def get_users_last_activity(user_ids=None):
+    '''
+    Find out when the given users were last active, see get_user_last_activity
 
-    # Return the last one
-    if last_session:
-        if not last_activity:
-            last_activity = last_session
+    This only needs one grouped query for the workout logs and one for the
+    workout sessions, regardless of the number of users.
 
-        if last_activity < last_session:
-            last_activity = last_session
+    :param user_ids: list with the IDs of the users, None for all users
+    :return: a dictionary with the user IDs as keys and the dates as values.
+             Users without any activity are not included.
+    '''
+    last_activity = {}
+    for model in (WorkoutLog, WorkoutSession):
+        queryset = model.objects.all()
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+
+        # The default ordering would be added to the GROUP BY clause
+        queryset = queryset.order_by().values('user_id').annotate(last=Max('date'))
+        for user_id, date in queryset.values_list('user_id', 'last'):
+            if user_id not in last_activity or last_activity[user_id] < date:
+                last_activity[user_id] = date
 
     return last_activity
 
 
+def update_user_cache_last_activity(user_ids=None, batch_size=500):
+    '''
+    Updates the cached last activity of the given users
+
+    Only the entries that changed are written. They are updated with one
+    query per date and batch of users.
+
+    :param user_ids: list with the IDs of the users, None for all users
+    :param batch_size: maximum number of users updated with one query
+    :return: the number of updated entries
+    '''
+    last_activity = get_users_last_activity(user_ids)
+
+    queryset = UserCache.objects.all()
+    if user_ids is not None:
+        queryset = queryset.filter(user_id__in=user_ids)
+
+    changes = defaultdict(list)
+    for user_id, current in queryset.values_list('user_id', 'last_activity'):
+        date = last_activity.get(user_id)
+        if date != current:
+            changes[date].append(user_id)
+
+    for date, changed_ids in changes.items():
+        for start in range(0, len(changed_ids), batch_size):
+            UserCache.objects.filter(user_id__in=changed_ids[start:start + batch_size]) \
+                .update(last_activity=date)
+
+    return sum(len(changed_ids) for changed_ids in changes.values())
+
+
 def is_any_gym_admin(user):
     '''
     Small utility that checks that the user object has any administrator
@@ -14,8 +14,6 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
-import datetime
-
 from django.core import mail
 from django.utils import translation
 from django.utils.translation import ugettext as _
@@ -23,8 +21,6 @@ from django.core.management.base import BaseCommand
 from django.template.loader import render_to_string
 from django.conf import settings
 
-from wger.gym.helpers import is_any_gym_admin
-from wger.gym.helpers import get_user_last_activity
 from wger.gym.models import Gym
 
 
@@ -37,17 +33,15 @@ class Command(BaseCommand):
     def handle(self, **options):
         '''
         Process gyms and send emails
-        '''
 
-        today = datetime.date.today()
+        The members and trainers of each gym are loaded with one query each,
+        independently of the number of users.
+        '''
 
-        for gym in Gym.objects.all():
+        for gym in Gym.objects.select_related('config'):
             if int(options['verbosity']) >= 2:
                 self.stdout.write("* Processing gym '{}' ".format(gym))
 
-            user_list = []
-            trainer_list = []
-            user_list_no_activity = []
             weeks = gym.config.weeks_inactive
 
             if not weeks:
@@ -55,50 +49,34 @@ class Command(BaseCommand):
                     self.stdout.write("  Reminders deactivatd, skipping")
                 continue
 
-            for profile in gym.userprofile_set.all():
-                user = profile.user
-
-                # check if the account was deactivated (user can't login)
-                if not user.is_active:
-                    continue
-
-                # add to trainer list that will be notified
-                if user.has_perm('gym.gym_trainer'):
-                    trainer_list.append(user)
-
-                # Check appropriate permissions
-                if is_any_gym_admin(user):
-                    continue
-
-                # Check user preferences
-                if not user.gymuserconfig.include_inactive:
-                    continue
+            # Trainers that will be notified. The profile might not have an email
+            trainer_list = Gym.objects.get_trainers(gym.pk)\
+                .filter(gymadminconfig__overview_inactive=True)\
+                .exclude(email='')\
+                .select_related('userprofile__notification_language')
+            trainer_list = list(trainer_list)
+            if not trainer_list:
+                continue
 
-                last_activity = user.usercache.last_activity
-                if not last_activity:
-                    user_list_no_activity.append({'user': user, 'last_activity': last_activity})
-                elif today - last_activity > datetime.timedelta(weeks=weeks):
-                    user_list.append({'user': user, 'last_activity': last_activity})
+            user_list = []
+            user_list_no_activity = []
+            for user in Gym.objects.get_inactive_members(gym.pk, weeks):
+                if user.last_activity:
+                    user_list.append({'user': user, 'last_activity': user.last_activity})
+                else:
+                    user_list_no_activity.append({'user': user, 'last_activity': None})
 
             if user_list or user_list_no_activity:
+                context = {
+                    'weeks': weeks,
+                    'user_list': user_list,
+                    'user_list_no_activity': user_list_no_activity
+                }
                 for trainer in trainer_list:
-
-                    # Profile might not have email
-                    if not trainer.email:
-                        continue
-
-                    # Check trainer preferences
-                    if not trainer.gymadminconfig.overview_inactive:
-                        continue
-
-                    translation.activate(trainer.userprofile.notification_language.short_name)
-                    subject = _('Reminder of inactive members')
-                    context = {
-                        'weeks': weeks,
-                        'user_list': user_list,
-                        'user_list_no_activity': user_list_no_activity
-                    }
-                    message = render_to_string('gym/email_inactive_members.html', context)
+                    language = trainer.userprofile.notification_language.short_name
+                    with translation.override(language):
+                        subject = _('Reminder of inactive members')
+                        message = render_to_string('gym/email_inactive_members.html', context)
                     mail.send_mail(subject,
                                    message,
                                    settings.WGER_SETTINGS['EMAIL_FROM'],
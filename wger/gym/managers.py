@@ -14,8 +14,10 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import datetime
+
 from django.db import models
-from django.db.models import Q
+from django.db.models import F, Q
 from django.contrib.auth.models import (
     Permission,
     User
@@ -51,3 +53,47 @@ class GymManager(models.Manager):
         return users.filter(Q(groups__permissions=perm_gym) |
                             Q(groups__permissions=perm_gyms) |
                             Q(groups__permissions=perm_trainer)).distinct()
+
+    def get_trainers(self, gym_pk):
+        '''
+        Returns the active trainers for this gym
+
+        These are the users that have the gym_trainer permission through
+        their groups or directly, as well as the superusers (user.has_perm
+        returns True for all permissions for them)
+        '''
+        permission = {'codename': 'gym_trainer', 'content_type__app_label': 'gym'}
+        users = User.objects.filter(userprofile__gym_id=gym_pk, is_active=True)
+        return users.filter(Q(is_superuser=True) |
+                            Q(groups__permissions__in=Permission.objects.filter(**permission)) |
+                            Q(user_permissions__in=Permission.objects.filter(**permission)))\
+            .distinct()
+
+    def get_inactive_members(self, gym_pk, weeks, today=None):
+        '''
+        Returns the members of this gym that were not active in the last weeks
+
+        Only active accounts of users without any administrator permissions
+        that want to be included in the overview are returned. The date of
+        their last activity is annotated as last_activity, it is None if the
+        user was never active.
+
+        :param gym_pk: the ID of the gym
+        :param weeks: number of weeks without activity
+        :param today: the current date, defaults to today
+        '''
+        today = today or datetime.date.today()
+        permissions = Permission.objects.filter(content_type__app_label='gym',
+                                                codename__in=('manage_gym',
+                                                              'manage_gyms',
+                                                              'gym_trainer'))
+
+        users = User.objects.filter(userprofile__gym_id=gym_pk,
+                                    is_active=True,
+                                    is_superuser=False,
+                                    gymuserconfig__include_inactive=True)
+        users = users.exclude(groups__permissions__in=permissions)\
+            .exclude(user_permissions__in=permissions)
+        return users.annotate(last_activity=F('usercache__last_activity'))\
+            .filter(Q(last_activity__isnull=True) |
+                    Q(last_activity__lt=today - datetime.timedelta(weeks=weeks)))
@@ -13,8 +13,10 @@
 # You should have received a copy of the GNU Affero General Public License
 
 import datetime
+import gzip
 
 from django.core.urlresolvers import reverse
+from django.utils import six
 
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 from wger.gym.models import Gym
@@ -43,8 +45,14 @@ class GymMembersCsvExportTestCase(WorkoutManagerTestCase):
                 format(t=today, gym=gym.id)
             self.assertEqual(response['Content-Disposition'],
                              'attachment; filename={0}'.format(filename))
-            self.assertGreaterEqual(len(response.content), 1000)
-            self.assertLessEqual(len(response.content), 1300)
+            content = b''.join(response.streaming_content).decode('utf8')
+            self.assertGreaterEqual(len(content), 900)
+            self.assertLessEqual(len(content), 1300)
+
+            rows = content.splitlines()
+            self.assertEqual(len(rows), Gym.objects.get_members(gym.pk).count() + 1)
+            self.assertTrue(rows[0].startswith('"Nr."\t"Gym"\t"Username"'))
+            self.assertIn('"{0}"'.format(gym.name), rows[1])
 
     def test_export_csv_authorized(self):
         '''
@@ -77,3 +85,26 @@ class GymMembersCsvExportTestCase(WorkoutManagerTestCase):
         '''
         self.user_logout()
         self.export_csv(fail=True)
+
+    def test_export_csv_gzip(self):
+        '''
+        Test the compressed CSV export
+        '''
+        self.user_login('manager1')
+        response = self.client.get(reverse('gym:export:users', kwargs={'gym_pk': 1}) + '?gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz'))
+        content = gzip.GzipFile(fileobj=six.BytesIO(b''.join(response.streaming_content))).read()
+
+        response = self.client.get(reverse('gym:export:users', kwargs={'gym_pk': 1}))
+        self.assertEqual(content, b''.join(response.streaming_content))
+
+    def test_export_csv_queries(self):
+        '''
+        Test that the number of queries does not depend on the number of members
+        '''
+        self.user_login('manager1')
+        response = self.client.get(reverse('gym:export:users', kwargs={'gym_pk': 1}))
+        with self.assertNumQueries(2):
+            b''.join(response.streaming_content)
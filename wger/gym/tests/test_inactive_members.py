@@ -12,10 +12,14 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import datetime
+
+from django.contrib.auth.models import User
 from django.core import mail
 from django.core.management import call_command
 
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.gym.models import Gym, GymUserConfig
 
 
 class EmailInactiveUserTestCase(WorkoutManagerTestCase):
@@ -41,3 +45,43 @@ class EmailInactiveUserTestCase(WorkoutManagerTestCase):
         trainer_list.sort()
 
         self.assertEqual(recipment_list.sort(), trainer_list.sort())
+
+    def test_queries(self):
+        '''
+        Test that the number of queries depends on the gyms, not the users
+        '''
+        # Gyms, trainers of the 3 gyms with reminders and members of the 2
+        # gyms that have trainers to notify
+        with self.assertNumQueries(6):
+            call_command('inactive-members')
+
+    def test_inactive_members(self):
+        '''
+        Test the inactive members of a gym
+        '''
+        members = Gym.objects.get_inactive_members(1, 7)
+        user_ids = set(user.pk for user in members)
+        self.assertIn(2, user_ids)
+        self.assertNotIn(3, user_ids)
+        self.assertEqual(members.get(pk=2).last_activity, datetime.date(2014, 1, 30))
+
+        # Not active in the last 7 weeks, but recently enough
+        self.assertNotIn(2, [user.pk for user in
+                             Gym.objects.get_inactive_members(1, 7, datetime.date(2014, 3, 1))])
+
+        # User preferences
+        GymUserConfig.objects.filter(user_id=2).update(include_inactive=False)
+        self.assertNotIn(2, [user.pk for user in Gym.objects.get_inactive_members(1, 7)])
+
+        # Deactivated accounts
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        self.assertFalse(Gym.objects.get_inactive_members(1, 7).exists())
+
+    def test_trainers(self):
+        '''
+        Test the trainers of a gym
+        '''
+        trainers = Gym.objects.get_trainers(1)
+        self.assertEqual(set(trainers),
+                         set(user for user in User.objects.filter(userprofile__gym_id=1)
+                             if user.has_perm('gym.gym_trainer')))
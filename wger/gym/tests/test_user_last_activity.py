@@ -15,9 +15,16 @@
 import datetime
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import six
 
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
-from wger.gym.helpers import get_user_last_activity
+from wger.core.models import UserCache
+from wger.gym.helpers import (
+    get_user_last_activity,
+    get_users_last_activity,
+    update_user_cache_last_activity
+)
 from wger.manager.models import WorkoutSession, WorkoutLog
 
 
@@ -61,3 +68,88 @@ class UserLastActivityTestCase(WorkoutManagerTestCase):
         user = User.objects.get(username='admin')
         self.assertEqual(get_user_last_activity(user), datetime.date(2014, 10, 5))
         self.assertEqual(user.usercache.last_activity, datetime.date(2014, 10, 5))
+
+
+class UsersLastActivityTestCase(WorkoutManagerTestCase):
+    '''
+    Test calculating and caching the last activity of several users at once
+    '''
+
+    def test_users_last_activity(self):
+        '''
+        Test that the values are the same as for the individual users
+        '''
+        last_activity = get_users_last_activity()
+        for user in User.objects.all():
+            self.assertEqual(last_activity.get(user.pk), get_user_last_activity(user))
+
+        self.assertEqual(get_users_last_activity([1]), {1: datetime.date(2014, 1, 30)})
+
+    def test_update_cache(self):
+        '''
+        Test updating the cached values of all users
+        '''
+        UserCache.objects.update(last_activity=datetime.date(2000, 1, 1))
+        self.assertEqual(update_user_cache_last_activity(batch_size=2), User.objects.count())
+        for user in User.objects.select_related('usercache'):
+            self.assertEqual(user.usercache.last_activity, get_user_last_activity(user))
+
+        # Nothing changed
+        with self.assertNumQueries(3):
+            self.assertEqual(update_user_cache_last_activity(), 0)
+
+    def test_command(self):
+        '''
+        Test the management command, the number of queries does not depend
+        on the number of users
+        '''
+        UserCache.objects.update(last_activity=None)
+        UserCache.objects.filter(user=2).delete()
+
+        with self.assertNumQueries(6):
+            call_command('update-user-cache', stdout=six.StringIO())
+        for user in User.objects.select_related('usercache'):
+            self.assertEqual(user.usercache.last_activity, get_user_last_activity(user))
+
+    def test_new_entry(self):
+        '''
+        Test that new entries only move the date forward
+        '''
+        user = User.objects.get(pk=1)
+        session = WorkoutSession.objects.get(pk=1)
+        session.pk = None
+        session.date = datetime.date(2013, 1, 1)
+        session.save()
+        self.assertEqual(UserCache.objects.get(user=1).last_activity, datetime.date(2014, 1, 30))
+
+        session.pk = None
+        session.date = datetime.date(2015, 1, 1)
+        session.save()
+        self.assertEqual(UserCache.objects.get(user=1).last_activity, datetime.date(2015, 1, 1))
+        self.assertEqual(get_user_last_activity(user), datetime.date(2015, 1, 1))
+
+    def test_delete(self):
+        '''
+        Test that the cache is updated when deleting the last activity
+        '''
+        user = User.objects.get(pk=1)
+        WorkoutSession.objects.filter(user=user).delete()
+        WorkoutLog.objects.filter(user=user).update(date=datetime.date(2014, 1, 1))
+        update_user_cache_last_activity([1])
+        last_log = WorkoutLog.objects.filter(user=user).first()
+        last_log.date = datetime.date(2014, 1, 20)
+        last_log.save()
+        self.assertEqual(UserCache.objects.get(user=1).last_activity, datetime.date(2014, 1, 20))
+
+        last_log.delete()
+        self.assertEqual(UserCache.objects.get(user=1).last_activity, datetime.date(2014, 1, 1))
+
+        WorkoutLog.objects.filter(user=user).delete()
+        self.assertIsNone(UserCache.objects.get(user=1).last_activity)
+
+    def test_delete_user(self):
+        '''
+        Test that users with logs and sessions can be deleted
+        '''
+        User.objects.get(pk=1).delete()
+        self.assertFalse(UserCache.objects.filter(user=1).exists())
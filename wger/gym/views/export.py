@@ -14,20 +14,21 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
-import six
 import csv
 import datetime
 import logging
 
 from django.contrib.auth.decorators import login_required
-from django.http.response import (
-    HttpResponseForbidden,
-    HttpResponse
-)
+from django.http.response import HttpResponseForbidden
 from django.shortcuts import get_object_or_404
 from django.utils.translation import ugettext as _
 
 from wger.gym.models import Gym
+from wger.utils.export import (
+    GZIP_PARAMETER,
+    queryset_chunks,
+    streaming_csv_response
+)
 
 logger = logging.getLogger(__name__)
 
@@ -47,44 +48,49 @@ def users(request, gym_pk):
             and request.user.userprofile.gym != gym:
         return HttpResponseForbidden()
 
-    # Create CSV 'file'
-    response = HttpResponse(content_type='text/csv')
-    writer = csv.writer(response, delimiter='\t', quoting=csv.QUOTE_ALL)
-
-    # Python3: the .encode() is only needed for python 2.7. Should this requirement
-    #          be dropped once, they can be removed.
-    writer.writerow([_('Nr.'),
-                     _('Gym').encode('utf8'),
-                     _('Username').encode('utf8'),
-                     _('Email').encode('utf8'),
-                     _('First name').encode('utf8'),
-                     _('Last name').encode('utf8'),
-                     _('Gender').encode('utf8'),
-                     _('Age').encode('utf8'),
-                     _('ZIP code').encode('utf8'),
-                     _('City').encode('utf8'),
-                     _('Street').encode('utf8'),
-                     _('Phone').encode('utf8')])
-    for user in Gym.objects.get_members(gym_pk):
-        address = user.userprofile.address
-        writer.writerow([user.id,
-                         gym.name.encode('utf8'),
-                         user.username,
-                         user.email,
-                         user.first_name.encode('utf8'),
-                         user.last_name.encode('utf8'),
-                         user.userprofile.get_gender_display().encode('utf8'),
-                         user.userprofile.age,
-                         address['zip_code'],
-                         address['city'].encode('utf8'),
-                         address['street'].encode('utf8'),
-                         address['phone'].encode('utf8')
-                         ])
+    members = Gym.objects.get_members(gym_pk) \
+        .select_related('userprofile') \
+        .prefetch_related('contract_member')
 
     # Send the data to the browser
     today = datetime.date.today()
-    filename = 'User-data-gym-{gym}-{t.year}-{t.month:02d}-{t.day:02d}.csv'.format(t=today,
-                                                                                   gym=gym.id)
-    response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
-    response['Content-Length'] = len(response.content)
-    return response
+    filename = 'User-data-gym-{gym}-{t.year}-{t.month:02d}-{t.day:02d}'.format(t=today,
+                                                                               gym=gym.id)
+    return streaming_csv_response(get_member_rows(gym, members),
+                                  filename,
+                                  compress=GZIP_PARAMETER in request.GET,
+                                  delimiter='\t',
+                                  quoting=csv.QUOTE_ALL)
+
+
+def get_member_rows(gym, members):
+    '''
+    Returns the rows of the members export, loading the members in chunks
+    '''
+    yield [_('Nr.'),
+           _('Gym'),
+           _('Username'),
+           _('Email'),
+           _('First name'),
+           _('Last name'),
+           _('Gender'),
+           _('Age'),
+           _('ZIP code'),
+           _('City'),
+           _('Street'),
+           _('Phone')]
+
+    for user in queryset_chunks(members):
+        address = user.userprofile.address
+        yield [user.id,
+               gym.name,
+               user.username,
+               user.email,
+               user.first_name,
+               user.last_name,
+               user.userprofile.get_gender_display(),
+               user.userprofile.age,
+               address['zip_code'],
+               address['city'],
+               address['street'],
+               address['phone']]
@@ -72,10 +72,11 @@ class WorkoutViewSet(viewsets.ModelViewSet):
         '''
         Output the canonical representation of a workout
 
-        This is basically the same form as used in the application
+        This is basically the same form as used in the application. It is built
+        from the database, as the cached one only contains some of the fields.
         '''
 
-        out = WorkoutCanonicalFormSerializer(self.get_object().canonical_representation).data
+        out = WorkoutCanonicalFormSerializer(self.get_object().get_canonical_representation()).data
         return Response(out)
 
 
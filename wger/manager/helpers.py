@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
 import datetime
 from calendar import HTMLCalendar
 
@@ -302,6 +303,31 @@ def reps_smart_text(settings, set_obj):
     return setting_text, setting_list, weight_list, reps_list, repetition_units, weight_units
 
 
+def get_schedule_position(step_ends, days, is_loop):
+    '''
+    Finds the step of a schedule that is done on a given day
+
+    A step is done until (and including) its last day, the next step starts
+    on the day after. Loops start again with the first step after the last
+    one, so the position is calculated without going through every cycle.
+
+    :param step_ends: the ends of the steps, in days since the start of the
+                      schedule (in ascending order)
+    :param days: number of days since the start of the schedule
+    :param is_loop: whether the schedule is repeated
+    :return: (cycle, index of the step) tuple or None if the schedule is over
+    '''
+    length = step_ends[-1]
+    cycle = 0
+    if days > length:
+        if not is_loop or not length:
+            return None
+        cycle = (days - 1) // length
+        days -= cycle * length
+
+    return cycle, bisect.bisect_left(step_ends, days)
+
+
 class WorkoutCalendar(HTMLCalendar):
     '''
     A calendar renderer, see this blog entry for details:
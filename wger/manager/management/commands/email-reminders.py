@@ -15,11 +15,14 @@
 # You should have received a copy of the GNU Affero General Public License
 
 import datetime
+from optparse import make_option
 
 from django.template import loader
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.core import mail
+from django.db.models import Q
 from django.utils.translation import ugettext_lazy as _
+from django.utils import six
 from django.utils import translation
 from django.conf import settings
 
@@ -31,94 +34,144 @@ from wger.manager.models import Schedule
 class Command(BaseCommand):
     '''
     Helper admin command to send out email reminders
+
+    The users are processed in batches ordered by their ID. The notification
+    date of a batch is saved before its emails are sent, so if the command is
+    interrupted it can simply be started again and will continue with the
+    users that were not notified yet.
     '''
 
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    dest='batch_size',
+                    default=200,
+                    help='Number of users processed at once (default: 200)'),
+    )
+
     help = 'Send out automatic email reminders for workouts'
 
     def handle(self, **options):
         '''
         Find if the currently active workout is overdue
         '''
-        profile_list = UserProfile.objects.filter(workout_reminder_active=True)
-        counter = 0
-        for profile in profile_list:
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be a positive number')
+
+        today = datetime.date.today()
+
+        # Only users that have provided an email address (checking it here so
+        # we check for NULL values and emtpy strings) and that were not
+        # notified during the last week
+        profile_list = UserProfile.objects.filter(workout_reminder_active=True) \
+            .exclude(Q(user__email__isnull=True) | Q(user__email='')) \
+            .filter(Q(last_workout_notification__isnull=True)
+                    | Q(last_workout_notification__lte=today - datetime.timedelta(weeks=1))) \
+            .select_related('user', 'notification_language') \
+            .order_by('user_id')
+
+        site = Site.objects.get_current()
+        template = loader.get_template('workout/email_reminder.tpl')
+        connection = mail.get_connection(fail_silently=True)
+        connection.open()
 
-            # Only continue if the user has provided an email address.
-            # Checking it here so we check for NULL values and emtpy strings
-            if not profile.user.email:
-                continue
+        counter = 0
+        last_user = 0
+        try:
+            while True:
+                profiles = list(profile_list.filter(user_id__gt=last_user)[:options['batch_size']])
+                if not profiles:
+                    break
+                last_user = profiles[-1].user_id
+
+                reminders = self.get_reminders(profiles, today, int(options['verbosity']))
+                if reminders:
+                    counter += len(reminders)
+                    self.send_emails(reminders, today, site, template, connection)
+        finally:
+            connection.close()
 
-            # Check if we already notified the user and update the profile otherwise
-            if profile.last_workout_notification and \
-               (datetime.date.today()
-                    - profile.last_workout_notification
-                    < datetime.timedelta(weeks=1)):
-                continue
+        if counter and int(options['verbosity']) >= 2:
+            self.stdout.write("Sent {0} email reminders".format(counter))
 
-            (current_workout, schedule) = Schedule.objects.get_current_workout(profile.user)
+    def get_reminders(self, profiles, today, verbosity):
+        '''
+        Returns the (profile, workout, delta) tuples of the users in the batch
+        whose workouts are about to expire
+        '''
+        current_workouts = Schedule.objects.get_current_workouts([p.user_id for p in profiles])
+        reminders = []
+        for profile in profiles:
+            (current_workout, schedule) = current_workouts[profile.user_id]
 
             # No schedules, use the default workout length in user profile
             if not schedule and current_workout:
                 delta = (current_workout.creation_date
                          + datetime.timedelta(weeks=profile.workout_duration)
-                         - datetime.date.today())
+                         - today)
 
                 if datetime.timedelta(days=profile.workout_reminder) > delta:
-                    if int(options['verbosity']) >= 3:
+                    if verbosity >= 3:
                         self.stdout.write("* Workout '{0}' overdue".format(current_workout))
-                    counter += 1
-
-                    self.send_email(profile.user,
-                                    current_workout,
-                                    delta)
+                    reminders.append((profile, current_workout, delta))
 
             # non-loop schedule, take the step's duration
             elif schedule and not schedule.is_loop:
 
-                schedule_step = schedule.get_current_scheduled_workout()
+                # The steps were prefetched or are cached, this does not need
+                # any queries
+                timeline = schedule.get_timeline()
+                entry = schedule.get_timeline_entry(today)
 
                 # Only notify if the step is the last one in the schedule
-                if schedule_step == schedule.schedulestep_set.last():
+                if entry and entry.step_id == timeline[-1].step_id:
 
-                    delta = schedule.get_end_date() - datetime.date.today()
+                    delta = entry.end - today
                     if datetime.timedelta(days=profile.workout_reminder) > delta:
-                        if int(options['verbosity']) >= 3:
+                        if verbosity >= 3:
                             self.stdout.write("* Workout '{0}' overdue - schedule".
-                                              format(schedule_step.workout))
-
-                        counter += 1
-                        self.send_email(profile.user,
-                                        current_workout,
-                                        delta)
-
-        if counter and int(options['verbosity']) >= 2:
-            self.stdout.write("Sent {0} email reminders".format(counter))
+                                              format(current_workout))
+                        reminders.append((profile, current_workout, delta))
+        return reminders
 
     @staticmethod
-    def send_email(user, workout, delta):
+    def send_emails(reminders, today, site, template, connection):
         '''
-        Notify a user that a workout is about to expire
+        Notify the users that their workouts are about to expire
+
+        The emails are grouped by language, so that every translation is only
+        activated once, and are sent over the same connection.
 
-        :type user User
-        :type workout Workout
-        :type delta datetime.timedelta
+        :param reminders: list of (profile, workout, delta) tuples
+        :param today: the date saved as last notification
+        :param site: the current site
+        :param template: the compiled email template
+        :param connection: the (open) email connection
         '''
 
         # Update the last notification date field
-        user.userprofile.last_workout_notification = datetime.date.today()
-        user.userprofile.save()
-
-        # Compose and send the email
-        translation.activate(user.userprofile.notification_language.short_name)
-        context = {'site': Site.objects.get_current(),
-                   'workout': workout,
-                   'expired': True if delta.days < 0 else False,
-                   'days': abs(delta.days)}
-
-        subject = _('Workout will expire soon')
-        message = loader.render_to_string('workout/email_reminder.tpl', context)
-        mail.send_mail(subject,
-                       message,
-                       settings.WGER_SETTINGS['EMAIL_FROM'],
-                       [user.email],
-                       fail_silently=True)
+        UserProfile.objects.filter(pk__in=[profile.pk for profile, workout, delta in reminders]) \
+            .update(last_workout_notification=today)
+
+        by_language = {}
+        for reminder in reminders:
+            language = reminder[0].notification_language.short_name
+            by_language.setdefault(language, []).append(reminder)
+
+        # Compose and send the emails
+        messages = []
+        for language, language_reminders in by_language.items():
+            with translation.override(language):
+                subject = six.text_type(_('Workout will expire soon'))
+                for profile, workout, delta in language_reminders:
+                    context = {'site': site,
+                               'workout': workout,
+                               'expired': True if delta.days < 0 else False,
+                               'days': abs(delta.days)}
+                    messages.append((subject,
+                                     template.render(context),
+                                     settings.WGER_SETTINGS['EMAIL_FROM'],
+                                     [profile.user.email]))
+
+        mail.send_mass_mail(messages, fail_silently=True, connection=connection)
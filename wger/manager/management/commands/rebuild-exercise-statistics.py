@@ -0,0 +1,56 @@
+# -*- coding: utf-8 *-*
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from wger.manager.models import ExerciseStatistics
+
+
+class Command(BaseCommand):
+    '''
+    Calculates again the exercise statistics of all users
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    dest='batch_size',
+                    default=500,
+                    help='Number of statistics entries saved with one query (default: 500)'),
+    )
+
+    help = 'Calculate again the exercise statistics of all users from their workout logs. ' \
+           'This is needed to fill the table for existing logs and when the python code ' \
+           'used to calculate them is changed.'
+
+    def handle(self, **options):
+        '''
+        Process the options
+        '''
+
+        if options['batch_size'] < 1:
+            raise CommandError('The batch size must be a positive number')
+
+        # Replace all the entries at once, so the statistics are never empty
+        with transaction.atomic():
+            count = ExerciseStatistics.objects.rebuild(batch_size=options['batch_size'])
+
+        if int(options['verbosity']) >= 2:
+            self.stdout.write('* Calculated the statistics of {0} exercises'.format(count))
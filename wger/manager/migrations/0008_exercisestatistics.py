@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.13 on 2026-10-18 11:18
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_weightunit'),
+        ('exercises', '0003_auto_20160921_2000'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('manager', '0007_auto_20160311_2258'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('best_weights', models.TextField(editable=False)),
+                ('total_volume', models.DecimalField(decimal_places=2, editable=False, max_digits=12, verbose_name='Total volume')),
+                ('session_count', models.IntegerField(editable=False, verbose_name='Sessions')),
+                ('log_count', models.IntegerField(editable=False)),
+                ('last_date', models.DateField(editable=False, verbose_name='Last performed')),
+                ('exercise', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='exercises.Exercise', verbose_name='Exercise')),
+                ('user', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('weight_unit', models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to='core.WeightUnit', verbose_name='Unit')),
+            ],
+            options={
+                'ordering': ['weight_unit'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='exercisestatistics',
+            unique_together=set([('user', 'exercise', 'weight_unit')]),
+        ),
+    ]
@@ -15,17 +15,19 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import datetime
+import decimal
+import json
 import logging
 from django.utils.encoding import python_2_unicode_compatible
 
 import six
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 from django.core.validators import MaxValueValidator
 from django.core.urlresolvers import reverse
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.exceptions import ValidationError
 from django.core.cache import cache
 from django.core.validators import MinValueValidator
@@ -33,11 +35,19 @@ from sortedm2m.fields import SortedManyToManyField
 
 from wger.core.models import DaysOfWeek, RepetitionUnit, WeightUnit
 from wger.exercises.models import Exercise
-from wger.manager.helpers import reps_smart_text
+from wger.manager.helpers import get_schedule_position, reps_smart_text
 from wger.utils.cache import (
     cache_mapper,
+    flush_workout_canonical_stats,
+    get_workout_canonical_version,
+    increment_workout_canonical_stat,
     reset_workout_canonical_form,
-    reset_workout_log
+    reset_workout_log,
+    reset_workout_log_last_weights
+)
+from wger.utils.canonical import (
+    CanonicalForm,
+    serialize_canonical_form
 )
 from wger.utils.fields import Html5DateField
 
@@ -111,48 +121,112 @@ class Workout(models.Model):
         This form makes it easier to cache and use everywhere where all or part
         of a workout structure is needed. As an additional benefit, the template
         caches are not needed anymore.
+
+        The workout is composed from the cached representations of its days, so
+        that only the days that changed need to be built again. The cache only
+        contains plain data, see wger.utils.canonical for details.
         '''
         workout_canonical_form = cache.get(cache_mapper.get_workout_canonical(self.pk))
-        if not workout_canonical_form:
-            day_canonical_repr = []
-            muscles_front = []
-            muscles_back = []
-            muscles_front_secondary = []
-            muscles_back_secondary = []
-
-            # Sort list by weekday
-            day_list = [i for i in self.day_set.select_related()]
-            day_list.sort(key=lambda day: day.get_first_day_id)
-
-            for day in day_list:
-                canonical_repr_day = day.get_canonical_representation()
-
-                # Collect all muscles
-                for i in canonical_repr_day['muscles']['front']:
-                    if i not in muscles_front:
-                        muscles_front.append(i)
-                for i in canonical_repr_day['muscles']['back']:
-                    if i not in muscles_back:
-                        muscles_back.append(i)
-                for i in canonical_repr_day['muscles']['frontsecondary']:
-                    if i not in muscles_front_secondary:
-                        muscles_front_secondary.append(i)
-                for i in canonical_repr_day['muscles']['backsecondary']:
-                    if i not in muscles_back_secondary:
-                        muscles_back_secondary.append(i)
-
-                day_canonical_repr.append(canonical_repr_day)
-
-            workout_canonical_form = {'obj': self,
-                                      'muscles': {'front': muscles_front,
-                                                  'back': muscles_back,
-                                                  'frontsecondary': muscles_front_secondary,
-                                                  'backsecondary': muscles_back_secondary},
-                                      'day_list': day_canonical_repr}
+        if workout_canonical_form:
+            increment_workout_canonical_stat('hit')
+        else:
+            increment_workout_canonical_stat('miss')
+            workout_canonical_form = self.compose_canonical_representation(
+                serialize_canonical_form(self),
+                self.get_canonical_day_list())
+
             # Save to cache
             cache.set(cache_mapper.get_workout_canonical(self.pk), workout_canonical_form)
 
-        return workout_canonical_form
+            # The cache is written anyway, also save the counters if it's time
+            flush_workout_canonical_stats()
+
+        return CanonicalForm(workout_canonical_form)
+
+    def get_canonical_representation(self):
+        '''
+        Creates a canonical representation of the workout from the database,
+        without using the cache
+
+        Unlike canonical_representation, the model instances are complete, with
+        all their fields. The number of queries does not depend on the number
+        of days, sets or exercises.
+        '''
+        day_list = [day.get_canonical_representation()
+                    for day in Day.objects.canonical_queryset().filter(training=self)]
+        return self.compose_canonical_representation(
+            self,
+            sorted(day_list, key=lambda day: day['days_of_week']['day_list'][0].pk))
+
+    @staticmethod
+    def compose_canonical_representation(workout, day_list):
+        '''
+        Composes the canonical representation of a workout from the ones of
+        its days, collecting all their muscles
+
+        :param workout: the workout, or its plain data
+        :param day_list: the canonical representations of the days, sorted
+        '''
+        muscles_front = []
+        muscles_back = []
+        muscles_front_secondary = []
+        muscles_back_secondary = []
+
+        for canonical_repr_day in day_list:
+
+            # Collect all muscles
+            for i in canonical_repr_day['muscles']['front']:
+                if i not in muscles_front:
+                    muscles_front.append(i)
+            for i in canonical_repr_day['muscles']['back']:
+                if i not in muscles_back:
+                    muscles_back.append(i)
+            for i in canonical_repr_day['muscles']['frontsecondary']:
+                if i not in muscles_front_secondary:
+                    muscles_front_secondary.append(i)
+            for i in canonical_repr_day['muscles']['backsecondary']:
+                if i not in muscles_back_secondary:
+                    muscles_back_secondary.append(i)
+
+        return {'obj': workout,
+                'muscles': {'front': muscles_front,
+                            'back': muscles_back,
+                            'frontsecondary': muscles_front_secondary,
+                            'backsecondary': muscles_back_secondary},
+                'day_list': day_list}
+
+    def get_canonical_day_list(self):
+        '''
+        Returns the canonical representation of the workout's days, sorted by weekday
+
+        The days are read from the cache, only the missing ones are built (all
+        of them at once) and saved. The returned days are plain data.
+        '''
+        version = get_workout_canonical_version(self.pk)
+        keys = {cache_mapper.get_day_canonical(self.pk, version, pk): pk
+                for pk in self.day_set.values_list('pk', flat=True)}
+        day_list = cache.get_many(keys.keys())
+
+        missing = [pk for key, pk in keys.items() if key not in day_list]
+        if missing:
+            rebuilt = {}
+            for day in Day.objects.canonical_queryset().filter(pk__in=missing):
+                key = cache_mapper.get_day_canonical(self.pk, version, day.pk)
+                rebuilt[key] = serialize_canonical_form(day.get_canonical_representation())
+            cache.set_many(rebuilt)
+            increment_workout_canonical_stat('rebuild', len(rebuilt))
+            day_list.update(rebuilt)
+
+        # Sort list by weekday
+        return sorted(day_list.values(),
+                      key=lambda day: day['days_of_week']['day_list'][0].pk)
+
+
+ScheduleTimelineEntry = collections.namedtuple('ScheduleTimelineEntry',
+                                               ['start', 'end', 'step_id', 'workout_id'])
+'''
+The dates of a step of a schedule
+'''
 
 
 class ScheduleManager(models.Manager):
@@ -166,34 +240,58 @@ class ScheduleManager(models.Manager):
         and the workouts
         :rtype : list
         '''
-
-        # Try first to find an active schedule that has steps
-        try:
-            schedule = Schedule.objects.filter(user=user).get(is_active=True)
-            if schedule.schedulestep_set.count():
-                # The schedule might exist and have steps, but if it's too far in
-                # the past and is not a loop, we won't use it. Doing it like this
-                # is kind of wrong, but lets us continue to the correct place
-                if not schedule.get_current_scheduled_workout():
-                    raise ObjectDoesNotExist
-
-                active_workout = schedule.get_current_scheduled_workout().workout
-            else:
-                # same as above
-                raise ObjectDoesNotExist
-
-        # there are no active schedules, just return the last workout
-        except ObjectDoesNotExist:
-
-            schedule = False
-            try:
-                active_workout = Workout.objects.filter(user=user).latest('creation_date')
-
-            # no luck, there aren't even workouts for the user
-            except ObjectDoesNotExist:
-                active_workout = False
-
-        return (active_workout, schedule)
+        return self.get_current_workouts([user.pk])[user.pk]
+
+    def get_current_workouts(self, user_ids):
+        '''
+        Finds the currently active workouts for several users at once
+
+        Works like get_current_workout, but the number of queries does not
+        depend on the number of users.
+
+        :param user_ids: list of user IDs
+        :return: a dictionary with (active_workout, schedule) tuples for each user
+        '''
+        result = {}
+
+        # Try first to find an active schedule that has a step for today
+        schedules = Schedule.objects.filter(user__in=user_ids, is_active=True) \
+            .prefetch_related(models.Prefetch('schedulestep_set',
+                                              queryset=ScheduleStep.objects
+                                              .select_related('workout')))
+        for schedule in schedules:
+            schedule_step = schedule.get_current_scheduled_workout()
+            if schedule_step:
+                result[schedule.user_id] = (schedule_step.workout, schedule)
+
+        # There are no active schedules, just use the last workout. Only the
+        # IDs are aggregated, so that just one workout per user is loaded
+        pending = [pk for pk in user_ids if pk not in result]
+        if len(pending) == 1:
+            workout = Workout.objects.filter(user=pending[0]) \
+                .order_by('-creation_date', '-pk') \
+                .first()
+            if workout:
+                result[pending[0]] = (workout, False)
+        elif pending:
+            last_dates = dict(Workout.objects.filter(user__in=pending)
+                              .order_by()
+                              .values_list('user')
+                              .annotate(models.Max('creation_date')))
+            candidates = Workout.objects.filter(user__in=last_dates.keys(),
+                                                creation_date__in=set(last_dates.values())) \
+                .order_by() \
+                .values_list('user', 'creation_date') \
+                .annotate(models.Max('pk'))
+            workout_ids = [pk for user, date, pk in candidates if last_dates[user] == date]
+            for workout in Workout.objects.filter(pk__in=workout_ids):
+                result[workout.user_id] = (workout, False)
+
+        # No luck, there aren't even workouts for these users
+        for pk in user_ids:
+            result.setdefault(pk, (False, False))
+
+        return result
 
 
 @python_2_unicode_compatible
@@ -266,26 +364,68 @@ class Schedule(models.Model):
 
         super(Schedule, self).save(*args, **kwargs)
 
+    def get_timeline(self):
+        '''
+        Returns the dates of the steps of the schedule, the first time they
+        are done (i.e. the first cycle of a loop)
+
+        The steps are saved in the cache, so that the dates can be calculated
+        without any queries.
+
+        :return: list of ScheduleTimelineEntry
+        '''
+        key = cache_mapper.get_schedule_timeline(self.pk)
+        steps = cache.get(key)
+        if steps is None:
+            steps = [(step.pk, step.workout_id, step.duration)
+                     for step in self.schedulestep_set.all()]
+            cache.set(key, steps)
+
+        timeline = []
+        start_date = self.start_date
+        for step_id, workout_id, duration in steps:
+            end_date = start_date + datetime.timedelta(weeks=duration)
+            timeline.append(ScheduleTimelineEntry(start_date, end_date, step_id, workout_id))
+            start_date = end_date
+        return timeline
+
+    def get_timeline_entry(self, date=None):
+        '''
+        Returns the step of the schedule that is done on the given date, with
+        the dates of the current cycle if the schedule is a loop
+
+        :param date: the date, default today
+        :return: ScheduleTimelineEntry or None if there is no step on that date
+        '''
+        date = date or datetime.date.today()
+        timeline = self.get_timeline()
+        if not timeline:
+            return None
+
+        position = get_schedule_position([(entry.end - self.start_date).days
+                                          for entry in timeline],
+                                         (date - self.start_date).days,
+                                         self.is_loop)
+        if position is None:
+            return None
+
+        cycle, index = position
+        offset = (timeline[-1].end - self.start_date) * cycle
+        entry = timeline[index]
+        return entry._replace(start=entry.start + offset, end=entry.end + offset)
+
     def get_current_scheduled_workout(self):
         '''
         Returns the currently active schedule step for a user
         '''
-        steps = self.schedulestep_set.all()
-        start_date = self.start_date
-        found = False
-        if not steps:
+        entry = self.get_timeline_entry()
+        if entry is None:
             return False
-        while not found:
-            for step in steps:
-                current_limit = start_date + datetime.timedelta(weeks=step.duration)
-                if current_limit >= datetime.date.today():
-                    found = True
-                    return step
-                start_date = current_limit
-
-            # If it's not a loop, there's no workout that matches, return
-            if not self.is_loop:
-                return False
+
+        for step in self.schedulestep_set.all():
+            if step.pk == entry.step_id:
+                return step
+        return False
 
     def get_end_date(self):
         '''
@@ -295,10 +435,8 @@ class Schedule(models.Model):
         if self.is_loop:
             return None
 
-        end_date = self.start_date
-        for step in self.schedulestep_set.all():
-            end_date = end_date + datetime.timedelta(weeks=step.duration)
-        return end_date
+        timeline = self.get_timeline()
+        return timeline[-1].end if timeline else self.start_date
 
 
 @python_2_unicode_compatible
@@ -348,21 +486,35 @@ class ScheduleStep(models.Model):
         '''
         Calculate the start and end date for this step
         '''
+        for entry in self.schedule.get_timeline():
+            if entry.step_id == self.pk:
+                return entry.start, entry.end
+        return False
 
-        steps = self.schedule.schedulestep_set.all()
-        start_date = end_date = self.schedule.start_date
-        previous = 0
 
-        if not steps:
-            return False
+class DayManager(models.Manager):
+    '''
+    Custom manager for workout days
+    '''
 
-        for step in steps:
-            start_date += datetime.timedelta(weeks=previous)
-            end_date += datetime.timedelta(weeks=step.duration)
-            previous = step.duration
+    def canonical_queryset(self):
+        '''
+        Returns a queryset that prefetches everything needed to build the
+        canonical representation of its days.
 
-            if step == self:
-                return start_date, end_date
+        The number of queries is fixed and does not depend on the number of days,
+        sets, exercises or settings.
+        '''
+        return self.get_queryset().prefetch_related(
+            'day',
+            'set_set',
+            models.Prefetch('set_set__exercises', queryset=Exercise.objects.select_related()),
+            'set_set__exercises__muscles',
+            'set_set__exercises__muscles_secondary',
+            'set_set__exercises__exercisecomment_set',
+            models.Prefetch('set_set__setting_set',
+                            queryset=Setting.objects.select_related('repetition_unit',
+                                                                    'weight_unit')))
 
 
 @python_2_unicode_compatible
@@ -371,6 +523,9 @@ class Day(models.Model):
     Model for a training day
     '''
 
+    objects = DayManager()
+    '''Custom manager'''
+
     training = models.ForeignKey(Workout,
                                  verbose_name=_('Workout'))
     description = models.CharField(max_length=100,
@@ -406,15 +561,15 @@ class Day(models.Model):
         Reset all cached infos
         '''
 
-        reset_workout_canonical_form(self.training_id)
         super(Day, self).save(*args, **kwargs)
+        reset_workout_canonical_form(self.training_id, self.pk)
 
     def delete(self, *args, **kwargs):
         '''
         Reset all cached infos
         '''
 
-        reset_workout_canonical_form(self.training_id)
+        reset_workout_canonical_form(self.training_id, self.pk)
         super(Day, self).delete(*args, **kwargs)
 
     @property
@@ -432,6 +587,9 @@ class Day(models.Model):
     def get_canonical_representation(self):
         '''
         Creates a canonical representation for this day
+
+        Only related managers' all() is used, so that the prefetched objects from
+        DayManager.canonical_queryset are used when available.
         '''
         canonical_repr = []
         muscles_front = []
@@ -439,11 +597,17 @@ class Day(models.Model):
         muscles_front_secondary = []
         muscles_back_secondary = []
 
-        for set_obj in self.set_set.select_related():
+        for set_obj in self.set_set.all():
             exercise_tmp = []
             has_setting_tmp = True
-            for exercise in set_obj.exercises.select_related():
-                setting_tmp = []
+
+            # Group the settings by exercise, they are already sorted by order and id
+            settings = {}
+            for setting in set_obj.setting_set.all():
+                settings.setdefault(setting.exercise_id, []).append(setting)
+
+            for exercise in set_obj.exercises.all():
+                setting_tmp = settings.get(exercise.id, [])
 
                 # Muscles for this set
                 for muscle in exercise.muscles.all():
@@ -458,10 +622,6 @@ class Day(models.Model):
                     elif not muscle.is_front and muscle.id not in muscles_back:
                         muscles_back_secondary.append(muscle.id)
 
-                for setting in Setting.objects.filter(set=set_obj,
-                                                      exercise=exercise).order_by('order', 'id'):
-                    setting_tmp.append(setting)
-
                 # "Smart" textual representation
                 setting_text, setting_list, weight_list, reps_list, repetition_units, weight_units \
                     = reps_smart_text(setting_tmp, set_obj)
@@ -524,7 +684,7 @@ class Day(models.Model):
 
         # Days of the week
         tmp_days_of_week = []
-        for day_of_week in self.day.select_related():
+        for day_of_week in self.day.all():
             tmp_days_of_week.append(day_of_week)
 
         return {'obj': self,
@@ -581,7 +741,7 @@ class Set(models.Model):
         Reset all cached infos
         '''
 
-        reset_workout_canonical_form(self.exerciseday.training_id)
+        reset_workout_canonical_form(self.exerciseday.training_id, self.exerciseday_id)
         super(Set, self).save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
@@ -589,7 +749,7 @@ class Set(models.Model):
         Reset all cached infos
         '''
 
-        reset_workout_canonical_form(self.exerciseday.training_id)
+        reset_workout_canonical_form(self.exerciseday.training_id, self.exerciseday_id)
         super(Set, self).delete(*args, **kwargs)
 
 
@@ -653,7 +813,7 @@ class Setting(models.Model):
         '''
         Reset cache
         '''
-        reset_workout_canonical_form(self.set.exerciseday.training_id)
+        reset_workout_canonical_form(self.set.exerciseday.training_id, self.set.exerciseday_id)
 
         # If the user selected "Until Failure", do only 1 "repetition",
         # everythin else doesn't make sense.
@@ -666,7 +826,7 @@ class Setting(models.Model):
         Reset cache
         '''
 
-        reset_workout_canonical_form(self.set.exerciseday.training_id)
+        reset_workout_canonical_form(self.set.exerciseday.training_id, self.set.exerciseday_id)
         super(Setting, self).delete(*args, **kwargs)
 
     def get_owner_object(self):
@@ -757,6 +917,7 @@ class WorkoutLog(models.Model):
         Reset cache
         '''
         reset_workout_log(self.user_id, self.date.year, self.date.month, self.date.day)
+        reset_workout_log_last_weights(self.user_id)
 
         # If the user selected "Until Failure", do only 1 "repetition",
         # everythin else doesn't make sense.
@@ -769,6 +930,7 @@ class WorkoutLog(models.Model):
         Reset cache
         '''
         reset_workout_log(self.user_id, self.date.year, self.date.month, self.date.day)
+        reset_workout_log_last_weights(self.user_id)
         super(WorkoutLog, self).delete(*args, **kwargs)
 
 
@@ -884,3 +1046,253 @@ class WorkoutSession(models.Model):
         '''
         reset_workout_log(self.user_id, self.date.year, self.date.month)
         super(WorkoutSession, self).delete(*args, **kwargs)
+
+
+class ExerciseStatisticsManager(models.Manager):
+    '''
+    Custom manager for the exercise statistics
+    '''
+
+    def get_logs(self):
+        '''
+        Returns the log entries used for the statistics
+
+        Only the logs with repetitions and a weight unit are used, the others
+        (minutes, kilometers per hour, etc.) can't be compared.
+        '''
+        return WorkoutLog.objects.filter(repetition_unit_id=ExerciseStatistics.REPETITION_UNIT,
+                                         weight_unit_id__in=ExerciseStatistics.WEIGHT_UNITS)
+
+    def rebuild(self, user_id=None, exercise_id=None, batch_size=None):
+        '''
+        Calculates the statistics again from the log entries
+
+        The number of queries does not depend on the number of users, exercises
+        or log entries.
+
+        :param user_id: optional, only process this user
+        :param exercise_id: optional, only process this exercise
+        :param batch_size: number of entries created with one query
+        :return: the number of statistics entries
+        '''
+        logs = self.get_logs().order_by()
+        statistics = self.get_queryset()
+        if user_id:
+            logs = logs.filter(user_id=user_id)
+            statistics = statistics.filter(user_id=user_id)
+        if exercise_id:
+            logs = logs.filter(exercise_id=exercise_id)
+            statistics = statistics.filter(exercise_id=exercise_id)
+
+        volume = models.ExpressionWrapper(models.F('reps') * models.F('weight'),
+                                          output_field=models.DecimalField())
+        totals = logs.values('user_id', 'exercise_id', 'weight_unit_id').annotate(
+            total_volume=models.Sum(volume),
+            session_count=models.Count('date', distinct=True),
+            log_count=models.Count('id'),
+            last_date=models.Max('date'))
+
+        best_weights = {}
+        for user, exercise, unit, reps, weight in logs.values_list('user_id',
+                                                                   'exercise_id',
+                                                                   'weight_unit_id',
+                                                                   'reps') \
+                .annotate(models.Max('weight')):
+            best_weights.setdefault((user, exercise, unit), {})[reps] = weight
+
+        entries = []
+        for total in totals:
+            entry = ExerciseStatistics(user_id=total['user_id'],
+                                       exercise_id=total['exercise_id'],
+                                       weight_unit_id=total['weight_unit_id'],
+                                       total_volume=normalize_weight(total['total_volume']),
+                                       session_count=total['session_count'],
+                                       log_count=total['log_count'],
+                                       last_date=total['last_date'])
+            entry.set_best_weights(best_weights[(total['user_id'],
+                                                 total['exercise_id'],
+                                                 total['weight_unit_id'])])
+            entries.append(entry)
+
+        statistics.delete()
+        self.bulk_create(entries, batch_size=batch_size)
+        return len(entries)
+
+    def add_log(self, log):
+        '''
+        Updates the statistics with a new log entry
+
+        The row is locked while it is updated, so that concurrent log entries
+        don't overwrite each other's changes.
+
+        :param log: the new WorkoutLog
+        '''
+        if log.repetition_unit_id != ExerciseStatistics.REPETITION_UNIT \
+                or log.weight_unit_id not in ExerciseStatistics.WEIGHT_UNITS:
+            return
+
+        with transaction.atomic():
+            statistics = self.select_for_update() \
+                .filter(user_id=log.user_id,
+                        exercise_id=log.exercise_id,
+                        weight_unit_id=log.weight_unit_id) \
+                .first()
+            if statistics is None:
+                self.create_statistics(log)
+                return
+
+            weight = normalize_weight(log.weight)
+            new_date = not self.get_logs().filter(user_id=log.user_id,
+                                                  exercise_id=log.exercise_id,
+                                                  weight_unit_id=log.weight_unit_id,
+                                                  date=log.date) \
+                .exclude(pk=log.pk) \
+                .exists()
+
+            statistics.total_volume += log.reps * weight
+            statistics.session_count += 1 if new_date else 0
+            statistics.log_count += 1
+            statistics.last_date = max(statistics.last_date, log.date)
+            best_weights = statistics.get_best_weights()
+            best_weights[log.reps] = max(best_weights.get(log.reps, weight), weight)
+            statistics.set_best_weights(best_weights)
+            statistics.save()
+
+    def create_statistics(self, log):
+        '''
+        Calculates the statistics of the user and exercise of a log entry that
+        has none yet
+
+        If another process created them in the meantime, they are calculated
+        again, so that the entries of both are counted.
+
+        :param log: the new WorkoutLog
+        '''
+        try:
+            with transaction.atomic():
+                self.rebuild(user_id=log.user_id, exercise_id=log.exercise_id)
+        except IntegrityError:
+            self.rebuild(user_id=log.user_id, exercise_id=log.exercise_id)
+
+
+def normalize_weight(weight):
+    '''
+    Returns a weight as a decimal with two places
+    '''
+    return decimal.Decimal(six.text_type(weight or 0)).quantize(decimal.Decimal('0.01'))
+
+
+def get_estimated_one_rep_max(reps, weight):
+    '''
+    Estimates the one repetition maximum with the Epley formula
+
+    :param reps: number of repetitions
+    :param weight: weight lifted that many times
+    '''
+    if reps <= 1:
+        return weight
+    return (weight * (1 + decimal.Decimal(reps) / 30)).quantize(decimal.Decimal('0.01'))
+
+
+@python_2_unicode_compatible
+class ExerciseStatistics(models.Model):
+    '''
+    Summary of the logs of a user for an exercise
+
+    The entries are updated when the logs are saved or deleted, so they can be
+    used instead of going through the whole history.
+    '''
+
+    REPETITION_UNIT = 1
+    '''Logs with repetitions, the other units are not used'''
+
+    WEIGHT_UNITS = (1, 2)
+    '''
+    Logs with kg or lb, the other units are not used. The statistics are kept
+    per unit, so that the weights are never mixed.
+    '''
+
+    objects = ExerciseStatisticsManager()
+    '''Custom manager'''
+
+    user = models.ForeignKey(User,
+                             verbose_name=_('User'),
+                             editable=False)
+    exercise = models.ForeignKey(Exercise,
+                                 verbose_name=_('Exercise'),
+                                 editable=False)
+    weight_unit = models.ForeignKey(WeightUnit,
+                                    verbose_name=_('Unit'),
+                                    editable=False)
+
+    best_weights = models.TextField(editable=False)
+    '''
+    The maximum weight for each number of repetitions, as JSON.
+    Use get_best_weights() to access them.
+    '''
+
+    total_volume = models.DecimalField(verbose_name=_('Total volume'),
+                                       decimal_places=2,
+                                       max_digits=12,
+                                       editable=False)
+    '''The sum of repetitions times weight of all logs'''
+
+    session_count = models.IntegerField(verbose_name=_('Sessions'),
+                                        editable=False)
+    '''Number of different days with logs'''
+
+    log_count = models.IntegerField(editable=False)
+    '''Number of log entries'''
+
+    last_date = models.DateField(verbose_name=_('Last performed'),
+                                 editable=False)
+    '''Date of the last log'''
+
+    class Meta:
+        '''
+        Set other properties
+        '''
+        unique_together = ("user", "exercise", "weight_unit")
+        ordering = ["weight_unit", ]
+
+    def __str__(self):
+        '''
+        Return a more human-readable representation
+        '''
+        return u"Statistics: {0} - {1} ({2})".format(self.user_id,
+                                                     self.exercise_id,
+                                                     self.weight_unit_id)
+
+    def get_owner_object(self):
+        '''
+        Returns the object that has owner information
+        '''
+        return self
+
+    def get_best_weights(self):
+        '''
+        Returns the maximum weight for each number of repetitions
+
+        :return: an ordered dictionary with the repetitions as keys
+        '''
+        weights = json.loads(self.best_weights) if self.best_weights else {}
+        return collections.OrderedDict(sorted((int(reps), decimal.Decimal(weight))
+                                              for reps, weight in weights.items()))
+
+    def set_best_weights(self, weights):
+        '''
+        Saves the maximum weight for each number of repetitions
+
+        :param weights: dictionary with the repetitions as keys
+        '''
+        self.best_weights = json.dumps({six.text_type(reps): six.text_type(normalize_weight(weight))
+                                        for reps, weight in weights.items()},
+                                       sort_keys=True)
+
+    @property
+    def estimated_one_rep_max(self):
+        '''
+        The highest estimated one repetition maximum of all logs
+        '''
+        return max([get_estimated_one_rep_max(reps, weight)
+                    for reps, weight in self.get_best_weights().items()] or [None])
@@ -15,27 +15,179 @@
 # You should have received a copy of the GNU Affero General Public License
 
 
-from django.db.models.signals import post_save, post_delete
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_save, m2m_changed
 
-from wger.gym.helpers import get_user_last_activity
-from wger.manager.models import WorkoutLog, WorkoutSession
+from wger.gym.helpers import update_user_cache_last_activity
+from wger.manager.models import (
+    Day,
+    ExerciseStatistics,
+    Schedule,
+    ScheduleStep,
+    Workout,
+    WorkoutLog,
+    WorkoutSession
+)
 from wger.core.models import UserCache
+from wger.utils.cache import reset_dashboard_summary, reset_schedule_timeline
+from wger.utils.helpers import disable_for_bulk_delete, disable_for_loaddata
 
 
-def update_activity_cache(sender, instance, **kwargs):
+def update_activity_cache(sender, instance, created, **kwargs):
     '''
     Update the user's cached last activity date
+
+    New entries can only move the date forward, changed ones could also have
+    been the last activity, so the date is calculated again.
+    '''
+    if created:
+        UserCache.objects.filter(user_id=instance.user_id) \
+            .filter(Q(last_activity__isnull=True) | Q(last_activity__lt=instance.date)) \
+            .update(last_activity=instance.date)
+    else:
+        update_user_cache_last_activity([instance.user_id])
+
+
+@disable_for_bulk_delete
+def reset_activity_cache(sender, instance, **kwargs):
+    '''
+    Update the user's cached last activity date after deleting an entry
+
+    The date only needs to be calculated again if the entry was the last
+    activity. Only the user ID is used, since the user could be in the process
+    of being deleted as well.
+    '''
+    if UserCache.objects.filter(user_id=instance.user_id,
+                                last_activity__lte=instance.date).exists():
+        update_user_cache_last_activity([instance.user_id])
+
+
+@disable_for_loaddata
+def store_statistics_exercise(sender, instance, **kwargs):
+    '''
+    Remember the exercise of a log before it is changed, its old statistics
+    have to be updated as well
+    '''
+    if instance.pk:
+        instance._statistics_exercise_id = WorkoutLog.objects.filter(pk=instance.pk) \
+            .values_list('exercise_id', flat=True) \
+            .first()
+
+
+@disable_for_loaddata
+def update_exercise_statistics(sender, instance, created, **kwargs):
+    '''
+    Update the statistics of the log's exercise
+
+    New entries are added to the existing values, changed ones are calculated
+    again, since the old values are not known.
+    '''
+    if created:
+        ExerciseStatistics.objects.add_log(instance)
+    else:
+        ExerciseStatistics.objects.rebuild(user_id=instance.user_id,
+                                           exercise_id=instance.exercise_id)
+
+        previous_exercise_id = getattr(instance, '_statistics_exercise_id', None)
+        if previous_exercise_id and previous_exercise_id != instance.exercise_id:
+            ExerciseStatistics.objects.rebuild(user_id=instance.user_id,
+                                               exercise_id=previous_exercise_id)
+
+
+@disable_for_bulk_delete
+def reset_exercise_statistics(sender, instance, **kwargs):
+    '''
+    Calculate the statistics of the log's exercise again after deleting it
+
+    Only the IDs are used, since the user or exercise could be in the process
+    of being deleted as well.
     '''
+    if ExerciseStatistics.objects.filter(user_id=instance.user_id,
+                                         exercise_id=instance.exercise_id).exists():
+        ExerciseStatistics.objects.rebuild(user_id=instance.user_id,
+                                           exercise_id=instance.exercise_id)
 
-    user = instance.user
-    user.usercache.last_activity = get_user_last_activity(user)
-    user.usercache.save()
+
+@disable_for_bulk_delete
+def reset_timeline_schedule(sender, instance, **kwargs):
+    '''
+    Remove the cached timeline of a deleted schedule
+
+    Only the steps are cached, changes to the schedule itself (e.g. its start
+    date) don't need to reset it
+    '''
+    reset_schedule_timeline(instance.pk)
+
+
+@disable_for_bulk_delete
+def reset_timeline_schedule_step(sender, instance, **kwargs):
+    '''
+    Reset the cached timeline of the schedule of a step when the step is
+    changed or deleted (also when its workout is deleted)
+    '''
+    reset_schedule_timeline(instance.schedule_id)
+
+
+@disable_for_bulk_delete
+def reset_dashboard(sender, instance, **kwargs):
+    '''
+    Resets the dashboard of the owner of a changed workout or schedule
+    '''
+    reset_dashboard_summary(instance.user_id)
+
+
+@disable_for_bulk_delete
+def reset_dashboard_day(sender, instance, **kwargs):
+    '''
+    Resets the dashboard of the owner of a changed workout day
+
+    Only the workout's ID is used, since it could be in the process of being
+    deleted as well.
+    '''
+    user_id = Workout.objects.filter(pk=instance.training_id) \
+        .values_list('user_id', flat=True) \
+        .first()
+    if user_id:
+        reset_dashboard_summary(user_id)
+
+
+def reset_dashboard_days_of_week(sender, instance, action, reverse, **kwargs):
+    '''
+    Resets the dashboard of the owner of a workout day when the days of the
+    week it is done on change
+    '''
+    if action.startswith('post_') and not reverse:
+        reset_dashboard_day(sender, instance)
+
+
+@disable_for_bulk_delete
+def reset_dashboard_schedule_step(sender, instance, **kwargs):
+    '''
+    Resets the dashboard of the owner of a changed schedule step
+    '''
+    user_id = Schedule.objects.filter(pk=instance.schedule_id) \
+        .values_list('user_id', flat=True) \
+        .first()
+    if user_id:
+        reset_dashboard_summary(user_id)
 
 
 post_save.connect(update_activity_cache, sender=WorkoutSession)
 post_save.connect(update_activity_cache, sender=WorkoutLog)
-
-# TODO: this seems to cause problems when users are deleted
-#       perhaps because of the cascading, needs to be checked
-# post_delete.connect(update_activity_cache, sender=WorkoutSession)
-# post_delete.connect(update_activity_cache, sender=WorkoutLog)
+post_delete.connect(reset_activity_cache, sender=WorkoutSession)
+post_delete.connect(reset_activity_cache, sender=WorkoutLog)
+pre_save.connect(store_statistics_exercise, sender=WorkoutLog)
+post_save.connect(update_exercise_statistics, sender=WorkoutLog)
+post_delete.connect(reset_exercise_statistics, sender=WorkoutLog)
+post_delete.connect(reset_timeline_schedule, sender=Schedule)
+post_save.connect(reset_timeline_schedule_step, sender=ScheduleStep)
+post_delete.connect(reset_timeline_schedule_step, sender=ScheduleStep)
+post_save.connect(reset_dashboard, sender=Workout)
+post_delete.connect(reset_dashboard, sender=Workout)
+post_save.connect(reset_dashboard, sender=Schedule)
+post_delete.connect(reset_dashboard, sender=Schedule)
+post_save.connect(reset_dashboard_day, sender=Day)
+post_delete.connect(reset_dashboard_day, sender=Day)
+m2m_changed.connect(reset_dashboard_days_of_week, sender=Day.day.through)
+post_save.connect(reset_dashboard_schedule_step, sender=ScheduleStep)
+post_delete.connect(reset_dashboard_schedule_step, sender=ScheduleStep)
@@ -18,7 +18,7 @@ from django.contrib.auth.models import User
 from django.core import mail
 from django.core.management import call_command
 
-from wger.core.models import UserProfile
+from wger.core.models import Language, UserProfile
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 from wger.manager.models import Schedule
 from wger.manager.models import Workout
@@ -232,3 +232,82 @@ class EmailReminderTestCase(WorkoutManagerTestCase):
 
         call_command('email-reminders')
         self.assertEqual(len(mail.outbox), 0)
+
+    def test_reminder_batches(self):
+        '''
+        Test processing the users in several batches
+        '''
+        Schedule.objects.all().delete()
+        UserProfile.objects.update(workout_reminder_active=True)
+        User.objects.update(email='test@example.com')
+        users = Workout.objects.values_list('user', flat=True).distinct().count()
+
+        call_command('email-reminders', batch_size=2)
+        self.assertEqual(len(mail.outbox), users)
+        self.assertEqual(UserProfile.objects
+                         .filter(last_workout_notification=datetime.date.today()).count(),
+                         users)
+
+        # The users already notified are skipped, e.g. when resuming the job
+        call_command('email-reminders', batch_size=2)
+        self.assertEqual(len(mail.outbox), users)
+
+    def test_reminder_languages(self):
+        '''
+        Test sending the emails to users with different languages
+        '''
+        Schedule.objects.all().delete()
+        Workout.objects.exclude(user__in=(1, 2)).delete()
+        UserProfile.objects.filter(user__in=(1, 2)).update(workout_reminder_active=True)
+        profile = UserProfile.objects.get(user=2)
+        profile.notification_language = Language.objects.get(short_name='de')
+        profile.save()
+
+        call_command('email-reminders')
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(set(email.to[0] for email in mail.outbox),
+                         set(User.objects.filter(pk__in=(1, 2)).values_list('email', flat=True)))
+
+
+class CurrentWorkoutsTestCase(WorkoutManagerTestCase):
+    '''
+    Tests finding the current workouts of several users at once
+    '''
+
+    def test_current_workouts(self):
+        '''
+        Test that the results are the same as for the individual users
+        '''
+        schedule = Schedule.objects.get(pk=2)
+        schedule.start_date = datetime.date.today()
+        schedule.is_active = True
+        schedule.save()
+
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        with self.assertNumQueries(5):
+            current_workouts = Schedule.objects.get_current_workouts(user_ids)
+
+        self.assertEqual(len(current_workouts), len(user_ids))
+        self.assertEqual(current_workouts[schedule.user_id][1], schedule)
+        for user in User.objects.all():
+            self.assertEqual(current_workouts[user.pk],
+                             Schedule.objects.get_current_workout(user))
+
+    def test_last_workout(self):
+        '''
+        Test that the last workout is used for users without schedules
+        '''
+        Schedule.objects.all().delete()
+        Workout.objects.filter(user=1).update(creation_date=datetime.date(2015, 1, 1))
+        old = Workout.objects.create(user_id=1)
+        new = Workout.objects.create(user_id=1)
+        Workout.objects.filter(pk=old.pk).update(creation_date=datetime.date(2016, 2, 1))
+        Workout.objects.filter(pk=new.pk).update(creation_date=datetime.date(2016, 1, 1))
+
+        # The workout of user 2 was created on the same day as the last one of user 1
+        Workout.objects.filter(user=2).update(creation_date=datetime.date(2016, 2, 1))
+
+        current_workouts = Schedule.objects.get_current_workouts([1, 2])
+        self.assertEqual(current_workouts[1], (old, False))
+        self.assertEqual(current_workouts[2],
+                         (Workout.objects.filter(user=2).order_by('-pk').first(), False))
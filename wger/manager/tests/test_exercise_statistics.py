@@ -0,0 +1,197 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import datetime
+import decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.manager.models import (
+    ExerciseStatistics,
+    Workout,
+    WorkoutLog
+)
+
+
+class ExerciseStatisticsTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the statistics of the logs of each user and exercise
+    '''
+
+    def setUp(self):
+        super(ExerciseStatisticsTestCase, self).setUp()
+        self.user = User.objects.get(pk=1)
+        self.workout = Workout.objects.create(user=self.user)
+        self.logs = WorkoutLog.objects.filter(user=self.user, exercise=3)
+        self.logs.delete()
+
+    def add_log(self, date, reps, weight, exercise=3, **kwargs):
+        '''
+        Helper function to add a log entry
+        '''
+        return WorkoutLog.objects.create(user=self.user,
+                                         workout=self.workout,
+                                         exercise_id=exercise,
+                                         date=date,
+                                         reps=reps,
+                                         weight=weight,
+                                         **kwargs)
+
+    def get_statistics(self, exercise=3, weight_unit=1):
+        '''
+        Helper function returning the saved statistics
+        '''
+        return ExerciseStatistics.objects.filter(user=self.user,
+                                                 exercise=exercise,
+                                                 weight_unit=weight_unit).first()
+
+    def assert_statistics(self, exercise=3):
+        '''
+        Checks that the saved statistics are the same as the ones calculated
+        again from the logs
+        '''
+        fields = ('weight_unit_id', 'total_volume', 'session_count', 'log_count', 'last_date')
+        statistics = ExerciseStatistics.objects.filter(user=self.user, exercise=exercise)
+        saved = [[getattr(entry, field) for field in fields] + [entry.get_best_weights()]
+                 for entry in statistics]
+        ExerciseStatistics.objects.rebuild(user_id=self.user.pk, exercise_id=exercise)
+        expected = [[getattr(entry, field) for field in fields] + [entry.get_best_weights()]
+                    for entry in statistics.all()]
+        self.assertEqual(saved, expected)
+
+    def test_add_logs(self):
+        '''
+        Test that new logs update the statistics
+        '''
+        self.assertIsNone(self.get_statistics())
+        self.add_log(datetime.date(2016, 1, 1), 10, 50)
+        self.add_log(datetime.date(2016, 1, 1), 10, 55)
+        self.add_log(datetime.date(2016, 1, 5), 5, 70)
+        self.add_log(datetime.date(2016, 1, 3), 10, '52.5')
+
+        # Minutes are not used
+        self.add_log(datetime.date(2016, 2, 1), 5, 100, repetition_unit_id=3)
+
+        statistics = self.get_statistics()
+        self.assertEqual(statistics.total_volume, decimal.Decimal('1925'))
+        self.assertEqual(statistics.session_count, 3)
+        self.assertEqual(statistics.log_count, 4)
+        self.assertEqual(statistics.last_date, datetime.date(2016, 1, 5))
+        self.assertEqual(list(statistics.get_best_weights().items()),
+                         [(5, decimal.Decimal(70)), (10, decimal.Decimal(55))])
+        self.assertEqual(statistics.estimated_one_rep_max, decimal.Decimal('81.67'))
+        self.assert_statistics()
+
+    def test_weight_units(self):
+        '''
+        Test that the logs in kg and lb are not mixed
+        '''
+        self.add_log(datetime.date(2016, 1, 1), 10, 50)
+        self.add_log(datetime.date(2016, 1, 2), 10, 100, weight_unit_id=2)
+        self.add_log(datetime.date(2016, 1, 3), 5, 120, weight_unit_id=2)
+
+        kg = self.get_statistics()
+        self.assertEqual(kg.total_volume, decimal.Decimal(500))
+        self.assertEqual(kg.log_count, 1)
+        self.assertEqual(kg.get_best_weights(), {10: decimal.Decimal(50)})
+
+        lb = self.get_statistics(weight_unit=2)
+        self.assertEqual(lb.total_volume, decimal.Decimal(1600))
+        self.assertEqual(lb.session_count, 2)
+        self.assertEqual(lb.get_best_weights(), {5: decimal.Decimal(120),
+                                                 10: decimal.Decimal(100)})
+        self.assert_statistics()
+
+        # Changing the unit moves the log to the other statistics
+        log = WorkoutLog.objects.get(user=self.user, exercise=3, weight=50)
+        log.weight_unit_id = 2
+        log.save()
+        self.assertIsNone(self.get_statistics())
+        self.assertEqual(self.get_statistics(weight_unit=2).log_count, 3)
+
+    def test_edit_log(self):
+        '''
+        Test that changing a log updates the statistics
+        '''
+        self.add_log(datetime.date(2016, 1, 1), 10, 50)
+        log = self.add_log(datetime.date(2016, 1, 2), 10, 60)
+
+        log.weight = 40
+        log.save()
+        self.assertEqual(self.get_statistics().get_best_weights(), {10: decimal.Decimal(50)})
+        self.assert_statistics()
+
+        # Change the exercise
+        log.exercise_id = 1
+        log.save()
+        self.assertEqual(self.get_statistics().log_count, 1)
+        self.assert_statistics()
+        self.assert_statistics(exercise=1)
+
+    def test_delete_log(self):
+        '''
+        Test that deleting logs updates the statistics
+        '''
+        log1 = self.add_log(datetime.date(2016, 1, 1), 10, 50)
+        log2 = self.add_log(datetime.date(2016, 1, 2), 10, 60)
+
+        log2.delete()
+        self.assertEqual(self.get_statistics().last_date, datetime.date(2016, 1, 1))
+        self.assert_statistics()
+
+        log1.delete()
+        self.assertIsNone(self.get_statistics())
+
+    def test_delete_user(self):
+        '''
+        Test that users with statistics can be deleted
+        '''
+        self.add_log(datetime.date(2016, 1, 1), 10, 50)
+        self.user.delete()
+        self.assertFalse(ExerciseStatistics.objects.filter(user=1).exists())
+
+    def test_command(self):
+        '''
+        Test the management command
+        '''
+        ExerciseStatistics.objects.all().delete()
+        call_command('rebuild-exercise-statistics')
+
+        pairs = set(ExerciseStatistics.objects.get_logs()
+                    .values_list('user_id', 'exercise_id').distinct())
+        self.assertTrue(pairs)
+        self.assertEqual(set(ExerciseStatistics.objects.values_list('user_id', 'exercise_id')),
+                         pairs)
+        for user_id, exercise_id in pairs:
+            logs = ExerciseStatistics.objects.get_logs().filter(user=user_id,
+                                                                exercise=exercise_id)
+            for statistics in ExerciseStatistics.objects.filter(user=user_id,
+                                                                exercise=exercise_id):
+                unit_logs = logs.filter(weight_unit=statistics.weight_unit_id)
+                self.assertEqual(statistics.log_count, unit_logs.count())
+                self.assertEqual(statistics.total_volume,
+                                 sum(log.reps * log.weight for log in unit_logs))
+
+    def test_exercise_view(self):
+        '''
+        Test that the statistics are shown on the exercise page
+        '''
+        self.add_log(datetime.date(2016, 1, 1), 10, 50)
+        self.user_login('admin')
+        response = self.client.get(reverse('exercise:exercise:view', kwargs={'id': 3}))
+        self.assertEqual(list(response.context['statistics']), [self.get_statistics()])
+        self.assertContains(response, 'Estimated 1RM')
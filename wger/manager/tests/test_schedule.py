@@ -24,6 +24,7 @@ from wger.core.tests.base_testcase import WorkoutManagerAddTestCase
 from wger.core.tests.base_testcase import WorkoutManagerDeleteTestCase
 from wger.core.tests.base_testcase import WorkoutManagerEditTestCase
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.manager.helpers import get_schedule_position
 from wger.manager.models import Schedule
 from wger.manager.models import ScheduleStep
 from wger.manager.models import Workout
@@ -304,6 +305,84 @@ class ScheduleEndDateTestCase(WorkoutManagerTestCase):
         self.assertEqual(schedule.get_end_date(), schedule.start_date)
 
 
+class ScheduleTimelineTestCase(WorkoutManagerTestCase):
+    '''
+    Test the timeline of the schedules
+    '''
+
+    def get_position(self, step_ends, days, is_loop):
+        '''
+        Helper function that finds the position by going through every step
+        '''
+        cycle = 0
+        while True:
+            for index, end in enumerate(step_ends):
+                if cycle * step_ends[-1] + end >= days:
+                    return cycle, index
+            if not is_loop:
+                return None
+            cycle += 1
+
+    def test_position(self):
+        '''
+        Test the calculation of the current step
+        '''
+        step_ends = [21, 56, 70]
+        for days in range(-10, 500):
+            self.assertEqual(get_schedule_position(step_ends, days, True),
+                             self.get_position(step_ends, days, True))
+            self.assertEqual(get_schedule_position(step_ends, days, False),
+                             self.get_position(step_ends, days, False))
+
+    def test_timeline(self):
+        '''
+        Test the dates of the steps
+
+        Steps: 3, 5 and 2 weeks, starting on the 2013-04-21
+        '''
+        schedule = Schedule.objects.get(pk=2)
+        self.assertEqual([(entry.start, entry.end, entry.step_id, entry.workout_id)
+                          for entry in schedule.get_timeline()],
+                         [(datetime.date(2013, 4, 21), datetime.date(2013, 5, 12), 1, 1),
+                          (datetime.date(2013, 5, 12), datetime.date(2013, 6, 16), 2, 2),
+                          (datetime.date(2013, 6, 16), datetime.date(2013, 6, 30), 3, 1)])
+
+        # The steps are cached
+        with self.assertNumQueries(0):
+            schedule.get_timeline()
+
+    def test_timeline_entry(self):
+        '''
+        Test the step for a date in a later cycle of a loop
+        '''
+        schedule = Schedule.objects.get(pk=2)
+        entry = schedule.get_timeline_entry(datetime.date(2014, 5, 1))
+        self.assertEqual(entry.step_id, 2)
+        self.assertEqual(entry.start, datetime.date(2014, 4, 27))
+        self.assertEqual(entry.end, datetime.date(2014, 6, 1))
+
+        schedule.is_loop = False
+        self.assertIsNone(schedule.get_timeline_entry(datetime.date(2014, 5, 1)))
+        self.assertEqual(schedule.get_timeline_entry(datetime.date(2013, 5, 12)).step_id, 1)
+        self.assertEqual(schedule.get_timeline_entry(datetime.date(2013, 5, 13)).step_id, 2)
+
+    def test_reset(self):
+        '''
+        Test that changing the steps resets the cached timeline
+        '''
+        schedule = Schedule.objects.get(pk=2)
+        schedule.is_loop = False
+        self.assertEqual(schedule.get_end_date(), datetime.date(2013, 6, 30))
+
+        step = ScheduleStep.objects.get(pk=3)
+        step.duration = 4
+        step.save()
+        self.assertEqual(schedule.get_end_date(), datetime.date(2013, 7, 14))
+
+        step.delete()
+        self.assertEqual(schedule.get_end_date(), datetime.date(2013, 6, 16))
+
+
 class ScheduleModelTestCase(WorkoutManagerTestCase):
     '''
     Tests the model methods
@@ -18,12 +18,19 @@ import math
 from decimal import Decimal
 
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 from wger.exercises.models import Exercise
+from wger.manager.models import Setting
 from wger.manager.models import Workout
+from wger.manager.models import WorkoutLog
 from wger.manager.models import WorkoutSession
+from wger.manager.views.workout import LastWeightHelper
+from wger.utils.cache import cache_mapper
 
 logger = logging.getLogger(__name__)
 
@@ -187,3 +194,74 @@ class WorkoutTimerWorkoutSessionTestCase(WorkoutManagerTestCase):
         response = self.client.get(reverse('manager:workout:timer', kwargs={'day_pk': 5}))
         self.assertEqual(response.context['form_action'],
                          reverse('manager:session:edit', kwargs={'pk': session.pk}))
+
+
+class LastWeightTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the weights of the last logs shown in the timer
+    '''
+
+    def test_queries(self):
+        '''
+        Test that the weights of all exercises are loaded with two queries, one
+        for the dates of the last logs and one for their weights
+        '''
+        self.user_login('admin')
+        setting = Setting.objects.filter(set__exerciseday_id=2).first()
+        WorkoutLog.objects.create(user=User.objects.get(username='admin'),
+                                  exercise=setting.exercise,
+                                  workout=Workout.objects.get(pk=2),
+                                  reps=setting.reps,
+                                  weight=50,
+                                  date=datetime.date.today())
+        url = reverse('manager:workout:timer', kwargs={'day_pk': 2})
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if 'manager_workoutlog' in query['sql']]), 0)
+
+        cache.delete(cache_mapper.get_workout_log_last_weights(1))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if 'manager_workoutlog' in query['sql']]), 2)
+
+    def test_last_weight(self):
+        '''
+        Test that the weight of the last log is returned
+        '''
+        user = User.objects.get(username='admin')
+        exercise = Exercise.objects.get(pk=1)
+        helper = LastWeightHelper(user, [(1, 8), (1, 99)])
+        self.assertEqual(helper.get_last_weight(exercise, 8, 20), Decimal(38))
+        self.assertEqual(helper.get_last_weight(exercise, 99, 20), 20)
+        self.assertEqual(helper.get_last_weight(exercise, 99, None), '')
+
+        # Saving a log resets the cache, but not the weights of the request
+        WorkoutLog.objects.create(user=user,
+                                  exercise=exercise,
+                                  workout=Workout.objects.get(pk=1),
+                                  reps=8,
+                                  weight=40,
+                                  date=datetime.date.today())
+        self.assertIsNone(cache.get(cache_mapper.get_workout_log_last_weights(user)))
+        self.assertEqual(helper.get_last_weight(exercise, 8, 20), Decimal(38))
+        self.assertEqual(LastWeightHelper(user).get_last_weight(exercise, 8, 20), Decimal(40))
+
+    def test_last_weight_same_date(self):
+        '''
+        Test that the newest log is used if there are several on the last date
+        '''
+        user = User.objects.get(username='admin')
+        exercise = Exercise.objects.get(pk=1)
+        for weight in (45, 42):
+            WorkoutLog.objects.create(user=user,
+                                      exercise=exercise,
+                                      workout=Workout.objects.get(pk=1),
+                                      reps=8,
+                                      weight=weight,
+                                      date=datetime.date.today())
+        helper = LastWeightHelper(user, [(1, 8), (2, 8)])
+        self.assertEqual(helper.get_last_weight(exercise, 8, 20), Decimal(42))
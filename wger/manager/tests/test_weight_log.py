@@ -18,6 +18,8 @@ import logging
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.urlresolvers import reverse, reverse_lazy
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from wger.core.tests import api_base_test
 from wger.core.tests.base_testcase import WorkoutManagerDeleteTestCase
@@ -27,6 +29,7 @@ from wger.manager.models import Workout
 from wger.manager.models import WorkoutLog
 from wger.manager.models import WorkoutSession
 from wger.utils.cache import cache_mapper
+from wger.weight.helpers import group_log_entries
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +96,37 @@ class WeightLogAccessTestCase(WorkoutManagerTestCase):
         self.assertEqual(response.status_code, 403)
 
 
+class WeightLogDetailTestCase(WorkoutManagerTestCase):
+    '''
+    Test the logs and charts of the weight log page
+    '''
+
+    def test_logs(self):
+        '''
+        Test that the logs of all exercises are loaded with one query
+        '''
+        self.user_login('test')
+        url = reverse('manager:log:log', kwargs={'pk': 1})
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(len([query for query in context.captured_queries
+                              if 'FROM "manager_workoutlog"' in query['sql']]), 1)
+
+        workout_log = response.context['workout_log']
+        logs = WorkoutLog.objects.filter(workout=1, user=1, weight_unit__in=(1, 2),
+                                         repetition_unit=1)
+        for day_log in workout_log.values():
+            for exercise_id, exercise_log in day_log.items():
+                self.assertEqual(sum(len(entries)
+                                     for entries in exercise_log['log_by_date'].values()),
+                                 logs.filter(exercise=exercise_id).count())
+        self.assertTrue(any(exercise_log['log_by_date']
+                            for day_log in workout_log.values()
+                            for exercise_log in day_log.values()))
+
+
 class CalendarShareButtonTestCase(WorkoutManagerTestCase):
     '''
     Test that the share button is correctly displayed and hidden
@@ -369,60 +403,59 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         '''
         Test the log cache is correctly generated on visit
         '''
-        log_hash = hash((1, 2012, 10))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertFalse(cache.get(cache_key))
 
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertTrue(cache.get(cache_key))
 
     def test_calendar_day(self):
         '''
         Test the log cache on the calendar day view is correctly generated on visit
         '''
-        log_hash = hash((1, 2012, 10, 1))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertFalse(cache.get(cache_key))
 
         self.client.get(reverse('manager:workout:calendar-day', kwargs={'username': 'admin',
                                                                         'year': 2012,
                                                                         'month': 10,
                                                                         'day': 1}))
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertTrue(cache.get(cache_key))
 
     def test_calendar_anonymous(self):
         '''
         Test the log cache is correctly generated on visit by anonymous users
         '''
-        log_hash = hash((1, 2012, 10))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_logout()
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertFalse(cache.get(cache_key))
 
         self.client.get(reverse('manager:workout:calendar', kwargs={'username': 'admin',
                                                                     'year': 2012,
                                                                     'month': 10}))
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertTrue(cache.get(cache_key))
 
     def test_calendar_day_anonymous(self):
         '''
         Test the log cache is correctly generated on visit by anonymous users
         '''
-        log_hash = hash((1, 2012, 10, 1))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_logout()
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertFalse(cache.get(cache_key))
 
         self.client.get(reverse('manager:workout:calendar-day', kwargs={'username': 'admin',
                                                                         'year': 2012,
                                                                         'month': 10,
                                                                         'day': 1}))
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertTrue(cache.get(cache_key))
 
     def test_cache_update_log(self):
         '''
         Test that the caches are cleared when saving a log
         '''
-        log_hash = hash((1, 2012, 10))
-        log_hash_day = hash((1, 2012, 10, 1))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
         self.client.get(reverse('manager:workout:calendar-day', kwargs={'username': 'admin',
@@ -434,15 +467,13 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         log.weight = 35
         log.save()
 
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash_day)))
+        self.assertFalse(cache.get(cache_key))
 
     def test_cache_update_log_2(self):
         '''
         Test that the caches are only cleared for a the log's month
         '''
-        log_hash = hash((1, 2012, 10))
-        log_hash_day = hash((1, 2012, 10, 1))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
         self.client.get(reverse('manager:workout:calendar-day', kwargs={'username': 'admin',
@@ -454,15 +485,13 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         log.weight = 35
         log.save()
 
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash_day)))
+        self.assertTrue(cache.get(cache_key))
 
     def test_cache_delete_log(self):
         '''
         Test that the caches are cleared when deleting a log
         '''
-        log_hash = hash((1, 2012, 10))
-        log_hash_day = hash((1, 2012, 10, 1))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
         self.client.get(reverse('manager:workout:calendar-day', kwargs={'username': 'admin',
@@ -473,15 +502,13 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         log = WorkoutLog.objects.get(pk=1)
         log.delete()
 
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash_day)))
+        self.assertFalse(cache.get(cache_key))
 
     def test_cache_delete_log_2(self):
         '''
         Test that the caches are only cleared for a the log's month
         '''
-        log_hash = hash((1, 2012, 10))
-        log_hash_day = hash((1, 2012, 10, 1))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
         self.client.get(reverse('manager:workout:calendar-day', kwargs={'username': 'admin',
@@ -492,8 +519,33 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         log = WorkoutLog.objects.get(pk=3)
         log.delete()
 
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash_day)))
+        self.assertTrue(cache.get(cache_key))
+
+    def test_group_log_entries(self):
+        '''
+        Test that the logs of a month are loaded with a fixed number of queries
+        and that the days use the cache of the month
+        '''
+        user = User.objects.get(pk=1)
+        self.assertEqual(cache_mapper.get_workout_log_list(user, 2012, 10),
+                         'workout-log-list-1-2012-10')
+
+        with self.assertNumQueries(2):
+            logs = group_log_entries(user, 2012, 10)
+        for date, entry in logs.items():
+            self.assertEqual(entry['session'],
+                             WorkoutSession.objects.filter(user=user, date=date).first())
+        self.assertEqual(sum(len(exercise_logs)
+                             for entry in logs.values()
+                             for exercise_logs in entry['logs'].values()),
+                         WorkoutLog.objects.filter(user=user,
+                                                   date__year=2012,
+                                                   date__month=10).count())
+
+        with self.assertNumQueries(0):
+            day_logs = group_log_entries(user, 2012, 10, 1)
+            self.assertEqual(list(day_logs.keys()), [datetime.date(2012, 10, 1)])
+            self.assertFalse(group_log_entries(user, 2012, 10, 31))
 
 
 class WorkoutLogApiTestCase(api_base_test.ApiBaseResourceTestCase):
@@ -12,8 +12,10 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import pickle
 from decimal import Decimal
 
+from django.contrib.auth.models import User
 from django.core.cache import cache
 
 from wger.core.models import (
@@ -29,7 +31,11 @@ from wger.manager.models import (
     Set,
     Setting
 )
-from wger.utils.cache import cache_mapper
+from wger.utils.cache import (
+    cache_mapper,
+    get_workout_canonical_stats,
+    get_workout_canonical_version
+)
 
 
 class WorkoutCanonicalFormTestCase(WorkoutManagerTestCase):
@@ -161,6 +167,68 @@ class WorkoutCanonicalFormTestCase(WorkoutManagerTestCase):
         self.assertEqual(day.canonical_representation['set_list'], canonical_form)
 
 
+class WorkoutCanonicalFormQueriesTestCase(WorkoutManagerTestCase):
+    '''
+    Tests that the number of queries for the canonical form doesn't depend
+    on the size of the workout
+    '''
+
+    def create_workout(self, nr_days, nr_sets):
+        '''
+        Helper that creates a workout with the given number of days and sets per day.
+        Each set has two exercises (a superset) with settings
+        '''
+        workout = Workout.objects.create(user=User.objects.get(pk=1))
+        for i in range(nr_days):
+            day = Day.objects.create(training=workout, description='Day {0}'.format(i))
+            day.day.add(DaysOfWeek.objects.get(pk=i % 7 + 1))
+            for j in range(nr_sets):
+                set_obj = Set.objects.create(exerciseday=day, order=j, sets=3)
+                for exercise in Exercise.objects.filter(pk__in=(1, 2)):
+                    set_obj.exercises.add(exercise)
+                    for k in range(3):
+                        Setting.objects.create(set=set_obj,
+                                               exercise=exercise,
+                                               reps=8 + k,
+                                               order=k)
+        return workout
+
+    def test_number_queries(self):
+        '''
+        Tests the number of queries for workouts of increasing size
+        '''
+        for nr_days, nr_sets in ((1, 1), (3, 4), (6, 8)):
+            workout = self.create_workout(nr_days, nr_sets)
+            cache.clear()
+            with self.assertNumQueries(9):
+                canonical_form = workout.canonical_representation
+            self.assertEqual(len(canonical_form['day_list']), nr_days)
+            for day in canonical_form['day_list']:
+                self.assertEqual(len(day['set_list']), nr_sets)
+                for set_dict in day['set_list']:
+                    self.assertTrue(set_dict['is_superset'])
+                    self.assertEqual(set_dict['exercise_list'][0]['reps_list'], [8, 9, 10])
+
+    def test_number_queries_cached_days(self):
+        '''
+        Tests that only the changed days are built again
+        '''
+        workout = self.create_workout(4, 4)
+        workout.canonical_representation
+
+        # Only the list of days is fetched
+        cache.delete(cache_mapper.get_workout_canonical(workout))
+        with self.assertNumQueries(1):
+            workout.canonical_representation
+
+        setting = Setting.objects.filter(set__exerciseday__training=workout).first()
+        setting.reps = 12
+        setting.save()
+        with self.assertNumQueries(9):
+            canonical_form = workout.canonical_representation
+        self.assertEqual(len(canonical_form['day_list']), 4)
+
+
 class WorkoutCacheTestCase(WorkoutManagerTestCase):
     '''
     Test case for the workout canonical representation
@@ -197,3 +265,70 @@ class WorkoutCacheTestCase(WorkoutManagerTestCase):
 
         workout.delete()
         self.assertFalse(cache.get(cache_mapper.get_workout_canonical(1)))
+
+    def test_canonical_form_cache_day(self):
+        '''
+        Tests that changing a day only resets the cache for that day
+        '''
+        workout = Workout.objects.get(pk=1)
+        workout.canonical_representation
+        version = get_workout_canonical_version(1)
+        for day in (1, 2, 4):
+            self.assertTrue(cache.get(cache_mapper.get_day_canonical(1, version, day)))
+
+        setting = Setting.objects.get(pk=1)
+        setting.reps = 12
+        setting.save()
+        self.assertFalse(cache.get(cache_mapper.get_workout_canonical(1)))
+        self.assertFalse(cache.get(cache_mapper.get_day_canonical(1, version, 1)))
+        self.assertTrue(cache.get(cache_mapper.get_day_canonical(1, version, 2)))
+        self.assertTrue(cache.get(cache_mapper.get_day_canonical(1, version, 4)))
+
+        canonical_form = workout.canonical_representation
+        self.assertEqual(canonical_form['day_list'][0]['set_list'][0]['exercise_list'][0]
+                         ['reps_list'], [12, 12])
+        self.assertTrue(cache.get(cache_mapper.get_day_canonical(1, version, 1)))
+
+    def test_canonical_form_cache_version(self):
+        '''
+        Tests that saving the workout increases the version of the cache
+        '''
+        workout = Workout.objects.get(pk=1)
+        workout.canonical_representation
+        version = get_workout_canonical_version(1)
+
+        workout.save()
+        self.assertEqual(get_workout_canonical_version(1), version + 1)
+        self.assertFalse(cache.get(cache_mapper.get_day_canonical(1, version + 1, 1)))
+
+    def test_canonical_form_cache_stats(self):
+        '''
+        Tests the counters of the cache
+        '''
+        workout = Workout.objects.get(pk=1)
+        workout.canonical_representation
+        workout.canonical_representation
+        self.assertIsNone(cache.get(cache_mapper.get_workout_canonical_stat('hit')))
+        self.assertEqual(get_workout_canonical_stats(), {'hit': 1, 'miss': 1, 'rebuild': 3})
+
+        Day.objects.get(pk=2).save()
+        workout.canonical_representation
+        self.assertEqual(get_workout_canonical_stats(), {'hit': 1, 'miss': 2, 'rebuild': 4})
+
+    def test_canonical_form_cache_plain_data(self):
+        '''
+        Tests that no model instances are saved in the cache
+        '''
+        description = u'Description of the exercise, not needed in the cache. ' * 5
+        Exercise.objects.filter(pk=1).update(description=description)
+        workout = Workout.objects.get(pk=1)
+        workout.canonical_representation
+        cached = cache.get(cache_mapper.get_workout_canonical(1))
+        self.assertEqual(cached['obj'].label, 'manager.Workout')
+        self.assertEqual(cached['day_list'][0]['obj'].label, 'manager.Day')
+        self.assertEqual(cached['day_list'][0]['set_list'][0]['exercise_list'][0]['obj'].label,
+                         'exercises.Exercise')
+        self.assertNotIn(b'django.db', pickle.dumps(cached))
+
+        # Long texts that are not needed are not saved
+        self.assertNotIn(description.encode('utf-8'), pickle.dumps(cached))
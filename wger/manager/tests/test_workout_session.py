@@ -172,7 +172,7 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         '''
         Test that the caches are cleared when updating a workout session
         '''
-        log_hash = hash((1, 2012, 10))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
 
@@ -180,13 +180,13 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         session.notes = 'Lorem ipsum'
         session.save()
 
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertFalse(cache.get(cache_key))
 
     def test_cache_update_session_2(self):
         '''
         Test that the caches are only cleared for a the session's month
         '''
-        log_hash = hash((1, 2012, 10))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
 
@@ -195,33 +195,33 @@ class WorkoutLogCacheTestCase(WorkoutManagerTestCase):
         session.notes = 'Lorem ipsum'
         session.save()
 
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertTrue(cache.get(cache_key))
 
     def test_cache_delete_session(self):
         '''
         Test that the caches are cleared when deleting a workout session
         '''
-        log_hash = hash((1, 2012, 10))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
 
         session = WorkoutSession.objects.get(pk=1)
         session.delete()
 
-        self.assertFalse(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertFalse(cache.get(cache_key))
 
     def test_cache_delete_session_2(self):
         '''
         Test that the caches are only cleared for a the session's month
         '''
-        log_hash = hash((1, 2012, 10))
+        cache_key = cache_mapper.get_workout_log_list(1, 2012, 10)
         self.user_login('admin')
         self.client.get(reverse('manager:workout:calendar', kwargs={'year': 2012, 'month': 10}))
 
         session = WorkoutSession.objects.get(pk=2)
         session.delete()
 
-        self.assertTrue(cache.get(cache_mapper.get_workout_log_list(log_hash)))
+        self.assertTrue(cache.get(cache_key))
 
 
 class WorkoutSessionApiTestCase(api_base_test.ApiBaseResourceTestCase):
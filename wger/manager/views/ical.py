@@ -151,11 +151,15 @@ def export_schedule(request, pk, uidb64=None, token=None):
     # Create the calendar
     calendar = get_calendar()
 
-    # Create the events and add them to the calendar
-    start_date = datetime.date.today()
-    for step in schedule.schedulestep_set.all():
-        get_events_workout(calendar, step.workout, step.duration, start_date)
-        start_date = start_date + datetime.timedelta(weeks=step.duration)
+    # Create the events and add them to the calendar, the schedule starts today
+    offset = datetime.date.today() - schedule.start_date
+    timeline = schedule.get_timeline()
+    workouts = Workout.objects.in_bulk([entry.workout_id for entry in timeline])
+    for entry in timeline:
+        get_events_workout(calendar,
+                           workouts[entry.workout_id],
+                           (entry.end - entry.start).days // 7,
+                           entry.start + offset)
 
     # Send the file to the user
     response = HttpResponse(content_type='text/calendar')
@@ -34,6 +34,7 @@ from django.views.generic import (
 
 from wger.manager.helpers import WorkoutCalendar
 from wger.manager.models import (
+    ExerciseStatistics,
     Workout,
     WorkoutSession,
     Day,
@@ -50,7 +51,10 @@ from wger.utils.generic_views import (
     WgerDeleteMixin
 )
 from wger.utils.helpers import check_access
-from wger.weight.helpers import process_log_entries, group_log_entries
+from wger.weight.helpers import (
+    group_log_entries,
+    process_log_entries_by_exercise
+)
 
 
 logger = logging.getLogger(__name__)
@@ -236,6 +240,26 @@ class WorkoutLogDetailView(DetailView, LoginRequiredMixin):
         context = super(WorkoutLogDetailView, self).get_context_data(**kwargs)
         is_owner = self.owner_user == self.request.user
 
+        # Filter the logs for user and exclude all units that are not weight
+        #
+        # TODO: add the repetition_unit to the filter. For some reason (bug
+        #       in django? DB problems?) when adding the filter there, the
+        #       execution time explodes. The weight unit filter works as
+        #       expected. Also, adding the unit IDs to the exclude list
+        #       also has the disadvantage that if new ones are added in a
+        #       local instance, they could "slip" through.
+        logs = WorkoutLog.objects.filter(user=self.owner_user,
+                                         weight_unit__in=(1, 2),
+                                         workout=self.object) \
+            .exclude(repetition_unit_id__in=(2, 3, 4, 5, 6, 7, 8))
+
+        # Process all the logs at once, an exercise can appear in several days
+        exercise_entries = process_log_entries_by_exercise(logs)
+        statistics = {}
+        for entry in ExerciseStatistics.objects.filter(user=self.owner_user) \
+                .select_related('weight_unit'):
+            statistics.setdefault(entry.exercise_id, []).append(entry)
+
         # Prepare the entries for rendering and the D3 chart
         workout_log = {}
 
@@ -243,32 +267,16 @@ class WorkoutLogDetailView(DetailView, LoginRequiredMixin):
             day_id = day_list['obj'].id
             workout_log[day_id] = {}
             for set_list in day_list['set_list']:
-                exercise_log = {}
                 for exercise_list in set_list['exercise_list']:
                     exercise_id = exercise_list['obj'].id
-                    exercise_log[exercise_id] = []
-
-                    # Filter the logs for user and exclude all units that are not weight
-                    #
-                    # TODO: add the repetition_unit to the filter. For some reason (bug
-                    #       in django? DB problems?) when adding the filter there, the
-                    #       execution time explodes. The weight unit filter works as
-                    #       expected. Also, adding the unit IDs to the exclude list
-                    #       also has the disadvantage that if new ones are added in a
-                    #       local instance, they could "slip" through.
-                    logs = exercise_list['obj'].workoutlog_set.filter(user=self.owner_user,
-                                                                      weight_unit__in=(1, 2),
-                                                                      workout=self.object) \
-                        .exclude(repetition_unit_id__in=(2, 3, 4, 5, 6, 7, 8))
-                    entry_log, chart_data = process_log_entries(logs)
-                    if entry_log:
-                        exercise_log[exercise_list['obj'].id].append(entry_log)
-
-                    if exercise_log:
-                        workout_log[day_id][exercise_id] = {}
-                        workout_log[day_id][exercise_id]['log_by_date'] = entry_log
-                        workout_log[day_id][exercise_id]['div_uuid'] = 'div-' + str(uuid.uuid4())
-                        workout_log[day_id][exercise_id]['chart_data'] = chart_data
+                    entry_log, chart_data = exercise_entries.get(exercise_id, ({}, '[]'))
+
+                    workout_log[day_id][exercise_id] = {}
+                    workout_log[day_id][exercise_id]['log_by_date'] = entry_log
+                    workout_log[day_id][exercise_id]['div_uuid'] = 'div-' + str(uuid.uuid4())
+                    workout_log[day_id][exercise_id]['chart_data'] = chart_data
+                    workout_log[day_id][exercise_id]['statistics'] = \
+                        statistics.get(exercise_id)
 
         context['workout_log'] = workout_log
         context['owner_user'] = self.owner_user
@@ -87,8 +87,6 @@ def view(request, pk):
     else:
         template_data['active_workout'] = False
 
-    schedule.get_current_scheduled_workout()
-
     template_data['uid'] = uid
     template_data['token'] = token
     template_data['is_owner'] = is_owner
@@ -15,9 +15,13 @@
 # You should have received a copy of the GNU Affero General Public License
 
 import logging
+import operator
 import uuid
 import datetime
+from functools import reduce
 
+from django.core.cache import cache
+from django.db.models import Max, Q
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponseRedirect, HttpResponseForbidden
 from django.template.context_processors import csrf
@@ -47,6 +51,7 @@ from wger.utils.generic_views import (
     WgerFormMixin,
     WgerDeleteMixin
 )
+from wger.utils.cache import cache_mapper
 from wger.utils.helpers import make_token
 
 
@@ -249,16 +254,71 @@ class WorkoutEditView(WgerFormMixin, LoginRequiredMixin, UpdateView):
         return context
 
 
-class LastWeightHelper:
+class LastWeightHelper(object):
     '''
     Small helper class to retrieve the last workout log for a certain
     user, exercise and repetition combination.
+
+    The weights are loaded for all the combinations at once and only kept for
+    the current request. They are also saved in the cache, which is reset
+    when the user saves or deletes a log.
     '''
-    user = None
-    last_weight_list = {}
 
-    def __init__(self, user):
+    def __init__(self, user, combinations=()):
+        '''
+        :param user: the user the logs belong to
+        :param combinations: the (exercise ID, repetitions) pairs to load
+        '''
         self.user = user
+        self.last_weight_list = {}
+        self.load(combinations)
+
+    def load(self, combinations):
+        '''
+        Loads the weights of the last logs for the given combinations
+
+        The combinations that are not in the cache are loaded with two queries,
+        one for the date of their last log and one for its weight. A single
+        query would need a correlated subquery, which Django 1.9 can only
+        express with raw SQL (Subquery and OuterRef were added in 1.11).
+
+        :param combinations: the (exercise ID, repetitions) pairs to load
+        '''
+        missing = set(combinations).difference(self.last_weight_list)
+        if not missing:
+            return
+
+        key = cache_mapper.get_workout_log_last_weights(self.user.pk)
+        last_weights = cache.get(key) or {}
+        query = missing.difference(last_weights)
+        if query:
+            # None means that there is no log
+            for combination in query:
+                last_weights[combination] = None
+
+            # Find the date of the last log of every requested combination,
+            # then the weight of the (newest) log of that date
+            logs = WorkoutLog.objects.filter(user=self.user).order_by()
+            last_dates = logs.filter(reduce(operator.or_,
+                                            [Q(exercise_id=exercise_id, reps=reps)
+                                             for exercise_id, reps in query])) \
+                .values_list('exercise_id', 'reps') \
+                .annotate(Max('date'))
+            if last_dates:
+                weights = logs.filter(reduce(operator.or_,
+                                             [Q(exercise_id=exercise_id, reps=reps, date=date)
+                                              for exercise_id, reps, date in last_dates])) \
+                    .order_by('pk') \
+                    .values_list('exercise_id', 'reps', 'weight')
+
+                # Several logs on the last date, the newest one wins
+                for exercise_id, reps, weight in weights:
+                    last_weights[(exercise_id, reps)] = weight
+
+            cache.set(key, last_weights)
+
+        self.last_weight_list.update((combination, last_weights[combination])
+                                     for combination in missing)
 
     def get_last_weight(self, exercise, reps, default_weight):
         '''
@@ -267,18 +327,17 @@ class LastWeightHelper:
         :param exercise:
         :param reps:
         :param default_weight:
-        :return: WorkoutLog or '' if none is found
+        :return: the weight of the last log or the default weight (or '' if
+                 there is none) if there are no logs
         '''
-        key = (self.user.pk, exercise.pk, reps, default_weight)
-        if self.last_weight_list.get(key) is None:
-            last_log = WorkoutLog.objects.filter(user=self.user,
-                                                 exercise=exercise,
-                                                 reps=reps).order_by('-date')
-            default_weight = '' if default_weight is None else default_weight
-            weight = last_log[0].weight if last_log.exists() else default_weight
-            self.last_weight_list[key] = weight
+        combination = (exercise.pk, reps)
+        if combination not in self.last_weight_list:
+            self.load([combination])
 
-        return self.last_weight_list.get(key)
+        weight = self.last_weight_list[combination]
+        if weight is None:
+            weight = '' if default_weight is None else default_weight
+        return weight
 
 
 @login_required
@@ -291,7 +350,11 @@ def timer(request, day_pk):
     canonical_day = day.canonical_representation
     context = {}
     step_list = []
-    last_log = LastWeightHelper(request.user)
+    last_log = LastWeightHelper(request.user,
+                                [(exercise_dict['obj'].pk, reps)
+                                 for set_dict in canonical_day['set_list']
+                                 for exercise_dict in set_dict['exercise_list']
+                                 for reps in exercise_dict['reps_list']])
 
     # Go through the workout day and create the individual 'pages'
     for set_dict in canonical_day['set_list']:
@@ -19,3 +19,4 @@
 from wger import get_version
 
 VERSION = get_version()
+default_app_config = 'wger.nutrition.apps.NutritionConfig'
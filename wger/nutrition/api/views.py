@@ -126,16 +126,14 @@ def search(request):
     json_response = {}
     if q:
         languages = load_ingredient_languages(request)
-        ingredients = Ingredient.objects.filter(name__icontains=q,
-                                                language__in=languages,
-                                                status__in=Ingredient.INGREDIENT_STATUS_OK)
+        ingredients = Ingredient.objects.search(q, languages)
 
-        for ingredient in ingredients:
+        for ingredient_id, name in ingredients:
             ingredient_json = {
-                'value': ingredient.name,
+                'value': name,
                 'data': {
-                    'id': ingredient.id,
-                    'name': ingredient.name,
+                    'id': ingredient_id,
+                    'name': name,
                 }
             }
             results.append(ingredient_json)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 *-*
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from wger.nutrition.models import ingredient_search_index
+
+
+class Command(BaseCommand):
+    '''
+    Builds the ingredient search index again
+    '''
+
+    help = 'Build the search index of the ingredients again in all processes. The ' \
+           'index is updated automatically when an ingredient is saved or deleted, ' \
+           'this is only needed when the ingredients were changed directly in the ' \
+           'database (e.g. by loading fixtures or with update()).'
+
+    def handle(self, **options):
+        '''
+        Process the options
+        '''
+
+        ingredient_search_index.reset()
+
+        start = time.time()
+        index = ingredient_search_index.get_index()
+        if int(options['verbosity']) >= 2:
+            self.stdout.write('* Indexed {0} ingredients in {1:.3f}s'
+                              .format(len(index), time.time() - start))
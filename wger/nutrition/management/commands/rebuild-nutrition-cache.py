@@ -0,0 +1,58 @@
+# -*- coding: utf-8 *-*
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wger.nutrition.models import NutritionPlan
+
+
+class Command(BaseCommand):
+    '''
+    Calculates again the cached nutritional values of all nutrition plans
+    '''
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    action='store',
+                    type='int',
+                    dest='batch_size',
+                    default=500,
+                    help='Number of plans processed at once (default: 500)'),
+    )
+
+    help = 'Calculate again the cached nutritional values of the nutrition plans. ' \
+           'This is only needed when the python code used to calculate them is ' \
+           'changed or the cache was filled from a different database.'
+
+    def handle(self, **options):
+        '''
+        Process the options
+        '''
+
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('The batch size must be a positive number')
+
+        plan_ids = list(NutritionPlan.objects.order_by('pk').values_list('pk', flat=True))
+        for start in range(0, len(plan_ids), batch_size):
+            batch = plan_ids[start:start + batch_size]
+            NutritionPlan.objects.rebuild_nutritional_values(batch)
+
+            if int(options['verbosity']) >= 2:
+                self.stdout.write('* Processed {0} of {1} plans'
+                                  .format(start + len(batch), len(plan_ids)))
@@ -35,9 +35,10 @@ from django.conf import settings
 
 from wger.core.models import Language
 from wger.utils.constants import TWOPLACES
-from wger.utils.cache import cache_mapper
+from wger.utils.cache import cache_mapper, reset_nutrition_plan_values
 from wger.utils.fields import Html5TimeField
 from wger.utils.models import AbstractLicenseModel
+from wger.utils.search import SearchIndex
 from wger.utils.units import AbstractWeight
 from wger.weight.models import WeightEntry
 
@@ -54,16 +55,133 @@ ENERGY_FACTOR = {'protein': {'kg': 4,
 Simple approximation of energy (kcal) provided per gram or ounce
 '''
 
+INGREDIENT_SEARCH_LIMIT = 50
+'''
+Maximum number of results returned by the ingredient search
+'''
+
+NUTRITIONAL_VALUES = ('energy',
+                      'protein',
+                      'carbohydrates',
+                      'carbohydrates_sugar',
+                      'fat',
+                      'fat_saturated',
+                      'fibres',
+                      'sodium')
+'''
+The nutritional values of an ingredient, in the order used when calculating them
+'''
+
 
 logger = logging.getLogger(__name__)
 
 
+class NutritionPlanManager(models.Manager):
+    '''
+    Custom manager for nutrition plans
+    '''
+
+    def get_nutritional_values(self, plan_ids, use_metric=True):
+        '''
+        Returns the nutritional values of the given plans
+
+        The values are read from the cache, the ones not found there are
+        calculated with only one query and saved in the cache for the next
+        time. The entries are reset when the meals, their items or the
+        ingredients are changed (see wger.nutrition.signals).
+
+        :param plan_ids: iterable with the IDs of the plans
+        :param use_metric: flag that controls the units used. Can also be a
+                           dictionary with the flag for each plan ID
+        :return: a dictionary with the plan IDs as keys and a dictionary with
+                 the values of the meals ('meals', with the meal IDs as keys)
+                 and the total values ('total') of the plan
+        '''
+        keys = {}
+        for plan_id in plan_ids:
+            plan_use_metric = use_metric[plan_id] if isinstance(use_metric, dict) else use_metric
+            unit = 'kg' if plan_use_metric else 'lb'
+            keys[cache_mapper.get_nutrition_plan_values(plan_id, unit)] = plan_id
+
+        cached = cache.get_many(keys.keys())
+        result = {keys[key]: values for key, values in cached.items()}
+
+        missing = [plan_id for plan_id in keys.values() if plan_id not in result]
+        if missing:
+            meal_values = Meal.objects.get_nutritional_values(
+                Meal.objects.filter(plan_id__in=missing),
+                use_metric)
+            for plan_id in missing:
+                result[plan_id] = {'meals': {}}
+            for meal_id, (plan_id, values) in meal_values.items():
+                result[plan_id]['meals'][meal_id] = values
+
+            for plan_id in missing:
+                result[plan_id]['total'] = self.calculate_totals(result[plan_id]['meals'])
+
+            cache.set_many({key: result[plan_id]
+                            for key, plan_id in keys.items()
+                            if plan_id in missing})
+
+        return result
+
+    def prefetch_nutritional_values(self, plans):
+        '''
+        Loads the nutritional values of all the given plans at once, in the
+        units used by each plan's owner.
+
+        The values are saved in the plans, where they are used instead of
+        loading them again. To avoid additional queries, the plans should
+        be loaded with select_related('user__userprofile').
+
+        :param plans: iterable with NutritionPlan objects
+        :return: list with the plans
+        '''
+        plans = list(plans)
+        use_metric = {plan.pk: plan.user.userprofile.use_metric for plan in plans}
+        plan_values = self.get_nutritional_values(use_metric.keys(), use_metric)
+        for plan in plans:
+            plan._nutritional_values = plan_values[plan.pk]
+        return plans
+
+    def rebuild_nutritional_values(self, plan_ids):
+        '''
+        Calculates again and caches the nutritional values of the given plans,
+        in all the weight units
+
+        :param plan_ids: list with the IDs of the plans
+        '''
+        reset_nutrition_plan_values(plan_ids)
+        for use_metric in (True, False):
+            self.get_nutritional_values(plan_ids, use_metric)
+
+    @staticmethod
+    def calculate_totals(meal_values):
+        '''
+        Sums the nutritional values of the meals of a plan
+
+        :param meal_values: dictionary with the values of each meal
+        '''
+        total = dict.fromkeys(NUTRITIONAL_VALUES, 0)
+        for values in meal_values.values():
+            for key in NUTRITIONAL_VALUES:
+                total[key] += values[key]
+
+        for key in total:
+            total[key] = Decimal(total[key]).quantize(TWOPLACES)
+
+        return total
+
+
 @python_2_unicode_compatible
 class NutritionPlan(models.Model):
     '''
     A nutrition plan
     '''
 
+    objects = NutritionPlanManager()
+    '''Custom manager'''
+
     # Metaclass to set some other properties
     class Meta:
 
@@ -105,20 +223,56 @@ class NutritionPlan(models.Model):
         '''
         return reverse('nutrition:plan:view', kwargs={'id': self.id})
 
-    def get_nutritional_values(self):
+    def get_cached_nutritional_values(self, use_metric=None):
+        '''
+        Returns the (cached) nutritional values of the meals and the totals of
+        the plan, in the units used by the owner
+
+        :param use_metric: the units of the owner, if they are already known
+        '''
+        try:
+            return self._nutritional_values
+        except AttributeError:
+            if use_metric is None:
+                use_metric = self.user.userprofile.use_metric
+            return NutritionPlan.objects.get_nutritional_values([self.pk], use_metric)[self.pk]
+
+    def get_meal_nutritional_values(self):
+        '''
+        Returns the nutritional values of the meals in the plan, in the units
+        used by the owner, as a dictionary with the meal IDs as keys.
+
+        Meals without items are not included.
+        '''
+        return self.get_cached_nutritional_values()['meals']
+
+    def get_nutritional_totals(self, use_metric=None):
         '''
         Sums the nutritional info of all items in the plan
+
+        :param use_metric: the units of the owner, if they are already known
+        '''
+        return dict(self.get_cached_nutritional_values(use_metric)['total'])
+
+    def get_nutritional_values(self):
+        '''
+        Sums the nutritional info of all items in the plan, with the
+        distribution of the energy and the values per body weight
+        '''
+        return self.calculate_nutritional_values(self.get_closest_weight_entry())
+
+    def calculate_nutritional_values(self, weight_entry, use_metric=None):
         '''
-        use_metric = self.user.userprofile.use_metric
+        Sums the nutritional info of all items in the plan, see get_nutritional_values
+
+        :param weight_entry: the weight entry used for the values per body
+                             weight, None if there is none
+        :param use_metric: the units of the owner, if they are already known
+        '''
+        if use_metric is None:
+            use_metric = self.user.userprofile.use_metric
         unit = 'kg' if use_metric else 'lb'
-        result = {'total': {'energy': 0,
-                            'protein': 0,
-                            'carbohydrates': 0,
-                            'carbohydrates_sugar': 0,
-                            'fat': 0,
-                            'fat_saturated': 0,
-                            'fibres': 0,
-                            'sodium': 0},
+        result = {'total': self.get_nutritional_totals(use_metric),
                   'percent': {'protein': 0,
                               'carbohydrates': 0,
                               'fat': 0},
@@ -127,12 +281,6 @@ class NutritionPlan(models.Model):
                              'fat': 0},
                   }
 
-        # Energy
-        for meal in self.meal_set.select_related():
-            values = meal.get_nutritional_values(use_metric=use_metric)
-            for key in result['total'].keys():
-                result['total'][key] += values[key]
-
         energy = result['total']['energy']
 
         # In percent
@@ -142,7 +290,6 @@ class NutritionPlan(models.Model):
                     result['total'][key] * ENERGY_FACTOR[key][unit] / energy * 100
 
         # Per body weight
-        weight_entry = self.get_closest_weight_entry()
         if weight_entry:
             for key in result['per_kg'].keys():
                 result['per_kg'][key] = result['total'][key] / weight_entry.weight
@@ -160,9 +307,9 @@ class NutritionPlan(models.Model):
         Returns None if there are no entries.
         '''
         target = self.creation_date
-        closest_entry_gte = WeightEntry.objects.filter(user=self.user) \
+        closest_entry_gte = WeightEntry.objects.filter(user_id=self.user_id) \
             .filter(date__gte=target).order_by('date').first()
-        closest_entry_lte = WeightEntry.objects.filter(user=self.user) \
+        closest_entry_lte = WeightEntry.objects.filter(user_id=self.user_id) \
             .filter(date__lte=target).order_by('-date').first()
         if closest_entry_gte is None or closest_entry_lte is None:
             return closest_entry_gte or closest_entry_lte
@@ -184,7 +331,7 @@ class NutritionPlan(models.Model):
         '''
 
         goal_calories = self.user.userprofile.calories
-        actual_calories = self.get_nutritional_values()['total']['energy']
+        actual_calories = self.get_nutritional_totals()['energy']
 
         # Within 3%
         if (actual_calories < goal_calories * 1.03) and (actual_calories > goal_calories * 0.97):
@@ -200,6 +347,50 @@ class NutritionPlan(models.Model):
             return 4
 
 
+def load_ingredient_search_entries(keys=None):
+    '''
+    Returns the entries for the ingredient search index: the accepted
+    ingredients, grouped by language
+
+    :param keys: optional list with the IDs of the ingredients to load
+    '''
+    ingredients = Ingredient.objects.filter(status__in=Ingredient.INGREDIENT_STATUS_OK)
+    if keys is not None:
+        ingredients = ingredients.filter(pk__in=keys)
+    for pk, name, language_id in ingredients.values_list('pk', 'name', 'language_id'):
+        yield pk, name, language_id, (pk, name)
+
+
+ingredient_search_index = SearchIndex('ingredient', load_ingredient_search_entries)
+'''
+Search index with the names of the ingredients
+'''
+
+
+class IngredientManager(models.Manager):
+    '''
+    Custom manager for ingredients
+    '''
+
+    def search(self, term, languages, limit=INGREDIENT_SEARCH_LIMIT):
+        '''
+        Searches for accepted ingredients whose name contains the search term
+
+        The results are ordered by their rank (see wger.utils.search) and name.
+        The index is updated when an ingredient is saved or deleted, changes done
+        directly in the database (e.g. with update()) need a manual reset with
+        the rebuild-ingredient-index command.
+
+        :param term: the search term
+        :param languages: the languages (or their IDs) of the ingredients
+        :param limit: maximum number of results
+        :return: a list of (id, name) tuples
+        '''
+        return ingredient_search_index.search(term,
+                                              [cache_mapper.get_pk(i) for i in languages],
+                                              limit)
+
+
 @python_2_unicode_compatible
 class Ingredient(AbstractLicenseModel, models.Model):
     '''
@@ -212,6 +403,9 @@ class Ingredient(AbstractLicenseModel, models.Model):
     energy amount given (in percent).
     '''
 
+    objects = IngredientManager()
+    '''Custom manager'''
+
     INGREDIENT_STATUS_PENDING = '1'
     INGREDIENT_STATUS_ACCEPTED = '2'
     INGREDIENT_STATUS_DECLINED = '3'
@@ -508,12 +702,67 @@ class IngredientWeightUnit(models.Model):
                                        self.gram)
 
 
+class MealManager(models.Manager):
+    '''
+    Custom manager for meals
+    '''
+
+    def get_nutritional_values(self, meals, use_metric=True):
+        '''
+        Calculates the nutritional values of the given meals with only one query
+
+        The values of the items are calculated and rounded exactly as in
+        MealItem.get_nutritional_values and then added up for each meal.
+
+        :param meals: queryset or list of the meals (or their IDs)
+        :param use_metric: flag that controls the units used. Can also be a
+                           dictionary with the flag for each plan ID
+        :return: a dictionary with the meal IDs as keys and a (plan ID, values)
+                 tuple as value. Meals without items are not included.
+        '''
+        result = {}
+        items = MealItem.objects.filter(meal__in=meals).values_list(
+            'meal_id',
+            'meal__plan_id',
+            'amount',
+            'weight_unit__amount',
+            'weight_unit__gram',
+            *['ingredient__{0}'.format(key) for key in NUTRITIONAL_VALUES])
+
+        for item in items:
+            meal_id, plan_id, amount, unit_amount, unit_gram = item[:5]
+            item_use_metric = use_metric[plan_id] if isinstance(use_metric, dict) else use_metric
+
+            if unit_gram is None:
+                item_weight = amount
+            else:
+                item_weight = amount * unit_amount * unit_gram
+
+            values = MealItem.calculate_nutritional_values(dict(zip(NUTRITIONAL_VALUES, item[5:])),
+                                                           item_weight,
+                                                           item_use_metric)
+            if meal_id not in result:
+                result[meal_id] = (plan_id, dict.fromkeys(NUTRITIONAL_VALUES, 0))
+            for key in NUTRITIONAL_VALUES:
+                result[meal_id][1][key] += values[key]
+
+        # Only 2 decimal places, anything else doesn't make sense
+        for plan_id, values in result.values():
+            for key in values:
+                values[key] = Decimal(values[key]).quantize(TWOPLACES)
+
+        return result
+
+
 @python_2_unicode_compatible
 class Meal(models.Model):
     '''
     A meal
     '''
 
+    objects = MealManager()
+    '''Custom manager'''
+
     # Metaclass to set some other properties
     class Meta:
         ordering = ["time", ]
@@ -546,27 +795,11 @@ class Meal(models.Model):
 
         :param use_metric Flag that controls the units used
         '''
-        nutritional_info = {'energy': 0,
-                            'protein': 0,
-                            'carbohydrates': 0,
-                            'carbohydrates_sugar': 0,
-                            'fat': 0,
-                            'fat_saturated': 0,
-                            'fibres': 0,
-                            'sodium': 0}
-
-        # Get the calculated values from the meal item and add them
-        for item in self.mealitem_set.select_related():
+        plan_values = NutritionPlan.objects.get_nutritional_values([self.plan_id], use_metric)
+        if self.pk in plan_values[self.plan_id]['meals']:
+            return dict(plan_values[self.plan_id]['meals'][self.pk])
 
-            values = item.get_nutritional_values(use_metric=use_metric)
-            for key in nutritional_info.keys():
-                nutritional_info[key] += values[key]
-
-        # Only 2 decimal places, anything else doesn't make sense
-        for i in nutritional_info:
-            nutritional_info[i] = Decimal(nutritional_info[i]).quantize(TWOPLACES)
-
-        return nutritional_info
+        return {key: Decimal(0).quantize(TWOPLACES) for key in NUTRITIONAL_VALUES}
 
 
 @python_2_unicode_compatible
@@ -624,14 +857,6 @@ class MealItem(models.Model):
 
         :param use_metric Flag that controls the units used
         '''
-        nutritional_info = {'energy': 0,
-                            'protein': 0,
-                            'carbohydrates': 0,
-                            'carbohydrates_sugar': 0,
-                            'fat': 0,
-                            'fat_saturated': 0,
-                            'fibres': 0,
-                            'sodium': 0}
         # Calculate the base weight of the item
         if self.get_unit_type() == MEALITEM_WEIGHT_GRAM:
             item_weight = self.amount
@@ -640,24 +865,38 @@ class MealItem(models.Model):
                            self.weight_unit.amount *
                            self.weight_unit.gram)
 
-        nutritional_info['energy'] += self.ingredient.energy * item_weight / 100
-        nutritional_info['protein'] += self.ingredient.protein * item_weight / 100
-        nutritional_info['carbohydrates'] += self.ingredient.carbohydrates * item_weight / 100
+        ingredient = {key: getattr(self.ingredient, key) for key in NUTRITIONAL_VALUES}
+        return MealItem.calculate_nutritional_values(ingredient, item_weight, use_metric)
+
+    @staticmethod
+    def calculate_nutritional_values(ingredient, item_weight, use_metric=True):
+        '''
+        Calculates the nutrional info for an amount of an ingredient
+
+        :param ingredient dictionary with the values of the ingredient (per 100g)
+        :param item_weight the weight of the item, in grams
+        :param use_metric Flag that controls the units used
+        '''
+        nutritional_info = dict.fromkeys(NUTRITIONAL_VALUES, 0)
+
+        nutritional_info['energy'] += ingredient['energy'] * item_weight / 100
+        nutritional_info['protein'] += ingredient['protein'] * item_weight / 100
+        nutritional_info['carbohydrates'] += ingredient['carbohydrates'] * item_weight / 100
 
-        if self.ingredient.carbohydrates_sugar:
-            nutritional_info['carbohydrates_sugar'] += self.ingredient.carbohydrates_sugar \
+        if ingredient['carbohydrates_sugar']:
+            nutritional_info['carbohydrates_sugar'] += ingredient['carbohydrates_sugar'] \
                 * item_weight / 100
 
-        nutritional_info['fat'] += self.ingredient.fat * item_weight / 100
+        nutritional_info['fat'] += ingredient['fat'] * item_weight / 100
 
-        if self.ingredient.fat_saturated:
-            nutritional_info['fat_saturated'] += self.ingredient.fat_saturated * item_weight / 100
+        if ingredient['fat_saturated']:
+            nutritional_info['fat_saturated'] += ingredient['fat_saturated'] * item_weight / 100
 
-        if self.ingredient.fibres:
-            nutritional_info['fibres'] += self.ingredient.fibres * item_weight / 100
+        if ingredient['fibres']:
+            nutritional_info['fibres'] += ingredient['fibres'] * item_weight / 100
 
-        if self.ingredient.sodium:
-            nutritional_info['sodium'] += self.ingredient.sodium * item_weight / 100
+        if ingredient['sodium']:
+            nutritional_info['sodium'] += ingredient['sodium'] * item_weight / 100
 
         # If necessary, convert weight units
         if not use_metric:
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+
+from django.db.models.signals import post_save, post_delete
+
+from wger.nutrition.models import (
+    Ingredient,
+    IngredientWeightUnit,
+    Meal,
+    MealItem,
+    NutritionPlan,
+    ingredient_search_index
+)
+from wger.utils.cache import reset_dashboard_summary, reset_nutrition_plan_values
+from wger.utils.helpers import disable_for_bulk_delete
+
+
+@disable_for_bulk_delete
+def reset_plan_values_meal(sender, instance, **kwargs):
+    '''
+    Resets the cached nutritional values of the plan of a meal
+    '''
+    reset_nutrition_plan_values([instance.plan_id])
+
+
+@disable_for_bulk_delete
+def reset_plan_values_meal_item(sender, instance, **kwargs):
+    '''
+    Resets the cached nutritional values of the plan of a meal item
+    '''
+    plan_id = Meal.objects.filter(pk=instance.meal_id).values_list('plan_id', flat=True).first()
+    if plan_id:
+        reset_nutrition_plan_values([plan_id])
+
+
+def reset_plan_values_ingredient(sender, instance, **kwargs):
+    '''
+    Resets the cached nutritional values of all plans using an ingredient
+    '''
+    if kwargs.get('raw'):
+        return
+
+    if sender == Ingredient:
+        items = MealItem.objects.filter(ingredient_id=instance.pk)
+    else:
+        items = MealItem.objects.filter(weight_unit_id=instance.pk)
+    reset_nutrition_plan_values(items.values_list('meal__plan_id', flat=True))
+
+
+def update_ingredient_search_index(sender, instance, **kwargs):
+    '''
+    Updates the entry of the ingredient in the search index
+    '''
+    ingredient_search_index.update([instance.pk])
+
+
+@disable_for_bulk_delete
+def reset_dashboard(sender, instance, **kwargs):
+    '''
+    Resets the dashboard of the owner of a changed nutrition plan
+    '''
+    reset_dashboard_summary(instance.user_id)
+
+
+post_save.connect(reset_plan_values_meal, sender=Meal)
+post_delete.connect(reset_plan_values_meal, sender=Meal)
+post_save.connect(reset_plan_values_meal_item, sender=MealItem)
+post_delete.connect(reset_plan_values_meal_item, sender=MealItem)
+post_save.connect(reset_plan_values_ingredient, sender=Ingredient)
+post_save.connect(reset_plan_values_ingredient, sender=IngredientWeightUnit)
+post_save.connect(update_ingredient_search_index, sender=Ingredient)
+post_delete.connect(update_ingredient_search_index, sender=Ingredient)
+post_save.connect(reset_dashboard, sender=NutritionPlan)
+post_delete.connect(reset_dashboard, sender=NutritionPlan)
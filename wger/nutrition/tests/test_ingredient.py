@@ -18,6 +18,8 @@ import json
 from decimal import Decimal
 
 from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
 
 from wger.core.models import Language
@@ -29,6 +31,8 @@ from wger.core.tests.base_testcase import (
     WorkoutManagerAddTestCase
 )
 from wger.nutrition.models import Ingredient
+from wger.nutrition.models import INGREDIENT_SEARCH_LIMIT
+from wger.utils.cache import cache_mapper
 from wger.nutrition.models import Meal
 from wger.utils.constants import NUTRITION_TAB
 
@@ -212,6 +216,101 @@ class IngredientSearchTestCase(WorkoutManagerTestCase):
         self.search_ingredient()
 
 
+class IngredientSearchIndexTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the ingredient search index
+    '''
+
+    def search(self, term, limit=INGREDIENT_SEARCH_LIMIT):
+        '''
+        Helper function that returns the names of the found ingredients
+        '''
+        return [name for pk, name in Ingredient.objects.search(term, [2], limit)]
+
+    def test_search(self):
+        '''
+        Test that the search works like a case insensitive substring search
+        '''
+        self.assertEqual(self.search('SLURM'), ['Slurm'])
+        self.assertEqual(self.search('gredient 1'), ['Test ingredient 1'])
+        self.assertEqual(self.search('ingredient, t'), ['Ingredient, test, 2, organic, raw'])
+        self.assertEqual(self.search('not there'), [])
+        self.assertEqual(self.search('ingredient 2'), [])
+
+        # Terms shorter than the trigrams
+        self.assertEqual(self.search('ur'), ['Bachelor chow, now with flavour!', 'Slurm'])
+
+        # Pending ingredients and other languages are not found
+        self.assertEqual(self.search('pending'), [])
+        self.assertEqual(Ingredient.objects.search('slurm', [1]), [])
+
+    def test_ranking(self):
+        '''
+        Test the order of the results
+        '''
+        ingredient = Ingredient.objects.get(pk=3)
+        ingredient.name = 'Nutritioningredient'
+        ingredient.save()
+        ingredient = Ingredient.objects.get(pk=4)
+        ingredient.name = 'Ingredient'
+        ingredient.save()
+
+        self.assertEqual(self.search('ingredient'), ['Ingredient',
+                                                     'Another tasty ingredient',
+                                                     'Ingredient, test, 2, organic, raw',
+                                                     'Raw ingredient',
+                                                     'Test ingredient 1',
+                                                     'Nutritioningredient'])
+        self.assertEqual(self.search('ingredient', limit=2), ['Ingredient',
+                                                              'Another tasty ingredient'])
+
+    def test_index_update(self):
+        '''
+        Test that the index is updated when saving and deleting ingredients
+        '''
+        self.assertEqual(self.search('slurm'), ['Slurm'])
+
+        ingredient = Ingredient.objects.get(pk=4)
+        ingredient.name = 'Soylent green'
+        ingredient.save()
+        self.assertEqual(self.search('slurm'), [])
+        self.assertEqual(self.search('green'), ['Soylent green'])
+
+        ingredient.delete()
+        self.assertEqual(self.search('green'), [])
+
+    def test_index_version(self):
+        '''
+        Test that the index is built again when its version changes, e.g.
+        after a reset in another process
+        '''
+        self.assertEqual(self.search('slurm'), ['Slurm'])
+        Ingredient.objects.filter(pk=4).update(name='Soylent green')
+        self.assertEqual(self.search('slurm'), ['Slurm'])
+
+        cache.incr(cache_mapper.get_search_index_version('ingredient'))
+        self.assertEqual(self.search('slurm'), [])
+        self.assertEqual(self.search('green'), ['Soylent green'])
+
+    def test_rebuild_command(self):
+        '''
+        Test the management command that builds the index again
+        '''
+        self.assertEqual(self.search('slurm'), ['Slurm'])
+        Ingredient.objects.filter(pk=4).update(name='Soylent green')
+
+        call_command('rebuild-ingredient-index')
+        self.assertEqual(self.search('green'), ['Soylent green'])
+
+    def test_number_queries(self):
+        '''
+        Test that searching does not need any queries once the index is built
+        '''
+        self.search('ingredient')
+        with self.assertNumQueries(0):
+            self.search('ingredient')
+
+
 class IngredientValuesTestCase(WorkoutManagerTestCase):
     '''
     Tests the nutritional value calculator for an ingredient
@@ -16,6 +16,8 @@
 import logging
 from decimal import Decimal
 
+from django.contrib.auth.models import User
+
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 from wger.nutrition import models
 from wger.utils.constants import TWOPLACES
@@ -142,3 +144,60 @@ class NutritionalValuesCalculationsTestCase(WorkoutManagerTestCase):
         self.assertEqual(values['per_kg']['carbohydrates'], Decimal(4.96).quantize(TWOPLACES))
         self.assertEqual(values['per_kg']['fat'], Decimal(1.51).quantize(TWOPLACES))
         self.assertEqual(values['per_kg']['protein'], Decimal(4.33).quantize(TWOPLACES))
+
+
+class NutritionalValuesBulkTestCase(WorkoutManagerTestCase):
+    '''
+    Tests calculating the nutritional values of several plans at once
+    '''
+
+    def get_reference_values(self, plan, use_metric):
+        '''
+        Helper that adds the values of the individual meal items
+        '''
+        total = dict.fromkeys(models.NUTRITIONAL_VALUES, 0)
+        for meal in plan.meal_set.all():
+            for item in meal.mealitem_set.all():
+                values = item.get_nutritional_values(use_metric=use_metric)
+                for key in total:
+                    total[key] += values[key]
+        return {key: Decimal(value).quantize(TWOPLACES) for key, value in total.items()}
+
+    def test_plan_values(self):
+        '''
+        Test that the values are the same as the ones of the individual items
+        '''
+        for weight_unit in ('kg', 'lb'):
+            for user in User.objects.filter(pk__in=(1, 2)):
+                user.userprofile.weight_unit = weight_unit
+                user.userprofile.save()
+
+            plans = models.NutritionPlan.objects.select_related('user__userprofile')
+            for plan in models.NutritionPlan.objects.prefetch_nutritional_values(plans):
+                reference = self.get_reference_values(plan, weight_unit == 'kg')
+                self.assertEqual(plan.get_nutritional_totals(), reference)
+                self.assertEqual(plan.get_nutritional_values()['total'], reference)
+
+    def test_meal_values(self):
+        '''
+        Test the values of the meals
+        '''
+        meal_values = models.Meal.objects.get_nutritional_values(models.Meal.objects.all(),
+                                                                 use_metric=False)
+        for meal in models.Meal.objects.all():
+            if not meal.mealitem_set.exists():
+                self.assertNotIn(meal.pk, meal_values)
+                continue
+
+            self.assertEqual(meal_values[meal.pk][0], meal.plan_id)
+            self.assertEqual(meal_values[meal.pk][1], meal.get_nutritional_values(use_metric=False))
+
+    def test_number_queries(self):
+        '''
+        Test that the number of queries does not depend on the number of plans
+        '''
+        plans = models.NutritionPlan.objects.filter(user=1).select_related('user__userprofile')
+        with self.assertNumQueries(2):
+            for plan in models.NutritionPlan.objects.prefetch_nutritional_values(plans):
+                plan.get_nutritional_totals()
+                plan.get_calories_approximation()
@@ -0,0 +1,162 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.cache import cache
+from django.core.management import call_command
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.nutrition.models import (
+    Ingredient,
+    IngredientWeightUnit,
+    Meal,
+    MealItem,
+    NutritionPlan
+)
+from wger.utils.cache import cache_mapper
+
+
+class NutritionalValuesCacheTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the cache of the nutritional values of the plans
+    '''
+
+    def get_cached_values(self, plan_id=1):
+        '''
+        Helper that returns the cached values of a plan, in metric units
+        '''
+        return cache.get(cache_mapper.get_nutrition_plan_values(plan_id, 'kg'))
+
+    def fill_cache(self, plan_id=1):
+        '''
+        Helper that calculates the values of a plan and checks they are cached
+        '''
+        NutritionPlan.objects.get(pk=plan_id).get_nutritional_values()
+        self.assertTrue(self.get_cached_values(plan_id))
+
+    def test_cache(self):
+        '''
+        Test that the values are read from the cache
+        '''
+        plan = NutritionPlan.objects.select_related('user__userprofile').get(pk=1)
+        values = plan.get_nutritional_totals()
+        self.assertEqual(self.get_cached_values()['total'], values)
+        self.assertFalse(cache.get(cache_mapper.get_nutrition_plan_values(1, 'lb')))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(plan.get_nutritional_totals(), values)
+            self.assertEqual(plan.get_meal_nutritional_values(),
+                             self.get_cached_values()['meals'])
+
+    def test_cache_meal(self):
+        '''
+        Test that the values of the meals are read from the cache of their plan
+        '''
+        meal = Meal.objects.get(pk=1)
+        values = meal.get_nutritional_values()
+        self.assertEqual(self.get_cached_values(meal.plan_id)['meals'][meal.pk], values)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(meal.get_nutritional_values(), values)
+
+    def test_reset_meal_item_save(self):
+        '''
+        Test that the cache is reset when saving a meal item
+        '''
+        self.fill_cache()
+        item = MealItem.objects.filter(meal__plan=1).first()
+        item.amount += 10
+        item.save()
+        self.assertFalse(self.get_cached_values())
+
+    def test_reset_meal_item_delete(self):
+        '''
+        Test that the cache is reset when deleting a meal item
+        '''
+        self.fill_cache()
+        MealItem.objects.filter(meal__plan=1).first().delete()
+        self.assertFalse(self.get_cached_values())
+
+    def test_reset_meal(self):
+        '''
+        Test that the cache is reset when saving and deleting a meal
+        '''
+        self.fill_cache()
+        meal = Meal.objects.filter(plan=1).first()
+        meal.save()
+        self.assertFalse(self.get_cached_values())
+
+        self.fill_cache()
+        meal.delete()
+        self.assertFalse(self.get_cached_values())
+
+    def test_reset_ingredient(self):
+        '''
+        Test that the cache is reset when saving an ingredient used in the plan
+        '''
+        self.fill_cache()
+        ingredient = Ingredient.objects.filter(mealitem__meal__plan=1).first()
+        ingredient.save()
+        self.assertFalse(self.get_cached_values())
+
+    def test_reset_weight_unit(self):
+        '''
+        Test that the cache is reset when saving a weight unit used in the plan
+        '''
+        unit = IngredientWeightUnit.objects.first()
+        item = MealItem.objects.filter(meal__plan=1).first()
+        item.ingredient = unit.ingredient
+        item.weight_unit = unit
+        item.save()
+
+        self.fill_cache()
+        unit.save()
+        self.assertFalse(self.get_cached_values())
+
+    def test_values_updated(self):
+        '''
+        Test that the values are calculated again after a change
+        '''
+        plan = NutritionPlan.objects.get(pk=1)
+        energy = plan.get_nutritional_totals()['energy']
+
+        item = MealItem.objects.filter(meal__plan=1, weight_unit__isnull=True).first()
+        item_energy = item.get_nutritional_values()['energy']
+        item.amount *= 2
+        item.save()
+
+        plan = NutritionPlan.objects.get(pk=1)
+        self.assertEqual(plan.get_nutritional_totals()['energy'], energy + item_energy)
+
+
+class RebuildNutritionalValuesCacheTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the management command that rebuilds the cache
+    '''
+
+    def test_command(self):
+        '''
+        Test that the values of all plans are cached in all units
+        '''
+        call_command('rebuild-nutrition-cache', batch_size=2)
+
+        for plan in NutritionPlan.objects.all():
+            for unit in ('kg', 'lb'):
+                values = cache.get(cache_mapper.get_nutrition_plan_values(plan, unit))
+                self.assertEqual(values['total'],
+                                 NutritionPlan.objects.calculate_totals(values['meals']))
+
+        plan = NutritionPlan.objects.get(pk=1)
+        with self.assertNumQueries(2):
+            plan.get_nutritional_totals()
@@ -64,8 +64,8 @@ def overview(request):
     template_data = {}
     template_data.update(csrf(request))
 
-    plans = NutritionPlan.objects.filter(user=request.user)
-    template_data['plans'] = plans
+    plans = NutritionPlan.objects.filter(user=request.user).select_related('user__userprofile')
+    template_data['plans'] = NutritionPlan.objects.prefetch_nutritional_values(plans)
 
     return render(request, 'plan/overview.html', template_data)
 
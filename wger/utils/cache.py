@@ -12,8 +12,12 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import atexit
+import collections
 import logging
 import hashlib
+import threading
+import time
 
 from django.core.cache import cache
 from django.utils.encoding import force_bytes
@@ -21,6 +25,12 @@ from django.utils.encoding import force_bytes
 
 logger = logging.getLogger(__name__)
 
+WORKOUT_CANONICAL_STATS_FLUSH_INTERVAL = 60
+'''
+Seconds the counters of the workout canonical form cache are kept in the
+process before they are added to the shared ones in the cache
+'''
+
 
 def get_template_cache_name(fragment_name='', *args):
     '''
@@ -39,20 +49,193 @@ def delete_template_fragment_cache(fragment_name='', *args):
     cache.delete(get_template_cache_name(fragment_name, *args))
 
 
-def reset_workout_canonical_form(workout_id):
+def get_workout_canonical_version(workout_id):
+    '''
+    Returns the current version of the cached canonical form of a workout
+
+    The version is part of the keys of the cached days. If the counter is not
+    in the cache (yet), it is initialised with the current time so that it never
+    goes back to a value used by older day entries.
+    '''
+    key = cache_mapper.get_workout_canonical_version(workout_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def reset_workout_canonical_form(workout_id, day_id=None):
+    '''
+    Resets the cached canonical form of a workout
+
+    If a day is passed, only the entry for this day is removed and the rest
+    are reused when the workout is composed again. Otherwise the version of the
+    workout is increased, which makes all the cached days unreachable.
+    '''
     cache.delete(cache_mapper.get_workout_canonical(workout_id))
 
+    if day_id:
+        version = get_workout_canonical_version(workout_id)
+        cache.delete(cache_mapper.get_day_canonical(workout_id, version, day_id))
+    else:
+        try:
+            cache.incr(cache_mapper.get_workout_canonical_version(workout_id))
+        except ValueError:
+            # No version yet, a new one will be created when needed
+            pass
+
+
+def increment_counter(key, delta=1, timeout=None):
+    '''
+    Increments a counter saved in the cache, creating it if necessary
+
+    :param key: the cache key of the counter
+    :param delta: amount to add to the counter
+    :param timeout: timeout used when the counter is created
+    :return: the new value of the counter
+    '''
+    if cache.add(key, delta, timeout):
+        return delta
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout)
+        return delta
+
+
+def increment_workout_canonical_stat(name, delta=1):
+    '''
+    Increments one of the counters of the workout canonical form cache
+
+    The counter is only increased in this process, so that counting e.g. a
+    cache hit does not write to the cache. See flush_workout_canonical_stats.
+
+    :param name: one of CacheKeyMapper.WORKOUT_CANONICAL_STATS
+    :param delta: amount to add to the counter
+    '''
+    local_workout_canonical_stats.increment(name, delta)
+
+
+def flush_workout_canonical_stats(force=False):
+    '''
+    Adds the counters of the workout canonical form cache of this process to
+    the shared ones in the cache
+
+    Unless forced, this is only done once per WORKOUT_CANONICAL_STATS_FLUSH_INTERVAL
+    seconds, so it is cheap to call where the cache is written anyway.
+    '''
+    local_workout_canonical_stats.flush(force)
+
+
+def get_workout_canonical_stats():
+    '''
+    Returns a dictionary with the counters of the workout canonical form cache
+    '''
+    flush_workout_canonical_stats(force=True)
+    return {name: cache.get(cache_mapper.get_workout_canonical_stat(name), 0)
+            for name in cache_mapper.WORKOUT_CANONICAL_STATS}
+
+
+def reset_nutrition_plan_values(plan_ids):
+    '''
+    Resets the cached nutritional values of the given nutrition plans, in all
+    the weight units
+    '''
+    cache.delete_many([cache_mapper.get_nutrition_plan_values(plan_id, unit)
+                       for plan_id in set(plan_ids)
+                       for unit in cache_mapper.NUTRITION_PLAN_VALUES_UNITS])
+
 
 def reset_workout_log(user_pk, year, month, day=None):
     '''
     Resets the cached workout logs
+
+    The logs are cached per month, the day is only accepted for compatibility
+    '''
+    cache.delete(cache_mapper.get_workout_log_list(user_pk, year, month))
+
+
+def reset_dashboard_summary(user_pk):
+    '''
+    Resets the cached summary of the dashboard of a user
+    '''
+    cache.delete(cache_mapper.get_dashboard_summary(user_pk))
+
+
+def reset_schedule_timeline(schedule_pk):
+    '''
+    Resets the cached timeline of a schedule
+    '''
+    cache.delete(cache_mapper.get_schedule_timeline(schedule_pk))
+
+
+def reset_workout_log_last_weights(user_pk):
+    '''
+    Resets the cached weights of the last workout logs of a user
+    '''
+    cache.delete(cache_mapper.get_workout_log_last_weights(user_pk))
+
+
+def increment_guest_pool_stat(name, delta=1):
+    '''
+    Increments one of the counters of the guest account pool
+
+    :param name: one of CacheKeyMapper.GUEST_POOL_STATS
+    :param delta: amount to add to the counter
+    '''
+    increment_counter(cache_mapper.get_guest_pool_stat(name), delta)
+
+
+def get_guest_pool_stats():
+    '''
+    Returns a dictionary with the counters of the guest account pool
+    '''
+    return {name: cache.get(cache_mapper.get_guest_pool_stat(name), 0)
+            for name in cache_mapper.GUEST_POOL_STATS}
+
+
+class LocalCounters(object):
+    '''
+    Process-local counters that are added to shared counters in the cache from
+    time to time, instead of writing to the cache on every increment
     '''
 
-    log_hash = hash((user_pk, year, month))
-    cache.delete(cache_mapper.get_workout_log_list(log_hash))
+    def __init__(self, get_key, interval):
+        self.get_key = get_key
+        self.interval = interval
+        self.counters = collections.Counter()
+        self.flushed = 0
+        self.lock = threading.Lock()
 
-    log_hash = hash((user_pk, year, month, day))
-    cache.delete(cache_mapper.get_workout_log_list(log_hash))
+    def increment(self, name, delta=1):
+        '''
+        Increments a counter of this process
+        '''
+        with self.lock:
+            self.counters[name] += delta
+
+    def flush(self, force=False):
+        '''
+        Adds the counters to the ones in the cache and resets them, if the
+        interval since the last flush is over or if forced
+        '''
+        with self.lock:
+            if not force and time.time() - self.flushed < self.interval:
+                return
+            counters = self.counters
+            self.counters = collections.Counter()
+            self.flushed = time.time()
+
+        for name, delta in counters.items():
+            increment_counter(self.get_key(name), delta)
+
+    def clear(self):
+        '''
+        Resets the counters of this process without saving them
+        '''
+        with self.lock:
+            self.counters.clear()
 
 
 class CacheKeyMapper(object):
@@ -65,8 +248,36 @@ class CacheKeyMapper(object):
     LANGUAGE_CONFIG_CACHE_KEY = 'language-config-{0}-{1}'
     EXERCISE_CACHE_KEY_MUSCLE_BG = 'exercise-muscle-bg-{0}'
     INGREDIENT_CACHE_KEY = 'ingredient-{0}'
-    WORKOUT_CANONICAL_REPRESENTATION = 'workout-canonical-representation-{0}'
-    WORKOUT_LOG_LIST = 'workout-log-hash-{0}'
+    # The canonical forms include the version of their format (see
+    # wger.utils.canonical), so that old entries are not read after it changes
+    WORKOUT_CANONICAL_REPRESENTATION = 'workout-canonical-representation-2-{0}'
+    WORKOUT_CANONICAL_VERSION = 'workout-canonical-version-{0}'
+    WORKOUT_CANONICAL_STAT = 'workout-canonical-stat-{0}'
+    DAY_CANONICAL_REPRESENTATION = 'day-canonical-representation-2-{0}-{1}-{2}'
+    WORKOUT_LOG_LIST = 'workout-log-list-{0}-{1}-{2}'
+    SCHEDULE_TIMELINE = 'schedule-timeline-{0}'
+    DASHBOARD_SUMMARY = 'dashboard-summary-{0}'
+    WORKOUT_LOG_LAST_WEIGHTS = 'workout-log-last-weights-{0}'
+    NUTRITION_PLAN_VALUES = 'nutrition-plan-values-{0}-{1}'
+    SEARCH_INDEX_VERSION = 'search-index-version-{0}'
+    SEARCH_INDEX_CHANGE = 'search-index-change-{0}-{1}'
+    GUEST_POOL_STAT = 'guest-pool-stat-{0}'
+    GUEST_USER_RATE = 'guest-user-rate-{0}'
+
+    # Counters of the workout canonical form cache:
+    # * hit: the workout was found in the cache
+    # * miss: the workout had to be composed from its days
+    # * rebuild: a day had to be built from the database
+    WORKOUT_CANONICAL_STATS = ('hit', 'miss', 'rebuild')
+
+    # Counters of the guest account pool:
+    # * claimed: a guest got an account from the pool
+    # * created: the pool was empty and the account was created on the fly
+    # * limited: no account was given out because of the rate limit
+    GUEST_POOL_STATS = ('claimed', 'created', 'limited')
+
+    # Weight units the nutritional values of the plans are cached in
+    NUTRITION_PLAN_VALUES_UNITS = ('kg', 'lb')
 
     def get_pk(self, param):
         '''
@@ -109,10 +320,83 @@ class CacheKeyMapper(object):
         '''
         return self.WORKOUT_CANONICAL_REPRESENTATION.format(self.get_pk(param))
 
-    def get_workout_log_list(self, hash_value):
+    def get_workout_canonical_version(self, param):
         '''
-        Return the workout canonical representation
+        Return the version counter of the workout canonical representation
+        '''
+        return self.WORKOUT_CANONICAL_VERSION.format(self.get_pk(param))
+
+    def get_workout_canonical_stat(self, name):
+        '''
+        Return the key of a counter of the workout canonical representation cache
+        '''
+        return self.WORKOUT_CANONICAL_STAT.format(name)
+
+    def get_day_canonical(self, workout, version, day):
+        '''
+        Return the canonical representation of a day, for the given version
+        of its workout
+        '''
+        return self.DAY_CANONICAL_REPRESENTATION.format(self.get_pk(workout),
+                                                        version,
+                                                        self.get_pk(day))
+
+    def get_workout_log_list(self, user, year, month):
+        '''
+        Return the workout logs of a user, grouped by date, for a month
+        '''
+        return self.WORKOUT_LOG_LIST.format(self.get_pk(user), year, month)
+
+    def get_schedule_timeline(self, param):
+        '''
+        Return the steps of a schedule with their durations
+        '''
+        return self.SCHEDULE_TIMELINE.format(self.get_pk(param))
+
+    def get_dashboard_summary(self, user):
+        '''
+        Return the summary of the dashboard of a user
+        '''
+        return self.DASHBOARD_SUMMARY.format(self.get_pk(user))
+
+    def get_workout_log_last_weights(self, user):
+        '''
+        Return the weights of the last logs of a user, per exercise and repetitions
+        '''
+        return self.WORKOUT_LOG_LAST_WEIGHTS.format(self.get_pk(user))
+
+    def get_nutrition_plan_values(self, param, unit):
+        '''
+        Return the nutritional values of a nutrition plan, in the given unit
         '''
-        return self.WORKOUT_LOG_LIST.format(hash_value)
+        return self.NUTRITION_PLAN_VALUES.format(self.get_pk(param), unit)
+
+    def get_search_index_version(self, name):
+        '''
+        Return the version counter of a search index
+        '''
+        return self.SEARCH_INDEX_VERSION.format(name)
+
+    def get_search_index_change(self, name, version):
+        '''
+        Return the keys of the entries of a search index changed in a version
+        '''
+        return self.SEARCH_INDEX_CHANGE.format(name, version)
+
+    def get_guest_pool_stat(self, name):
+        '''
+        Return one of the counters of the guest account pool
+        '''
+        return self.GUEST_POOL_STAT.format(name)
+
+    def get_guest_user_rate(self, address):
+        '''
+        Return the counter of guest accounts given out to an IP address
+        '''
+        return self.GUEST_USER_RATE.format(address)
 
 cache_mapper = CacheKeyMapper()
+
+local_workout_canonical_stats = LocalCounters(cache_mapper.get_workout_canonical_stat,
+                                              WORKOUT_CANONICAL_STATS_FLUSH_INTERVAL)
+atexit.register(local_workout_canonical_stats.flush, True)
@@ -0,0 +1,196 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+'''
+Helpers to store the canonical representation of workouts in the cache as plain
+data, without pickling model instances.
+'''
+
+import collections
+
+from django.apps import apps
+from django.db import (
+    models,
+    router
+)
+from django.db.models.query_utils import deferred_class_factory
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+
+CANONICAL_FIELDS = {
+    'core.DaysOfWeek': ('id', 'day_of_week'),
+    'core.Language': ('id', 'short_name', 'full_name'),
+    'core.RepetitionUnit': ('id', 'name'),
+    'core.WeightUnit': ('id', 'name'),
+    'exercises.Exercise': ('id', 'name', 'category', 'language'),
+    'exercises.ExerciseCategory': ('id', 'name'),
+    'manager.Workout': ('id', 'creation_date', 'comment', 'user_id'),
+    'manager.Day': ('id', 'training_id', 'description'),
+    'manager.Set': ('id', 'exerciseday_id', 'order', 'sets'),
+    'manager.Setting': ('id', 'set_id', 'exercise_id', 'repetition_unit', 'reps', 'weight',
+                        'weight_unit', 'order', 'comment'),
+}
+'''
+Fields of the models that are saved in the canonical form, the ones used by
+the templates and the PDFs. For foreign keys, the name of the relation saves
+the ID and, if it was loaded, the related object as well.
+
+The other fields are deferred and loaded from the database when accessed.
+Models not listed here save all their concrete fields.
+'''
+
+
+ModelReference = collections.namedtuple('ModelReference', ('label', 'pk', 'values'))
+'''
+Compact reference to a model instance: the model's label, its primary key and
+a dictionary with the values of its fields (see CANONICAL_FIELDS). Related
+objects are saved as references as well.
+'''
+
+
+def serialize_model(instance, references=None):
+    '''
+    Converts a model instance into a ModelReference
+
+    :param instance: the model instance
+    :param references: optional dictionary with the references already created,
+                       so that objects used several times are only saved once
+    :rtype: ModelReference
+    '''
+    label = instance._meta.label
+    if references is not None and (label, instance.pk) in references:
+        return references[(label, instance.pk)]
+
+    values = {}
+    for name in CANONICAL_FIELDS.get(label, [field.attname
+                                             for field in instance._meta.concrete_fields]):
+        field = instance._meta.get_field(name)
+        values[field.attname] = getattr(instance, field.attname)
+
+        # Save the related object too if it was loaded, e.g. with select_related
+        if name == field.name and field.is_relation \
+                and hasattr(instance, field.get_cache_name()):
+            related = getattr(instance, field.get_cache_name())
+            if related is not None:
+                values[field.name] = serialize_model(related, references)
+
+    reference = ModelReference(label, instance.pk, values)
+    if references is not None:
+        references[(label, instance.pk)] = reference
+    return reference
+
+
+def load_model(reference):
+    '''
+    Creates a model instance from a ModelReference, without any queries
+
+    Values of fields that don't exist anymore are ignored and fields whose
+    values were not saved are deferred, so they are loaded when accessed.
+
+    :param reference: the ModelReference
+    :return: the model instance
+    '''
+    model = apps.get_model(reference.label)
+    values = {}
+    related = {}
+    for field in model._meta.concrete_fields:
+        if field.attname in reference.values:
+            values[field.attname] = reference.values[field.attname]
+        if field.is_relation and field.name in reference.values:
+            related[field.get_cache_name()] = load_model(reference.values[field.name])
+
+    deferred = set(field.attname for field in model._meta.concrete_fields) - set(values)
+    instance = deferred_class_factory(model, deferred)(**values)
+    instance._state.adding = False
+    instance._state.db = router.db_for_read(model)
+    for cache_name, related_instance in related.items():
+        setattr(instance, cache_name, related_instance)
+    return instance
+
+
+def serialize_canonical_form(value, references=None):
+    '''
+    Converts a canonical form into plain data that is cheap to pickle
+
+    Model instances are replaced by a ModelReference (see serialize_model),
+    dictionaries and lists are processed recursively and everything else is
+    returned unchanged. Objects that appear several times share the same
+    reference, which is then pickled only once.
+    '''
+    if references is None:
+        references = {}
+
+    if isinstance(value, models.Model):
+        return serialize_model(value, references)
+    elif isinstance(value, dict):
+        return {key: serialize_canonical_form(item, references) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [serialize_canonical_form(item, references) for item in value]
+    return value
+
+
+class CanonicalForm(Mapping):
+    '''
+    Read only, lazy wrapper around the plain data of a canonical form
+
+    It behaves like the dictionary of the canonical form: model instances are
+    created (without any database query) from their references only when
+    accessed, nested dictionaries are wrapped as well. Instances are shared
+    within the whole form, so each object is only created once.
+    '''
+
+    def __init__(self, data, instances=None):
+        self._data = data
+        self._values = {}
+        self._instances = {} if instances is None else instances
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            self._values[key] = self._load(self._data[key])
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return 'CanonicalForm({0!r})'.format(self._data)
+
+    @property
+    def data(self):
+        '''
+        The plain data of the canonical form, as saved in the cache
+        '''
+        return self._data
+
+    def _load(self, value):
+        '''
+        Converts a value of the plain data into its final form
+        '''
+        if isinstance(value, ModelReference):
+            key = (value.label, value.pk)
+            if key not in self._instances:
+                self._instances[key] = load_model(value)
+            return self._instances[key]
+        elif isinstance(value, dict):
+            return CanonicalForm(value, self._instances)
+        elif isinstance(value, list):
+            return [self._load(item) for item in value]
+        return value
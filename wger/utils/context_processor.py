@@ -15,6 +15,7 @@
 
 from django.conf import settings
 from django.templatetags.static import static
+from django.utils import translation
 
 from wger import get_version
 from wger.utils import constants
@@ -22,6 +23,34 @@ from wger.utils.language import load_language
 
 
 def processor(request):
+    '''
+    Adds the common variables to the context of the templates
+
+    The context processors run for every template rendered with the request,
+    so the variables that don't depend on the session are saved in the
+    request and only computed again if the active language changes.
+    '''
+    language_code = translation.get_language()
+    cached = getattr(request, '_wger_context', None)
+    if cached is None or cached[0] != language_code:
+        cached = (language_code, get_request_context(request))
+        request._wger_context = cached
+
+    context = cached[1].copy()
+
+    # Flag for guest users
+    context['has_demo_data'] = request.session.get('has_demo_data', False)
+
+    # Used for logged in trainers
+    context['trainer_identity'] = request.session.get('trainer.identity')
+    return context
+
+
+def get_request_context(request):
+    '''
+    Returns the common variables that only depend on the request and the
+    active language, see processor
+    '''
 
     language = load_language()
     full_path = request.get_full_path()
@@ -55,36 +84,30 @@ def processor(request):
         # Translation links
         'i18n_path': i18n_path,
 
-        # Flag for guest users
-        'has_demo_data': request.session.get('has_demo_data', False),
-
         # Don't show messages on AJAX requests (they are deleted if shown)
         'no_messages': request.META.get('HTTP_X_WGER_NO_MESSAGES', False),
 
         # Default cache time for template fragment caching
         'cache_timeout': settings.CACHES['default']['TIMEOUT'],
-
-        # Used for logged in trainers
-        'trainer_identity': request.session.get('trainer.identity'),
     }
 
     # Pseudo-intelligent navigation here
-    if '/software/' in request.get_full_path() \
-       or '/contact' in request.get_full_path() \
-       or '/api/v2' in request.get_full_path():
+    if '/software/' in full_path \
+       or '/contact' in full_path \
+       or '/api/v2' in full_path:
             context['active_tab'] = constants.SOFTWARE_TAB
             context['show_shariff'] = True
 
-    elif '/exercise/' in request.get_full_path():
+    elif '/exercise/' in full_path:
         context['active_tab'] = constants.EXERCISE_TAB
 
-    elif '/nutrition/' in request.get_full_path():
+    elif '/nutrition/' in full_path:
         context['active_tab'] = constants.NUTRITION_TAB
 
-    elif '/weight/' in request.get_full_path():
+    elif '/weight/' in full_path:
         context['active_tab'] = constants.WEIGHT_TAB
 
-    elif '/workout/' in request.get_full_path():
+    elif '/workout/' in full_path:
         context['active_tab'] = constants.WORKOUT_TAB
 
     else:
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+'''
+Helpers to stream (big) CSV exports
+
+The rows are written one after the other while the response is being sent,
+so the memory used does not depend on the amount of exported data.
+'''
+
+import csv
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils import six
+from django.utils.encoding import force_bytes
+
+
+EXPORT_CHUNK_SIZE = 500
+'''
+Number of objects loaded from the database at once
+'''
+
+GZIP_PARAMETER = 'gzip'
+'''
+GET parameter to request a gzip compressed export
+'''
+
+
+class EchoBuffer(object):
+    '''
+    File-like object that returns what is written to it instead of saving it
+    '''
+
+    def write(self, value):
+        return value
+
+
+def queryset_chunks(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    '''
+    Iterates over the objects of a queryset, loading them in chunks
+
+    Unlike iterator(), this also works with select_related and prefetch_related,
+    which are done once per chunk. The objects are returned ordered by their ID.
+
+    :param queryset: the queryset to process
+    :param chunk_size: number of objects loaded with one query
+    '''
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(chunk_queryset[:chunk_size])
+        for obj in chunk:
+            yield obj
+
+        if len(chunk) < chunk_size:
+            break
+        last_pk = chunk[-1].pk
+
+
+def csv_lines(rows, **kwargs):
+    '''
+    Converts the rows to CSV, returning one line at a time
+
+    :param rows: iterable with the lists of values of each row
+    :param kwargs: options passed to the CSV writer
+    '''
+    writer = csv.writer(EchoBuffer(), **kwargs)
+    for row in rows:
+        # Python3: the csv module in python 2.7 can only handle bytes. Should this
+        #          requirement be dropped once, this can be removed.
+        if six.PY2:
+            row = [value.encode('utf8') if isinstance(value, six.text_type) else value
+                   for value in row]
+        yield writer.writerow(row)
+
+
+def gzip_stream(chunks):
+    '''
+    Compresses the chunks with gzip, returning the compressed data as it
+    becomes available
+
+    :param chunks: iterable with the (text or binary) chunks to compress
+    '''
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION,
+                                  zlib.DEFLATED,
+                                  zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(force_bytes(chunk))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streaming_csv_response(rows, filename, compress=False, **kwargs):
+    '''
+    Returns a streaming response with the rows as a CSV file
+
+    :param rows: iterable with the lists of values of each row
+    :param filename: the name of the file, without extension
+    :param compress: whether to send a gzip compressed file
+    :param kwargs: options passed to the CSV writer
+    '''
+    lines = csv_lines(rows, **kwargs)
+    if compress:
+        response = StreamingHttpResponse(gzip_stream(lines), content_type='application/gzip')
+        filename += '.csv.gz'
+    else:
+        response = StreamingHttpResponse(lines, content_type='text/csv')
+        filename += '.csv'
+
+    response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
+    return response
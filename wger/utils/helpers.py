@@ -21,7 +21,9 @@ import logging
 import decimal
 import json
 import datetime
+import threading
 
+from contextlib import contextmanager
 from functools import wraps
 
 from django.http import Http404
@@ -83,6 +85,36 @@ def disable_for_loaddata(signal_handler):
     return wrapper
 
 
+_bulk_delete = threading.local()
+
+
+@contextmanager
+def bulk_delete():
+    '''
+    Context manager to skip the signal handlers decorated with
+    disable_for_bulk_delete, e.g. while deleting users with all their data.
+    Those handlers only update caches and statistics of the deleted objects.
+    '''
+    _bulk_delete.active = True
+    try:
+        yield
+    finally:
+        _bulk_delete.active = False
+
+
+def disable_for_bulk_delete(signal_handler):
+    '''
+    Decorator to skip a signal handler while in a bulk_delete block, like
+    disable_for_loaddata does for loaddata
+    '''
+    @wraps(signal_handler)
+    def wrapper(*args, **kwargs):
+        if getattr(_bulk_delete, 'active', False):
+            return
+        signal_handler(*args, **kwargs)
+    return wrapper
+
+
 def next_weekday(date, weekday):
     '''
     Helper function to find the next weekday after a given date,
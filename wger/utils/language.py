@@ -13,7 +13,11 @@
 # You should have received a copy of the GNU Affero General Public License
 
 import logging
+import threading
+import time
+from collections import OrderedDict
 
+from django.conf import settings
 from django.utils import translation
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.cache import cache
@@ -25,6 +29,66 @@ from wger.utils.cache import cache_mapper
 
 logger = logging.getLogger(__name__)
 
+LANGUAGE_LOCAL_CACHE_SIZE = 32
+'''
+Maximum number of language codes kept in the process-local cache
+'''
+
+LANGUAGE_LOCAL_CACHE_TIMEOUT = 60
+'''
+Seconds a language is kept in the process-local cache. Changes done in other
+processes are only seen after this time
+'''
+
+
+class LocalLanguageCache(object):
+    '''
+    Small process-local LRU cache for the language objects
+
+    The languages are needed on almost every request, but they hardly ever
+    change, so they are kept in memory in front of the shared cache.
+    '''
+
+    def __init__(self, size=LANGUAGE_LOCAL_CACHE_SIZE, timeout=LANGUAGE_LOCAL_CACHE_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, language_code):
+        '''
+        Returns the language for the code, None if it is not cached
+        '''
+        with self.lock:
+            entry = self.entries.pop(language_code, None)
+            if entry is None or entry[1] < time.time():
+                return None
+
+            # Put it back at the end, as the most recently used entry
+            self.entries[language_code] = entry
+            return entry[0]
+
+    def set(self, language_code, language):
+        '''
+        Saves the language for the code, removing the least recently used
+        entries if the cache is full
+        '''
+        with self.lock:
+            self.entries.pop(language_code, None)
+            self.entries[language_code] = (language, time.time() + self.timeout)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        '''
+        Removes all entries
+        '''
+        with self.lock:
+            self.entries.clear()
+
+
+local_language_cache = LocalLanguageCache()
+
 
 # ************************
 # Language functions
@@ -44,20 +108,43 @@ def load_language(language_code=None):
     else:
         used_language = language_code
 
-    language = cache.get(cache_mapper.get_language_key(used_language))
+    language = local_language_cache.get(used_language)
     if language:
         return language
 
-    try:
-        language = Language.objects.get(short_name=used_language)
-    except ObjectDoesNotExist:
-        # No luck, load english as our fall-back language
-        language = Language.objects.get(short_name="en")
+    # The language is saved under the code that was requested, which is not
+    # its own short name if the fall-back language is used
+    key = cache_mapper.get_language_key(used_language)
+    language = cache.get(key)
+    if not language:
+        try:
+            language = Language.objects.get(short_name=used_language)
+        except ObjectDoesNotExist:
+            # No luck, load english as our fall-back language
+            language = Language.objects.get(short_name="en")
 
-    cache.set(cache_mapper.get_language_key(language), language)
+        cache.set(key, language)
+
+    local_language_cache.set(used_language, language)
     return language
 
 
+def reset_language_cache(language=None):
+    '''
+    Removes the cached languages
+
+    As the fall-back language is saved under the codes of the missing ones,
+    all the codes of the application languages are removed from the cache.
+
+    :param language: the language that changed, if any
+    '''
+    language_codes = set(code for code, name in settings.LANGUAGES)
+    if language is not None:
+        language_codes.add(language.short_name)
+    cache.delete_many([cache_mapper.get_language_key(code) for code in language_codes])
+    local_language_cache.clear()
+
+
 def load_item_languages(item, language_code=None):
     '''
     Returns the languages for a data type (exercises, ingredients)
@@ -21,9 +21,8 @@ import logging
 from django.conf import settings
 from django.contrib import auth
 from django.utils.functional import SimpleLazyObject
-from django.contrib.auth import login as django_login
 
-from wger.core.demo import create_temporary_user
+from wger.core.demo import login_guest_user
 
 
 logger = logging.getLogger(__name__)
@@ -66,9 +65,8 @@ def get_user(request):
                 request.method == 'GET' and \
                 create_user and not user.is_authenticated():
 
-            logger.debug('creating a new guest user now')
-            user = create_temporary_user()
-            django_login(request, user)
+            logger.debug('logging in a new guest user now')
+            user = login_guest_user(request) or user
 
         request._cached_user = user
     return request._cached_user
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+'''
+Trigram search indexes
+
+The names are split into all their substrings of TRIGRAM_LENGTH characters.
+Every text containing a search term also contains all the trigrams of the
+term, so looking them up in the index returns a (small) list of candidates
+that only need to be checked with a normal substring comparison.
+
+The indexes are kept in memory by every process. A version number saved in
+the cache tells the processes when the indexed objects changed. The keys of
+the changed entries are saved in the cache for every version, so that the
+processes only need to load these entries again. The index is only built
+again when the changes are not available anymore.
+'''
+
+import re
+import time
+import heapq
+import logging
+import threading
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.utils import six
+
+from wger.utils.cache import cache_mapper
+
+
+logger = logging.getLogger(__name__)
+
+TRIGRAM_LENGTH = 3
+'''
+Length of the tokens saved in the index. Shorter search terms can't use it
+'''
+
+SEARCH_INDEX_MAX_CHANGES = 100
+'''
+Maximum number of changes applied to an index. If there were more since it was
+last used, it is built again
+'''
+
+SEARCH_INDEX_CHANGE_TIMEOUT = 24 * 60 * 60
+'''
+Seconds the keys of the changed entries are kept in the cache
+'''
+
+WORD_BOUNDARY = re.compile(r'\W', re.UNICODE)
+
+
+def normalize_search_text(text):
+    '''
+    Returns the form of a text that is used in the search indexes
+
+    Only the case is changed, so that the search works like icontains
+    '''
+    return six.text_type(text).lower()
+
+
+def get_trigrams(text):
+    '''
+    Returns the set of trigrams of a (normalised) text
+
+    :param text: the text to process
+    '''
+    return set(text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1))
+
+
+def get_match_rank(text, term):
+    '''
+    Returns the rank of a match, lower values are better matches:
+
+    * 0: the text is the term
+    * 1: a word in the text starts with the term
+    * 2: the term is somewhere else in the text
+    * None: the text does not contain the term
+
+    Both values must be normalised.
+    '''
+    position = text.find(term)
+    if position == -1:
+        return None
+
+    if text == term:
+        return 0
+
+    while position != -1:
+        if position == 0 or WORD_BOUNDARY.match(text[position - 1]):
+            return 1
+        position = text.find(term, position + 1)
+
+    return 2
+
+
+class TrigramIndex(object):
+    '''
+    An in-memory trigram index
+
+    Every entry has a key (e.g. the primary key of the object), a name, which
+    is searched, a group (e.g. the language), used to filter the results, and
+    a value, which is returned by the search.
+    '''
+
+    def __init__(self, entries=()):
+        '''
+        :param entries: iterable with (key, name, group, value) tuples
+        '''
+        self.entries = []
+        self.positions = {}
+        self.tokens = defaultdict(list)
+        for key, name, group, value in entries:
+            self.add(key, name, group, value)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def add(self, key, name, group, value):
+        '''
+        Adds an entry to the index, replacing the one with the same key
+        '''
+        self.remove(key)
+        text = normalize_search_text(name)
+        position = len(self.entries)
+        self.entries.append((text, group, value))
+        self.positions[key] = position
+        for token in get_trigrams(text):
+            self.tokens[token].append(position)
+
+    def remove(self, key):
+        '''
+        Removes the entry with the given key from the index, if there is one
+
+        Only the entry is cleared, its position stays in the lists of the
+        trigrams and is skipped by the search.
+        '''
+        position = self.positions.pop(key, None)
+        if position is not None:
+            self.entries[position] = None
+
+    def search(self, term, groups, limit):
+        '''
+        Returns the values of the entries whose name contains the search term
+
+        The results are ordered by their rank (see get_match_rank) and name.
+
+        :param term: the search term
+        :param groups: the groups of the entries to search
+        :param limit: maximum number of results
+        '''
+        term = normalize_search_text(term).strip()
+        if not term:
+            return []
+
+        trigrams = get_trigrams(term)
+        if trigrams:
+            # Start with the rarest trigram, the candidates can only get fewer
+            postings = sorted((self.tokens.get(token, ()) for token in trigrams), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(posting)
+        else:
+            candidates = range(len(self.entries))
+
+        groups = set(groups)
+        matches = []
+        for position in candidates:
+            entry = self.entries[position]
+            if entry is None:
+                continue
+
+            text, group, value = entry
+            if group not in groups:
+                continue
+
+            rank = get_match_rank(text, term)
+            if rank is not None:
+                matches.append((rank, text, position))
+
+        return [self.entries[position][2]
+                for rank, text, position in heapq.nsmallest(limit, matches)]
+
+
+class SearchIndex(object):
+    '''
+    A trigram index shared by all the code running in a process
+
+    The index is built on first use with the entries returned by the loader.
+    Updating entries increases its version in the cache and saves their keys,
+    so that every process loads them again the next time the index is used.
+    Resetting it makes every process build it again.
+    '''
+
+    def __init__(self, name, loader):
+        '''
+        :param name: name of the index, used for the cache keys
+        :param loader: function returning (key, name, group, value) tuples. If
+                       a list of keys is passed, only the entries with these
+                       keys are returned
+        '''
+        self.name = name
+        self.loader = loader
+        self.index = None
+        self.version = None
+        self.lock = threading.Lock()
+
+    def get_version(self):
+        '''
+        Returns the current version of the index from the cache
+
+        If the counter is not in the cache (yet), it is initialised with the
+        current time so that it never goes back to a value used before.
+        '''
+        key = cache_mapper.get_search_index_version(self.name)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+        return version
+
+    def get_changes(self, version):
+        '''
+        Returns the keys of the entries that changed since the version of the
+        index of this process, None if they are not all available
+
+        :param version: the current version
+        '''
+        if self.version is None or version is None \
+                or not 0 < version - self.version <= SEARCH_INDEX_MAX_CHANGES:
+            return None
+
+        keys = [cache_mapper.get_search_index_change(self.name, i)
+                for i in range(self.version + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return None
+        return set(key for change in changes.values() for key in change)
+
+    def get_index(self):
+        '''
+        Returns the index, updating or building it if it is out of date
+        '''
+        version = self.get_version()
+        index = self.index
+        if index is not None and (version is None or version == self.version):
+            return index
+
+        with self.lock:
+            if self.index is not None and version == self.version:
+                return self.index
+
+            changes = self.get_changes(version) if self.index is not None else None
+            start = time.time()
+            if changes is None:
+                index = TrigramIndex(self.loader())
+                logger.debug('Built {0} search index with {1} entries in {2:.3f}s'
+                             .format(self.name, len(index), time.time() - start))
+            else:
+                index = self.index
+                for key in changes:
+                    index.remove(key)
+                for key, name, group, value in self.loader(list(changes)):
+                    index.add(key, name, group, value)
+                logger.debug('Updated {0} entries of {1} search index in {2:.3f}s'
+                             .format(len(changes), self.name, time.time() - start))
+            self.index, self.version = index, version
+        return index
+
+    def update(self, keys):
+        '''
+        Marks the entries with the given keys as changed in all processes
+
+        The entries are loaded again, or removed if the loader does not return
+        them anymore, the next time the index is used.
+
+        :param keys: list of the keys of the entries
+        '''
+        if not keys:
+            return
+
+        try:
+            version = cache.incr(cache_mapper.get_search_index_version(self.name))
+        except ValueError:
+            # No version yet, the index will be built when needed
+            return
+        cache.set(cache_mapper.get_search_index_change(self.name, version),
+                  list(keys),
+                  SEARCH_INDEX_CHANGE_TIMEOUT)
+
+    def reset(self):
+        '''
+        Marks the index as out of date in all processes, so that it is built
+        again
+        '''
+        self.index = None
+        try:
+            cache.incr(cache_mapper.get_search_index_version(self.name))
+        except ValueError:
+            # No version yet, a new one will be created when needed
+            pass
+
+    def search(self, term, groups, limit):
+        '''
+        Searches the index, see TrigramIndex.search
+        '''
+        return self.get_index().search(term, groups, limit)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import pickle
+
+from wger.core.models import DaysOfWeek
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.exercises.models import Exercise
+from wger.manager.models import (
+    Day,
+    Setting
+)
+from wger.utils.canonical import (
+    CanonicalForm,
+    ModelReference,
+    load_model,
+    serialize_canonical_form
+)
+
+
+class CanonicalFormTestCase(WorkoutManagerTestCase):
+    '''
+    Test the plain data representation of the canonical forms
+    '''
+
+    def test_serialize(self):
+        '''
+        Test that model instances are replaced by references
+        '''
+        setting = Setting.objects.get(pk=2)
+        data = serialize_canonical_form({'obj': setting,
+                                         'list': [setting, 1, u'text'],
+                                         'nested': {'setting': setting}})
+
+        self.assertEqual(data['obj'].label, 'manager.Setting')
+        self.assertEqual(data['obj'].pk, 2)
+        self.assertIsInstance(data['list'][0], ModelReference)
+        self.assertIs(data['list'][0], data['obj'])
+        self.assertEqual(data['list'][1:], [1, u'text'])
+        self.assertIsInstance(data['nested']['setting'], ModelReference)
+        self.assertEqual(data['obj'].values['reps'], setting.reps)
+        self.assertEqual(data['obj'].values['weight_unit_id'], setting.weight_unit_id)
+
+        # Only plain data is pickled
+        self.assertNotIn(b'django.db', pickle.dumps(data))
+
+    def test_wrapper(self):
+        '''
+        Test that the wrapper creates the instances without any queries
+        '''
+        day = Day.objects.get(pk=5)
+        setting = Setting.objects.get(pk=3)
+        data = serialize_canonical_form({'obj': day,
+                                         'days': {'day_list': list(DaysOfWeek.objects.all())},
+                                         'settings': [setting, setting],
+                                         'text': u'4 × 10'})
+
+        with self.assertNumQueries(0):
+            canonical_form = CanonicalForm(data)
+            self.assertEqual(canonical_form['obj'], day)
+            self.assertEqual(canonical_form['obj'].description, day.description)
+            self.assertEqual(canonical_form['obj'].training_id, day.training_id)
+            self.assertEqual(canonical_form['settings'][0].weight, setting.weight)
+            self.assertEqual(canonical_form['text'], u'4 × 10')
+            self.assertEqual(len(canonical_form['days']['day_list']), 7)
+            self.assertEqual(sorted(canonical_form.keys()), ['days', 'obj', 'settings', 'text'])
+
+        # Instances are only created once
+        self.assertIs(canonical_form['settings'][0], canonical_form['settings'][1])
+
+        # The wrapper compares equal to the original dictionary
+        self.assertEqual(canonical_form, {'obj': day,
+                                          'days': {'day_list': list(DaysOfWeek.objects.all())},
+                                          'settings': [setting, setting],
+                                          'text': u'4 × 10'})
+
+    def test_serialize_fields(self):
+        '''
+        Test that only the listed fields and the loaded related objects are saved
+        '''
+        exercise = Exercise.objects.select_related('category').get(pk=1)
+        reference = serialize_canonical_form(exercise)
+
+        self.assertEqual(sorted(reference.values.keys()),
+                         ['category', 'category_id', 'id', 'language_id', 'name'])
+        self.assertEqual(reference.values['category'].label, 'exercises.ExerciseCategory')
+        self.assertEqual(reference.values['category'].values, {'id': exercise.category_id,
+                                                               'name': exercise.category.name})
+
+    def test_load_model(self):
+        '''
+        Test that the fields that were not saved are loaded from the database
+        '''
+        exercise = Exercise.objects.select_related('category').get(pk=1)
+        reference = serialize_canonical_form(exercise)
+
+        with self.assertNumQueries(0):
+            instance = load_model(reference)
+            self.assertEqual(instance, exercise)
+            self.assertEqual(instance.name, exercise.name)
+            self.assertEqual(instance.category.name, exercise.category.name)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(instance.description, exercise.description)
+
+    def test_load_model_changed_fields(self):
+        '''
+        Test that values are matched by name and unknown fields are ignored
+        '''
+        setting = Setting.objects.get(pk=3)
+        reference = ModelReference('manager.Setting', 3, {'removed_field': 5,
+                                                          'weight': setting.weight,
+                                                          'id': 3,
+                                                          'reps': setting.reps})
+
+        with self.assertNumQueries(0):
+            instance = load_model(reference)
+            self.assertEqual(instance.reps, setting.reps)
+            self.assertEqual(instance.weight, setting.weight)
+        self.assertFalse(hasattr(instance, 'removed_field'))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(instance.comment, setting.comment)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+
+from django.contrib.auth.models import User
+from django.utils import six
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.utils.export import (
+    csv_lines,
+    gzip_stream,
+    queryset_chunks
+)
+
+
+class ExportHelperTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the helper functions of the streaming exports
+    '''
+
+    def test_queryset_chunks(self):
+        '''
+        Test loading the objects of a queryset in chunks
+        '''
+        users = User.objects.all()
+        count = users.count()
+        self.assertGreater(count, 3)
+
+        with self.assertNumQueries(count // 3 + 1):
+            result = [user.pk for user in queryset_chunks(users, chunk_size=3)]
+        self.assertEqual(result, list(users.order_by('pk').values_list('pk', flat=True)))
+
+    def test_csv_lines(self):
+        '''
+        Test converting rows to CSV lines
+        '''
+        lines = list(csv_lines([[u'Äpfel', 1], ['a,b', None]]))
+        self.assertEqual(lines, [u'Äpfel,1\r\n', u'"a,b",\r\n'] if six.PY3
+                         else [u'Äpfel,1\r\n'.encode('utf8'), b'"a,b",\r\n'])
+
+    def test_gzip_stream(self):
+        '''
+        Test compressing a stream
+        '''
+        chunks = [u'Äpfel\n', b'abc' * 1000, u'end']
+        data = b''.join(gzip_stream(chunks))
+        self.assertEqual(gzip.GzipFile(fileobj=six.BytesIO(data)).read(),
+                         u'Äpfel\n'.encode('utf8') + b'abc' * 1000 + b'end')
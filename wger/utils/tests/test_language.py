@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.utils import translation
+
+from wger.core.models import Language
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.utils.cache import cache_mapper
+from wger.utils.context_processor import processor
+from wger.utils.language import (
+    LocalLanguageCache,
+    load_language,
+    local_language_cache
+)
+
+
+class LocalLanguageCacheTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the process-local language cache
+    '''
+
+    def test_lru(self):
+        '''
+        Test that the least recently used entries are removed
+        '''
+        local_cache = LocalLanguageCache(size=2)
+        local_cache.set('de', 1)
+        local_cache.set('en', 2)
+        self.assertEqual(local_cache.get('de'), 1)
+
+        local_cache.set('fr', 3)
+        self.assertIsNone(local_cache.get('en'))
+        self.assertEqual(local_cache.get('de'), 1)
+        self.assertEqual(local_cache.get('fr'), 3)
+
+    def test_timeout(self):
+        '''
+        Test that old entries are not returned
+        '''
+        local_cache = LocalLanguageCache(timeout=-1)
+        local_cache.set('de', 1)
+        self.assertIsNone(local_cache.get('de'))
+
+
+class LoadLanguageTestCase(WorkoutManagerTestCase):
+    '''
+    Tests loading the current language
+    '''
+
+    def test_cache_key(self):
+        '''
+        Test that the language is saved under the key that is read
+        '''
+        language = load_language('de')
+        self.assertEqual(language.short_name, 'de')
+        self.assertEqual(cache.get(cache_mapper.get_language_key('de')), language)
+
+        # Served from the local cache, then the shared one
+        with self.assertNumQueries(0):
+            self.assertEqual(load_language('de'), language)
+        local_language_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(load_language('de'), language)
+
+    def test_fallback(self):
+        '''
+        Test that unknown languages are saved under their own code
+        '''
+        language = load_language('xx')
+        self.assertEqual(language.short_name, 'en')
+        self.assertEqual(cache.get(cache_mapper.get_language_key('xx')), language)
+
+        local_language_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(load_language('xx'), language)
+
+    def test_current_language(self):
+        '''
+        Test loading the active language
+        '''
+        with translation.override('de'):
+            self.assertEqual(load_language().short_name, 'de')
+        with translation.override('en'):
+            self.assertEqual(load_language().short_name, 'en')
+
+    def test_reset(self):
+        '''
+        Test that changing a language removes it from the caches
+        '''
+        load_language('de')
+        language = Language.objects.get(short_name='de')
+        language.full_name = 'Deutsch (Deutschland)'
+        language.save()
+
+        self.assertIsNone(cache.get(cache_mapper.get_language_key('de')))
+        self.assertEqual(load_language('de').full_name, 'Deutsch (Deutschland)')
+
+
+class ContextProcessorTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the context processor
+    '''
+
+    def get_request(self, path):
+        '''
+        Helper function that returns a request with a session
+        '''
+        request = RequestFactory().get(path)
+        request.session = {}
+        return request
+
+    def test_processor(self):
+        '''
+        Test the common context variables
+        '''
+        request = self.get_request('/de/exercise/overview/')
+        with translation.override('de'):
+            context = processor(request)
+        self.assertEqual(context['language'].short_name, 'de')
+        self.assertEqual(context['request_full_path'], '/de/exercise/overview/')
+        self.assertEqual(context['i18n_path']['en'], '/en/exercise/overview/')
+        self.assertFalse(context['has_demo_data'])
+
+    def test_computed_once(self):
+        '''
+        Test that the context is only computed again if the language changes
+        '''
+        request = self.get_request('/de/weight/overview/')
+        with translation.override('de'):
+            processor(request)
+
+            request.session['has_demo_data'] = True
+            with self.assertNumQueries(0):
+                context = processor(request)
+            self.assertTrue(context['has_demo_data'])
+
+        with translation.override('en'):
+            self.assertEqual(processor(request)['language'].short_name, 'en')
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with Workout Manager.  If not, see <http://www.gnu.org/licenses/>.
+
+from django.test import SimpleTestCase
+
+from wger.utils.search import (
+    TrigramIndex,
+    get_match_rank,
+    get_trigrams,
+    normalize_search_text
+)
+
+
+class SearchHelperTestCase(SimpleTestCase):
+    '''
+    Tests the helper functions of the search indexes
+    '''
+
+    def test_normalize(self):
+        '''
+        Test normalising texts
+        '''
+        self.assertEqual(normalize_search_text(u'Äpfel, ROH'), u'äpfel, roh')
+
+    def test_trigrams(self):
+        '''
+        Test splitting texts into trigrams
+        '''
+        self.assertEqual(get_trigrams(u'slurm'), {u'slu', u'lur', u'urm'})
+        self.assertEqual(get_trigrams(u'aaaa'), {u'aaa'})
+        self.assertEqual(get_trigrams(u'ab'), set())
+
+    def test_match_rank(self):
+        '''
+        Test the rank of the matches
+        '''
+        self.assertEqual(get_match_rank(u'slurm', u'slurm'), 0)
+        self.assertEqual(get_match_rank(u'slurm cola', u'slu'), 1)
+        self.assertEqual(get_match_rank(u'cola, slurm', u'slu'), 1)
+        self.assertEqual(get_match_rank(u'slurmslurm slurm', u'slurm'), 1)
+        self.assertEqual(get_match_rank(u'noslurm slurm', u'slurm'), 1)
+        self.assertEqual(get_match_rank(u'noslurm', u'slurm'), 2)
+        self.assertIsNone(get_match_rank(u'slurm', u'cola'))
+
+
+class TrigramIndexTestCase(SimpleTestCase):
+    '''
+    Tests the in-memory trigram index
+    '''
+
+    def test_add_remove(self):
+        '''
+        Test replacing and removing entries
+        '''
+        index = TrigramIndex([(1, u'Slurm', 1, u'slurm'),
+                              (2, u'Slurm cola', 1, u'cola')])
+        self.assertEqual(index.search(u'slurm', [1], 10), [u'slurm', u'cola'])
+
+        index.add(1, u'Soylent green', 1, u'soylent')
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search(u'slurm', [1], 10), [u'cola'])
+        self.assertEqual(index.search(u'green', [1], 10), [u'soylent'])
+
+        index.remove(2)
+        index.remove(3)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.search(u'slurm', [1], 10), [])
+        self.assertEqual(index.search(u'sl', [1], 10), [])
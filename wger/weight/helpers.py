@@ -20,7 +20,7 @@ import datetime
 import decimal
 import csv
 import json
-from collections import OrderedDict
+from collections import OrderedDict, deque, namedtuple
 
 from django.core.cache import cache
 
@@ -32,6 +32,16 @@ from wger.manager.models import WorkoutLog
 
 logger = logging.getLogger(__name__)
 
+LogEntry = namedtuple('LogEntry', ('date', 'reps', 'weight'))
+'''
+The columns of a workout log used in the log charts
+'''
+
+WEIGHT_ROLLUP_PERIODS = ('week', 'month')
+'''
+Periods the weight entries can be grouped by
+'''
+
 
 def parse_weight_csv(request, cleaned_data):
 
@@ -89,6 +99,9 @@ def group_log_entries(user, year, month, day=None):
     Processes and regroups a list of log entries so they can be more easily
     used in the different calendar pages
 
+    The result is cached for the whole month, the views for single days use
+    the same cache entry.
+
     :param user: the user to filter the logs for
     :param year: year
     :param month: month
@@ -96,56 +109,48 @@ def group_log_entries(user, year, month, day=None):
 
     :return: a dictionary with grouped logs by date and exercise
     '''
-    if day:
-        log_hash = hash((user.pk, year, month, day))
-    else:
-        log_hash = hash((user.pk, year, month))
+    cache_key = cache_mapper.get_workout_log_list(user, year, month)
+    out = cache.get(cache_key)
 
-    # There can be workout sessions without any associated log entries, so it is
-    # not enough so simply iterate through the logs
-    if day:
-        filter_date = datetime.date(year, month, day)
-        logs = WorkoutLog.objects.filter(user=user, date=filter_date)
-        sessions = WorkoutSession.objects.filter(user=user, date=filter_date)
+    if out is None:
+        out = OrderedDict()
 
-    else:
+        # There can be workout sessions without any associated log entries, so it is
+        # not enough so simply iterate through the logs
+        sessions = OrderedDict((session.date, session) for session in
+                               WorkoutSession.objects.filter(user=user,
+                                                             date__year=year,
+                                                             date__month=month)
+                               .select_related('workout')
+                               .order_by('date'))
         logs = WorkoutLog.objects.filter(user=user,
                                          date__year=year,
-                                         date__month=month)
-
-        sessions = WorkoutSession.objects.filter(user=user,
-                                                 date__year=year,
-                                                 date__month=month)
-
-    logs = logs.order_by('date', 'id')
-    out = cache.get(cache_mapper.get_workout_log_list(log_hash))
-    # out = OrderedDict()
-
-    if not out:
-        out = OrderedDict()
+                                         date__month=month) \
+            .select_related('workout', 'exercise', 'repetition_unit', 'weight_unit') \
+            .order_by('date', 'id')
 
         # Logs
         for entry in logs:
-            if not out.get(entry.date):
+            if entry.date not in out:
                 out[entry.date] = {'date': entry.date,
                                    'workout': entry.workout,
-                                   'session': entry.get_workout_session(),
+                                   'session': sessions.get(entry.date),
                                    'logs': OrderedDict()}
-
-            if not out[entry.date]['logs'].get(entry.exercise):
-                out[entry.date]['logs'][entry.exercise] = []
-
-            out[entry.date]['logs'][entry.exercise].append(entry)
+            out[entry.date]['logs'].setdefault(entry.exercise, []).append(entry)
 
         # Sessions
-        for entry in sessions:
-            if not out.get(entry.date):
-                out[entry.date] = {'date': entry.date,
-                                   'workout': entry.workout,
-                                   'session': entry,
-                                   'logs': {}}
+        for date, session in sessions.items():
+            if date not in out:
+                out[date] = {'date': date,
+                             'workout': session.workout,
+                             'session': session,
+                             'logs': {}}
 
-        cache.set(cache_mapper.get_workout_log_list(log_hash), out)
+        cache.set(cache_key, out)
+
+    if day:
+        date = datetime.date(year, month, day)
+        return OrderedDict([(date, out[date])] if date in out else [])
     return out
 
 
@@ -153,49 +158,57 @@ def process_log_entries(logs):
     '''
     Processes and regroups a list of log entries so they can be rendered
     and passed to the D3 library to render a chart
+
+    Only the date, repetitions and weight columns are loaded, with one query,
+    and everything is calculated in one pass over them.
+
+    :param logs: a queryset with the log entries
+    :return: a tuple with a dictionary of LogEntry tuples grouped by date and
+             the chart data as a JSON string
     '''
+    return process_log_rows(logs.values_list('date', 'reps', 'weight'))
 
-    entry_log = OrderedDict()
-    entry_list = {}
-    chart_data = []
-    max_weight = {}
 
-    # Group by date
-    for entry in logs:
+def process_log_entries_by_exercise(logs):
+    '''
+    Processes the log entries of several exercises at once, see process_log_entries
+
+    :param logs: a queryset with the log entries
+    :return: a dictionary with the results of process_log_entries for each
+             exercise ID that has log entries
+    '''
+    rows = {}
+    for exercise_id, date, reps, weight in logs.values_list('exercise_id', 'date',
+                                                            'reps', 'weight'):
+        rows.setdefault(exercise_id, []).append((date, reps, weight))
 
-        if not entry_log.get(entry.date):
-            entry_log[entry.date] = []
-        entry_log[entry.date].append(entry)
+    return {exercise_id: process_log_rows(exercise_rows)
+            for exercise_id, exercise_rows in rows.items()}
 
-        # Find the maximum weight per date per repetition.
-        # If on a day there are several entries with the same number of
-        # repetitions, but different weights, only the entry with the
-        # higher weight is shown in the chart
-        if not max_weight.get(entry.date):
-            max_weight[entry.date] = {entry.reps: entry.weight}
 
-        if not max_weight[entry.date].get(entry.reps):
-            max_weight[entry.date][entry.reps] = entry.weight
+def process_log_rows(rows):
+    '''
+    Processes the (date, reps, weight) tuples of the log entries of one exercise,
+    see process_log_entries
+    '''
 
-        if entry.weight > max_weight[entry.date][entry.reps]:
-            max_weight[entry.date][entry.reps] = entry.weight
+    entry_log = OrderedDict()
+    max_weight = OrderedDict()
 
-    for entry in logs:
-        if not entry_list.get(entry.reps):
-            entry_list[entry.reps] = {'list': [], 'seen': []}
+    for date, reps, weight in rows:
+        entry_log.setdefault(date, []).append(LogEntry(date, reps, weight))
 
-        # Only add if weight is the maximum for the day
-        if entry.weight != max_weight[entry.date][entry.reps]:
-            continue
-        if (entry.date, entry.reps, entry.weight) in entry_list[entry.reps]['seen']:
-            continue
+        # Find the maximum weight per date per repetition.
+        # If on a day there are several entries with the same number of
+        # repetitions, but different weights, only the entry with the
+        # higher weight is shown in the chart
+        rep_max_weight = max_weight.setdefault(reps, OrderedDict())
+        if date not in rep_max_weight or weight > rep_max_weight[date]:
+            rep_max_weight[date] = weight
 
-        entry_list[entry.reps]['seen'].append((entry.date, entry.reps, entry.weight))
-        entry_list[entry.reps]['list'].append({'date': entry.date,
-                                               'weight': entry.weight,
-                                               'reps': entry.reps})
-    for rep in entry_list:
-        chart_data.append(entry_list[rep]['list'])
+    chart_data = [[{'date': date, 'weight': weight, 'reps': reps}
+                   for date, weight in rep_max_weight.items()]
+                  for reps, rep_max_weight in max_weight.items()]
 
     return entry_log, json.dumps(chart_data, cls=DecimalJsonEncoder)
 
@@ -208,7 +221,7 @@ def get_last_entries(user, amount=5):
         their changes are presented.
          '''
 
-        last_entries = WeightEntry.objects.filter(user=user).order_by('-date')[:5]
+        last_entries = list(WeightEntry.objects.filter(user=user).order_by('-date')[:amount])
         last_entries_details = []
 
         for index, entry in enumerate(last_entries):
@@ -228,3 +241,104 @@ def get_last_entries(user, amount=5):
             last_entries_details.append((curr_entry, weight_diff, day_diff))
 
         return last_entries_details
+
+
+def average_weight(weights):
+    '''
+    Returns the average of a list of weights, rounded like the saved entries
+    '''
+    return (sum(weights) / len(weights)).quantize(decimal.Decimal('0.01'))
+
+
+def rollup_weight_entries(entries, period):
+    '''
+    Groups the weight entries by week or month
+
+    :param entries: list of (date, weight) tuples ordered by date
+    :param period: one of WEIGHT_ROLLUP_PERIODS
+    :return: list of (date, weight) tuples with the first day of each period
+             and the average weight during it
+    '''
+    periods = OrderedDict()
+    for date, weight in entries:
+        if period == 'week':
+            start = date - datetime.timedelta(days=date.weekday())
+        else:
+            start = date.replace(day=1)
+        periods.setdefault(start, []).append(weight)
+
+    return [(start, average_weight(weights)) for start, weights in periods.items()]
+
+
+def moving_average_weight_entries(entries, window):
+    '''
+    Smooths the weight entries with a (trailing) moving average
+
+    :param entries: list of (date, weight) tuples ordered by date
+    :param window: number of entries used for each average
+    :return: list of (date, weight) tuples with the average of the weight of
+             each entry and the window - 1 entries before it
+    '''
+    out = []
+    weights = deque()
+    total = decimal.Decimal(0)
+    for date, weight in entries:
+        weights.append(weight)
+        total += weight
+        if len(weights) > window:
+            total -= weights.popleft()
+        out.append((date, (total / len(weights)).quantize(decimal.Decimal('0.01'))))
+    return out
+
+
+def downsample_weight_entries(entries, points):
+    '''
+    Reduces the number of weight entries with the largest-triangle-three-buckets
+    algorithm, which keeps the visual shape of the curve
+
+    The first and last entries are always kept, the rest is split into buckets
+    and from each one the entry forming the largest triangle with the entry
+    chosen in the previous bucket and the average of the next one is used.
+
+    :param entries: list of (date, weight) tuples ordered by date
+    :param points: maximum number of entries to return. With 1 or 2 only the
+                   first and, for 2, the last entries are returned
+    :return: list with a subset of the entries
+    '''
+    if points < 1:
+        raise ValueError('At least one entry has to be returned')
+
+    count = len(entries)
+    if points >= count:
+        return list(entries)
+    if points < 3:
+        return [entries[0], entries[-1]][:points]
+
+    x = [date.toordinal() for date, weight in entries]
+    y = [float(weight) for date, weight in entries]
+    bucket_size = (count - 2) / float(points - 2)
+
+    out = [entries[0]]
+    previous = 0
+    for bucket in range(points - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+
+        next_x = sum(x[end:next_end]) / float(next_end - end)
+        next_y = sum(y[end:next_end]) / float(next_end - end)
+
+        selected = start
+        max_area = -1
+        for i in range(start, end):
+            area = abs((x[previous] - next_x) * (y[i] - y[previous])
+                       - (x[previous] - x[i]) * (next_y - y[previous]))
+            if area > max_area:
+                max_area = area
+                selected = i
+
+        out.append(entries[selected])
+        previous = selected
+
+    out.append(entries[-1])
+    return out
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+from django.db.models.signals import post_save, post_delete
+
+from wger.utils.cache import reset_dashboard_summary
+from wger.utils.helpers import disable_for_bulk_delete
+from wger.weight.models import WeightEntry
+
+
+@disable_for_bulk_delete
+def reset_dashboard(sender, instance, **kwargs):
+    '''
+    Resets the dashboard of the owner of a changed weight entry
+    '''
+    reset_dashboard_summary(instance.user_id)
+
+
+post_save.connect(reset_dashboard, sender=WeightEntry)
+post_delete.connect(reset_dashboard, sender=WeightEntry)
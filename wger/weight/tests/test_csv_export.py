@@ -12,9 +12,11 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 
+import gzip
 import logging
 
 from django.core.urlresolvers import reverse
+from django.utils import six
 
 from wger.core.tests.base_testcase import WorkoutManagerTestCase
 
@@ -36,8 +38,10 @@ class WeightCsvExportTestCase(WorkoutManagerTestCase):
         self.assertEqual(response['Content-Type'], 'text/csv')
         self.assertEqual(response['Content-Disposition'],
                          'attachment; filename=Weightdata.csv')
-        self.assertGreaterEqual(len(response.content), 120)
-        self.assertLessEqual(len(response.content), 150)
+        content = b''.join(response.streaming_content)
+        self.assertGreaterEqual(len(content), 120)
+        self.assertLessEqual(len(content), 150)
+        self.assertEqual(content.splitlines()[1], b'77.00,2012-10-01')
 
     def test_export_csv_logged_in(self):
         '''
@@ -46,3 +50,20 @@ class WeightCsvExportTestCase(WorkoutManagerTestCase):
 
         self.user_login('test')
         self.export_csv()
+
+    def test_export_csv_gzip(self):
+        '''
+        Test the compressed CSV export for weight entries
+        '''
+
+        self.user_login('test')
+        response = self.client.get(reverse('weight:export-csv') + '?gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename=Weightdata.csv.gz')
+
+        content = gzip.GzipFile(fileobj=six.BytesIO(b''.join(response.streaming_content))).read()
+        response = self.client.get(reverse('weight:export-csv'))
+        self.assertEqual(content, b''.join(response.streaming_content))
@@ -0,0 +1,76 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import datetime
+import json
+
+from django.contrib.auth.models import User
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.manager.models import Workout, WorkoutLog
+from wger.weight.helpers import process_log_entries
+
+
+class ProcessLogEntriesTestCase(WorkoutManagerTestCase):
+    '''
+    Tests processing the log entries for the weight charts
+    '''
+
+    def setUp(self):
+        super(ProcessLogEntriesTestCase, self).setUp()
+        user = User.objects.get(pk=1)
+        workout = Workout.objects.create(user=user)
+        day1 = datetime.date(2015, 3, 1)
+        day2 = datetime.date(2015, 3, 2)
+        for date, reps, weight in ((day2, 10, 50),
+                                   (day1, 10, 40),
+                                   (day1, 10, 45),
+                                   (day1, 10, 45),
+                                   (day1, 8, 60),
+                                   (day2, 8, 55)):
+            WorkoutLog.objects.create(user=user,
+                                      workout=workout,
+                                      exercise_id=1,
+                                      date=date,
+                                      reps=reps,
+                                      weight=weight)
+        self.logs = WorkoutLog.objects.filter(workout=workout)
+
+    def test_process_log_entries(self):
+        '''
+        Test that the logs are grouped by date and only the maximum weights are
+        passed to the chart
+        '''
+        with self.assertNumQueries(1):
+            entry_log, chart_data = process_log_entries(self.logs)
+
+        self.assertEqual(list(entry_log.keys()), [datetime.date(2015, 3, 1),
+                                                  datetime.date(2015, 3, 2)])
+        entries = entry_log[datetime.date(2015, 3, 1)]
+        self.assertEqual([(entry.reps, entry.weight) for entry in entries],
+                         [(8, 60), (10, 40), (10, 45), (10, 45)])
+
+        self.assertEqual(json.loads(chart_data),
+                         [[{'date': '2015-03-01', 'weight': '60.00', 'reps': 8},
+                           {'date': '2015-03-02', 'weight': '55.00', 'reps': 8}],
+                          [{'date': '2015-03-01', 'weight': '45.00', 'reps': 10},
+                           {'date': '2015-03-02', 'weight': '50.00', 'reps': 10}]])
+
+    def test_process_no_entries(self):
+        '''
+        Test processing an empty queryset
+        '''
+        entry_log, chart_data = process_log_entries(self.logs.none())
+        self.assertFalse(entry_log)
+        self.assertEqual(chart_data, '[]')
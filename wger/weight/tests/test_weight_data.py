@@ -0,0 +1,151 @@
+# This file is part of wger Workout Manager.
+#
+# wger Workout Manager is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# wger Workout Manager is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+
+import datetime
+import decimal
+import json
+
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+
+from wger.core.tests.base_testcase import WorkoutManagerTestCase
+from wger.weight.helpers import (
+    downsample_weight_entries,
+    moving_average_weight_entries,
+    rollup_weight_entries
+)
+from wger.weight.models import WeightEntry
+
+
+def get_entries(count):
+    '''
+    Returns a list of daily (date, weight) tuples
+    '''
+    start = datetime.date(2015, 1, 1)
+    return [(start + datetime.timedelta(days=i), decimal.Decimal(70 + i % 10))
+            for i in range(count)]
+
+
+class WeightDataHelperTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the helper functions to reduce the weight entries
+    '''
+
+    def test_rollup_week(self):
+        '''
+        Test grouping the entries by week
+        '''
+        entries = rollup_weight_entries(get_entries(14), 'week')
+
+        # 2015-01-01 is a thursday
+        self.assertEqual(entries, [(datetime.date(2014, 12, 29), decimal.Decimal('71.50')),
+                                   (datetime.date(2015, 1, 5), decimal.Decimal('75.57')),
+                                   (datetime.date(2015, 1, 12), decimal.Decimal('72.00'))])
+
+    def test_rollup_month(self):
+        '''
+        Test grouping the entries by month
+        '''
+        entries = rollup_weight_entries(get_entries(40), 'month')
+        self.assertEqual([date for date, weight in entries],
+                         [datetime.date(2015, 1, 1), datetime.date(2015, 2, 1)])
+        self.assertEqual(entries[1][1], decimal.Decimal('75.00'))
+
+    def test_moving_average(self):
+        '''
+        Test smoothing the entries with a moving average
+        '''
+        entries = get_entries(12)
+        averages = moving_average_weight_entries(entries, 3)
+        self.assertEqual([date for date, weight in averages], [date for date, weight in entries])
+        self.assertEqual([weight for date, weight in averages[:4]],
+                         [decimal.Decimal('70.00'), decimal.Decimal('70.50'),
+                          decimal.Decimal('71.00'), decimal.Decimal('72.00')])
+        self.assertEqual(averages[10][1], decimal.Decimal('75.67'))
+
+    def test_downsample(self):
+        '''
+        Test reducing the number of entries
+        '''
+        entries = get_entries(1000)
+        sampled = downsample_weight_entries(entries, 100)
+        self.assertEqual(len(sampled), 100)
+        self.assertEqual(sampled[0], entries[0])
+        self.assertEqual(sampled[-1], entries[-1])
+        self.assertEqual(sampled, sorted(sampled))
+        self.assertTrue(set(sampled).issubset(entries))
+
+        # The peaks are kept
+        self.assertTrue({decimal.Decimal(70), decimal.Decimal(79)}
+                        .issubset(weight for date, weight in sampled))
+
+        # Nothing to do
+        self.assertEqual(downsample_weight_entries(entries[:50], 100), entries[:50])
+        self.assertEqual(downsample_weight_entries(entries[:50], 2), [entries[0], entries[49]])
+        self.assertEqual(downsample_weight_entries(entries[:50], 1), [entries[0]])
+        self.assertEqual(downsample_weight_entries(entries[:1], 2), entries[:1])
+        self.assertRaises(ValueError, downsample_weight_entries, entries, 0)
+
+
+class WeightDataApiTestCase(WorkoutManagerTestCase):
+    '''
+    Tests the API returning the weight data for the chart
+    '''
+
+    def setUp(self):
+        super(WeightDataApiTestCase, self).setUp()
+        user = User.objects.get(username='test')
+        WeightEntry.objects.filter(user=user).delete()
+        WeightEntry.objects.bulk_create([WeightEntry(user=user, date=date, weight=weight)
+                                         for date, weight in get_entries(500)])
+        self.user_login('test')
+
+    def get_data(self, query=''):
+        '''
+        Helper function returning the data from the API
+        '''
+        response = self.client.get(reverse('weight:weight-data') + query)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode('utf8'))
+
+    def test_all_entries(self):
+        '''
+        Test that all entries are returned by default
+        '''
+        data = self.get_data()
+        self.assertEqual(len(data), 500)
+        self.assertEqual(data[0]['date'], '2015-01-01')
+
+    def test_points(self):
+        '''
+        Test downsampling the entries
+        '''
+        self.assertEqual(len(self.get_data('?points=50')), 50)
+        self.assertEqual(len(self.get_data('?points=foo')), 500)
+
+    def test_rollup(self):
+        '''
+        Test grouping the entries
+        '''
+        self.assertEqual(len(self.get_data('?rollup=month')), 17)
+        self.assertEqual(len(self.get_data('?rollup=week&points=10')), 10)
+
+    def test_average(self):
+        '''
+        Test smoothing the entries
+        '''
+        data = self.get_data('?average=10&date_min=2015-02-01&date_max=2015-02-28')
+        self.assertEqual(len(data), 28)
+        self.assertEqual(float(data[0]['weight']), 71)
+        self.assertEqual(float(data[-1]['weight']), 74.5)
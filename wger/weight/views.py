@@ -15,11 +15,10 @@
 # You should have received a copy of the GNU Affero General Public License
 
 import logging
-import csv
 import datetime
+import itertools
 
 from django.shortcuts import render
-from django.http import HttpResponse
 from django.http import HttpResponseRedirect
 from django.core.urlresolvers import reverse
 from django.core.urlresolvers import reverse_lazy
@@ -40,7 +39,9 @@ from formtools.preview import FormPreview
 from wger.weight.forms import WeightForm
 from wger.weight.models import WeightEntry
 from wger.weight import helpers
+from wger.utils.cache import reset_dashboard_summary
 from wger.utils.helpers import check_access
+from wger.utils.export import GZIP_PARAMETER, streaming_csv_response
 from wger.utils.generic_views import WgerFormMixin
 
 
@@ -107,22 +108,13 @@ def export_csv(request):
     Exports the saved weight data as a CSV file
     '''
 
-    # Prepare the response headers
-    response = HttpResponse(content_type='text/csv')
-
-    # Convert all weight data to CSV
-    writer = csv.writer(response)
-
-    weights = WeightEntry.objects.filter(user=request.user)
-    writer.writerow([_('Weight').encode('utf8'), _('Date').encode('utf8')])
-
-    for entry in weights:
-        writer.writerow([entry.weight, entry.date])
+    weights = WeightEntry.objects.filter(user=request.user) \
+        .values_list('weight', 'date') \
+        .iterator()
+    rows = itertools.chain([[_('Weight'), _('Date')]], weights)
 
     # Send the data to the browser
-    response['Content-Disposition'] = 'attachment; filename=Weightdata.csv'
-    response['Content-Length'] = len(response.content)
-    return response
+    return streaming_csv_response(rows, 'Weightdata', compress=GZIP_PARAMETER in request.GET)
 
 
 def overview(request, username=None):
@@ -165,6 +157,12 @@ def overview(request, username=None):
 def get_weight_data(request, username=None):
     '''
     Process the data to pass it to the JS libraries to generate an SVG image
+
+    Optional parameters to reduce the number of entries for long periods:
+
+    * rollup: 'week' or 'month', use the average weight of each period
+    * average: smooth the entries with a moving average over this many entries
+    * points: return at most this many entries, keeping the shape of the curve
     '''
 
     is_owner, user = check_access(request.user, username)
@@ -178,16 +176,37 @@ def get_weight_data(request, username=None):
     else:
         weights = WeightEntry.objects.filter(user=user)
 
-    chart_data = []
+    entries = list(weights.values_list('date', 'weight'))
+
+    if request.GET.get('rollup') in helpers.WEIGHT_ROLLUP_PERIODS:
+        entries = helpers.rollup_weight_entries(entries, request.GET['rollup'])
 
-    for i in weights:
-        chart_data.append({'date': i.date,
-                           'weight': i.weight})
+    average = get_positive_int(request.GET.get('average'))
+    if average:
+        entries = helpers.moving_average_weight_entries(entries, average)
+
+    points = get_positive_int(request.GET.get('points'))
+    if points:
+        entries = helpers.downsample_weight_entries(entries, points)
+
+    chart_data = [{'date': date, 'weight': weight} for date, weight in entries]
 
     # Return the results to the client
     return Response(chart_data)
 
 
+def get_positive_int(value):
+    '''
+    Returns the value of a GET parameter as a positive integer, or None if
+    it is missing or invalid
+    '''
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
 class WeightCsvImportFormPreview(FormPreview):
     preview_template = 'import_csv_preview.html'
     form_template = 'import_csv_form.html'
@@ -210,5 +229,6 @@ class WeightCsvImportFormPreview(FormPreview):
     def done(self, request, cleaned_data):
         weight_list, error_list = helpers.parse_weight_csv(request, cleaned_data)
         WeightEntry.objects.bulk_create(weight_list)
+        reset_dashboard_summary(request.user.pk)
         return HttpResponseRedirect(reverse('weight:overview',
                                             kwargs={'username': request.user.username}))